@@ -1,4 +1,4 @@
-import requests
+from http_client import get_client
 import json
 import logging
 import os
@@ -7,25 +7,23 @@ from datetime import datetime
 from PIL import Image, ImageDraw, ImageFont
 import barcode
 from barcode.writer import ImageWriter
+from log_setup import setup_logging
 
 # Setup logging
-logging.basicConfig(
-    filename='api_integration.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+setup_logging('api_integration.log', level=logging.DEBUG)
 logger = logging.getLogger('api_integration')
 
 class ParkingIntegration:
     def __init__(self):
         self.base_url = "http://192.168.2.6:5051/api"
+        self.http = get_client(self.base_url)
         self.offline_file = "offline_data.json"
         self.counter_file = "counter.txt"
         
     def test_connection(self):
         """Test connection to the server API"""
         try:
-            response = requests.get(f"{self.base_url}/test")
+            response = self.http.get("/test")
             if response.ok:
                 data = response.json()
                 return True, data
@@ -49,8 +47,8 @@ class ParkingIntegration:
             
             logger.debug(f"Sending data to server: {json.dumps(data)}")
             
-            response = requests.post(
-                f"{self.base_url}/masuk",
+            response = self.http.post(
+                "/masuk",
                 json=data,
                 headers={"Content-Type": "application/json"}
             )
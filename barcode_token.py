@@ -0,0 +1,30 @@
+"""
+Token barcode tiket parkir.
+
+Barcode CODE39 di tiket dulu hanya berisi potongan ID tiket (jam capture),
+sehingga gate keluar harus mencocokkan secara fuzzy. Token dibuat sekali
+saat tiket masuk dari hash ID tiket: 8 karakter base32 (A-Z, 2-7) yang
+aman untuk CODE39 dan cukup pendek untuk kertas 58mm. Token disimpan di
+kolom barcode_token dengan unique index, jadi satu scan = satu index probe.
+"""
+import base64
+import hashlib
+import re
+
+TOKEN_LENGTH = 8
+
+_TOKEN_RE = re.compile(r'^[A-Z2-7]{%d}$' % TOKEN_LENGTH)
+
+def make_token(ticket_id, salt=0):
+    """Token barcode dari ID tiket; naikkan salt jika terjadi tabrakan index"""
+    data = f"{ticket_id}:{salt}" if salt else str(ticket_id)
+    digest = hashlib.blake2b(data.encode('utf-8'), digest_size=5).digest()
+    return base64.b32encode(digest).decode('ascii')[:TOKEN_LENGTH]
+
+def normalize_scan(value):
+    """Bersihkan hasil scan: hapus start/stop '*' CODE39 dan spasi"""
+    return str(value or '').strip().strip('*').strip().upper()
+
+def is_token(value):
+    """True jika hasil scan berbentuk token barcode (bukan ID tiket)"""
+    return bool(_TOKEN_RE.match(value))
@@ -4,15 +4,16 @@ from datetime import datetime
 import win32print
 import random
 import serial
-import requests
+from http_client import get_client
+from health_monitor import HealthMonitor
 import json
+from counter_store import CounterStore
+from gate_metrics import GateMetrics
+from print_service import FAILED, PrintService, Win32Backend
+from log_setup import setup_logging
 
 # Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    filename='parking_client.log'
-)
+setup_logging('parking_client.log')
 logger = logging.getLogger(__name__)
 
 # Server API Configuration
@@ -27,11 +28,19 @@ class ParkingButton:
         """
         self.terminal = terminal
         self.api = terminal.api if terminal else None
+        self.metrics = GateMetrics('button')
+        self.http = get_client(API_BASE_URL)
+        self.health = HealthMonitor(self.http, path='/test')
+        self.health.start()
+        self.metrics.server_up.set_function(lambda: int(self.health.is_online))
         self.printer_name = win32print.GetDefaultPrinter()
+        self.print_service = PrintService(Win32Backend(self.printer_name, win32print), metrics=self.metrics).start()
+        self.counter_store = CounterStore('counter.txt', initial=1)
         self.offline_counter = self._load_counter()
         self.running = False
         self.arduino = None
         self._try_connect_arduino()
+        self.metrics.serve()
         logger.info(f"Initialized with printer: {self.printer_name}")
         
     def _try_connect_arduino(self):
@@ -69,16 +78,19 @@ class ParkingButton:
             if response == "READY":
                 print("✅ Arduino is ready!")
                 logger.info("Arduino connected successfully and sent READY message")
+                self.metrics.reconnects.inc(target='arduino', result='ok')
                 return True
             else:
                 print(f"⚠️ Unexpected response: {response}")
                 logger.warning(f"Arduino connected but sent unexpected response: {response}")
+                self.metrics.reconnects.inc(target='arduino', result='failed')
                 self.arduino.close()
                 return False
                 
         except Exception as e:
             print(f"❌ Connection failed: {str(e)}")
             logger.error(f"Failed to connect to Arduino: {str(e)}")
+            self.metrics.reconnects.inc(target='arduino', result='failed')
             if self.arduino and self.arduino.is_open:
                 self.arduino.close()
             return False
@@ -95,6 +107,7 @@ class ParkingButton:
             return False
         except Exception as e:
             logger.error(f"Error checking button: {str(e)}")
+            self.metrics.serial_errors.inc(device='arduino')
             return False
 
     def _generate_plate_number(self):
@@ -106,50 +119,45 @@ class ParkingButton:
         return "Motor" if random.random() < 0.7 else "Mobil"
         
     def _load_counter(self):
-        """Load offline counter from file"""
+        """Load offline counter from counter store"""
         try:
-            with open('counter.txt', 'r') as f:
-                return int(f.read().strip())
-        except:
+            return self.counter_store.get()
+        except Exception as e:
+            logger.error(f"Error loading counter: {e}")
             return 1
             
     def _save_counter(self):
-        """Save offline counter to file"""
-        with open('counter.txt', 'w') as f:
-            f.write(str(self.offline_counter))
+        """Save offline counter to counter store"""
+        self.counter_store.set(self.offline_counter)
             
     def _try_server_connection(self):
-        """Test connection to parking server"""
-        try:
-            response = requests.get(f"{API_BASE_URL}/test", timeout=2)
-            return response.ok
-        except:
-            return False
+        """Server status from the background health monitor (no round trip)"""
+        return self.health.is_online
             
     def _get_ticket_from_server(self, plate_number, vehicle_type):
         """Get ticket number from server"""
         try:
-            response = requests.post(
-                f"{API_BASE_URL}/masuk",
-                json={"plat": plate_number, "jenis": vehicle_type},
-                headers={"Content-Type": "application/json"},
-                timeout=2
-            )
+            with self.metrics.server_requests.time(endpoint='masuk'):
+                response = self.http.post(
+                    "/masuk",
+                    json={"plat": plate_number, "jenis": vehicle_type},
+                    headers={"Content-Type": "application/json"},
+                    timeout=2
+                )
             if response.ok:
                 result = response.json()
                 if result.get('success'):
                     return result['data']
         except Exception as e:
             logger.error(f"Error getting ticket from server: {e}")
+            # Tandai offline sekarang, monitor akan probe ulang dengan backoff
+            self.health.report_failure()
+            self.health.check_now()
         return None
             
     def _print_ticket(self, ticket_data, is_offline=False):
-        """Print parking ticket using thermal printer"""
+        """Queue parking ticket on the thermal printer's print service"""
         try:
-            printer_handle = win32print.OpenPrinter(self.printer_name)
-            job_id = win32print.StartDocPrinter(printer_handle, 1, ("Parking Ticket", None, "RAW"))
-            win32print.StartPagePrinter(printer_handle)
-            
             # Prepare commands list
             commands = []
             
@@ -202,17 +210,14 @@ class ParkingButton:
             # Combine all commands
             ticket_text = b"".join(commands)
             
-            # Send to printer
-            win32print.WritePrinter(printer_handle, ticket_text)
-            win32print.EndPagePrinter(printer_handle)
-            win32print.EndDocPrinter(printer_handle)
-            win32print.ClosePrinter(printer_handle)
-            
-            logger.info("Ticket printed successfully")
-            return True
+            # Printed by the print service thread; failures are retried there
+            job = self.print_service.submit(ticket_text, title=f"Parking Ticket {ticket_number}")
+            logger.info(f"Ticket queued for printing: {ticket_number} (job {job.id})")
+            return job.state != FAILED
             
         except Exception as e:
             logger.error(f"Error printing ticket: {e}")
+            self.metrics.prints.inc(result='failed')
             return False
             
     def _handle_button_press(self):
@@ -239,6 +244,7 @@ class ParkingButton:
                     logger.info(f"Got ticket from server: {ticket_data}")
                     # Print ticket
                     if self._print_ticket(ticket_data):
+                        self.metrics.tickets.inc(mode='online')
                         print(f"✅ Kendaraan {plate_number} berhasil masuk")
                         print(f"✅ Tiket dicetak: {ticket_data['tiket']}")
                         return
@@ -246,18 +252,20 @@ class ParkingButton:
             # Fallback to offline mode
             logger.info("Using offline mode")
             current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            # Reservasi nomor sebelum cetak (atomik lintas proses), seperti parking_api
+            counter = self.counter_store.increment() - 1
+            self.offline_counter = counter + 1
             offline_data = {
                 'plat': plate_number,
                 'jenis': vehicle_type,
-                'tiket': f"OFF{self.offline_counter:06d}",
+                'tiket': f"OFF{counter:06d}",
                 'waktu_masuk': current_time
             }
             
             if self._print_ticket(offline_data, is_offline=True):
+                self.metrics.tickets.inc(mode='offline')
                 print(f"✅ [OFFLINE] Kendaraan {plate_number} berhasil masuk")
                 print(f"✅ Tiket dicetak: {offline_data['tiket']}")
-                self.offline_counter += 1
-                self._save_counter()
             else:
                 print(f"❌ Gagal mencetak tiket offline")
                 
@@ -281,14 +289,20 @@ class ParkingButton:
                     if self.arduino.in_waiting > 0:
                         data = self.arduino.readline().decode('utf-8').strip()
                         if data:
+                            self.metrics.press('arduino')
                             self._handle_button_press()
                 else:
                     # Use keyboard input as fallback
                     if input().lower() == 'p':
+                        self.metrics.press('keyboard')
                         self._handle_button_press()
             except KeyboardInterrupt:
                 print("\nMenghentikan sistem...")
                 break
+            except serial.SerialException as e:
+                logger.error(f"Serial error in main loop: {e}")
+                self.metrics.serial_errors.inc(device='arduino')
+                time.sleep(1)
             except Exception as e:
                 logger.error(f"Error in main loop: {e}")
                 print(f"Error: {e}")
@@ -297,8 +311,12 @@ class ParkingButton:
     def stop(self):
         """Stop the button handler"""
         self.running = False
+        self.health.stop()
+        self.print_service.stop()
+        self.metrics.stop()
         if self.arduino and self.arduino.is_open:
             self.arduino.close()
+        self.counter_store.close()
         logger.info("Button handler stopped")
 
 if __name__ == "__main__":
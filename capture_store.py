@@ -0,0 +1,261 @@
+"""
+Penyimpanan capture kendaraan dengan folder per tanggal dan index SQLite.
+
+File capture disimpan di capture_dir/YYYY/MM/DD/ sehingga satu folder tidak
+berisi ribuan file, dan setiap capture dicatat di index SQLite (captures.db)
+berdasarkan ID tiket dan waktu capture. Pencarian foto tiket di gate keluar
+cukup satu query index, tanpa listing folder.
+
+Capture yang lebih lama dari retention_days dipindahkan ke backup_dir dengan
+kualitas JPEG lebih rendah; metadata COM di dalam JPEG ikut dipertahankan.
+
+Jalankan retensi manual:
+    python capture_store.py captures backups --days 90
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger('capture_store')
+
+INDEX_FILE = 'captures.db'
+
+class CaptureStore:
+    """Folder capture ber-shard tanggal dengan index SQLite"""
+
+    def __init__(self, root, backup_dir=None, index_path=None):
+        self.root = os.path.abspath(root)
+        self.backup_dir = os.path.abspath(backup_dir) if backup_dir else None
+        self.index_path = index_path or os.path.join(self.root, INDEX_FILE)
+        self._known_dirs = set()
+        self._lock = threading.Lock()
+        # Satu pass retensi sekaligus: pass kedua akan mengambil baris
+        # archived = 0 yang sama dan memproses file yang sama
+        self._retention_lock = threading.Lock()
+        self._retention_thread = None
+        self._manual_retention = None
+        self._stop = threading.Event()
+
+        os.makedirs(self.root, exist_ok=True)
+        self._db = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS captures (
+                ticket_id TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                captured_at REAL NOT NULL,
+                size INTEGER,
+                archived INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_captures_time ON captures (archived, captured_at)"
+        )
+        self._db.commit()
+
+    def path_for(self, filename, when=None):
+        """Path absolut untuk capture baru, folder shard dibuat jika perlu"""
+        when = when or datetime.now()
+        shard = os.path.join(self.root, when.strftime('%Y'), when.strftime('%m'), when.strftime('%d'))
+        if shard not in self._known_dirs:
+            os.makedirs(shard, exist_ok=True)
+            self._known_dirs.add(shard)
+        return os.path.join(shard, filename)
+
+    def record(self, ticket_id, path, captured_at=None, size=None):
+        """Catat capture ke index"""
+        relative = os.path.relpath(path, self.root)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO captures (ticket_id, path, captured_at, size, archived) "
+                "VALUES (?, ?, ?, ?, 0)",
+                (ticket_id, relative, captured_at or time.time(), size)
+            )
+            self._db.commit()
+
+    def _resolve(self, relative, archived):
+        base = self.backup_dir if archived and self.backup_dir else self.root
+        return os.path.join(base, relative)
+
+    def lookup(self, ticket_id):
+        """Path absolut foto tiket, atau None jika tidak ada di index"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT path, archived FROM captures WHERE ticket_id = ?", (ticket_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return self._resolve(row[0], row[1])
+
+    def find_between(self, start, end, limit=500):
+        """Daftar (ticket_id, path) capture antara dua timestamp epoch"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT ticket_id, path, archived FROM captures "
+                "WHERE captured_at BETWEEN ? AND ? ORDER BY captured_at LIMIT ?",
+                (start, end, limit)
+            ).fetchall()
+        return [(ticket_id, self._resolve(path, archived)) for ticket_id, path, archived in rows]
+
+    def _recompress(self, source, target, quality):
+        # Import di sini agar lookup index (mis. dari server Django) tidak butuh OpenCV
+        import cv2
+        from image_encoder import embed_comment, read_metadata
+
+        frame = cv2.imread(source)
+        if frame is None:
+            raise Exception(f"Gagal membaca {source}")
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise Exception(f"Gagal encode ulang {source}")
+        jpeg = encoded.tobytes()
+
+        metadata = read_metadata(source)
+        if metadata is not None:
+            metadata['archived_quality'] = quality
+            jpeg = embed_comment(jpeg, json.dumps(metadata, separators=(',', ':')).encode('utf-8'))
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_path = target + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(jpeg)
+        os.replace(temp_path, target)
+        return len(jpeg)
+
+    def apply_retention(self, days, quality=40, batch=200):
+        """Pindahkan capture lebih lama dari `days` hari ke backup_dir
+
+        Returns:
+            Jumlah capture yang diarsipkan, atau None jika pass retensi lain
+            (mis. thread start_retention) sedang berjalan
+        """
+        if not self.backup_dir:
+            logger.warning("backup_dir tidak dikonfigurasi, retensi dilewati")
+            return 0
+        if not self._retention_lock.acquire(blocking=False):
+            logger.info("Retensi capture sedang berjalan, pass ini dilewati")
+            return None
+        try:
+            return self._archive_older_than(days, quality, batch)
+        finally:
+            self._retention_lock.release()
+
+    def _archive_older_than(self, days, quality, batch):
+        cutoff = time.time() - days * 86400
+        archived = 0
+        while not self._stop.is_set():
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT ticket_id, path FROM captures "
+                    "WHERE archived = 0 AND captured_at < ? ORDER BY captured_at LIMIT ?",
+                    (cutoff, batch)
+                ).fetchall()
+            if not rows:
+                break
+
+            updates = []
+            for ticket_id, relative in rows:
+                source = os.path.join(self.root, relative)
+                target = os.path.join(self.backup_dir, relative)
+                try:
+                    if os.path.exists(source):
+                        size = self._recompress(source, target, quality)
+                        os.remove(source)
+                    elif os.path.exists(target):
+                        size = os.path.getsize(target)
+                    else:
+                        logger.warning(f"File capture {relative} tidak ditemukan")
+                        size = None
+                    updates.append((size, ticket_id))
+                except Exception as e:
+                    logger.error(f"Gagal mengarsipkan {relative}: {str(e)}")
+                    # Pindahkan apa adanya agar batch berikutnya tidak macet di file yang sama
+                    if os.path.exists(source):
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        shutil.move(source, target)
+                    updates.append((None, ticket_id))
+
+            with self._lock:
+                self._db.executemany(
+                    "UPDATE captures SET archived = 1, size = COALESCE(?, size) WHERE ticket_id = ?",
+                    updates
+                )
+                self._db.commit()
+            archived += len(updates)
+
+        self._remove_empty_shards()
+        if archived:
+            logger.info(f"{archived} capture diarsipkan ke {self.backup_dir}")
+        return archived
+
+    def _remove_empty_shards(self):
+        # Shard yang sedang dipakai proses ini (mis. hari ini) tidak dihapus
+        for dirpath, _, _ in os.walk(self.root, topdown=False):
+            if dirpath == self.root or dirpath in self._known_dirs:
+                continue
+            try:
+                if not os.listdir(dirpath):
+                    os.rmdir(dirpath)
+            except OSError:
+                pass
+
+    def start_retention(self, days, quality=40, interval_hours=24):
+        """Jalankan retensi berkala di thread background"""
+        def run():
+            while not self._stop.is_set():
+                try:
+                    self.apply_retention(days, quality)
+                except Exception as e:
+                    logger.error(f"Error retensi capture: {str(e)}")
+                self._stop.wait(interval_hours * 3600)
+
+        self._retention_thread = threading.Thread(target=run, name='capture-retention', daemon=True)
+        self._retention_thread.start()
+
+    def request_retention(self, days, quality=40):
+        """Jalankan satu pass retensi di thread background tanpa menunggu
+
+        Returns:
+            False jika pass retensi lain sedang berjalan
+        """
+        if self._retention_lock.locked():
+            return False
+
+        def run():
+            try:
+                self.apply_retention(days, quality)
+            except Exception as e:
+                logger.error(f"Error retensi capture: {str(e)}")
+
+        self._manual_retention = threading.Thread(target=run, name='capture-retention-now', daemon=True)
+        self._manual_retention.start()
+        return True
+
+    def close(self):
+        self._stop.set()
+        for thread in (self._retention_thread, self._manual_retention):
+            if thread:
+                thread.join(timeout=5)
+        with self._lock:
+            self._db.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Arsipkan capture lama ke backup_dir")
+    parser.add_argument('capture_dir')
+    parser.add_argument('backup_dir')
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--quality', type=int, default=40)
+    args = parser.parse_args()
+
+    store = CaptureStore(args.capture_dir, args.backup_dir)
+    count = store.apply_retention(args.days, args.quality)
+    print(f"✅ {count} capture diarsipkan")
+    store.close()
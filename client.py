@@ -4,21 +4,10 @@ import logging
 from datetime import datetime
 from config import API_CONFIG, LOG_CONFIG
 from printer_utils import TicketPrinter
-import os
+from log_setup import setup_logging
 
 # Setup logging
-logging.basicConfig(
-    level=getattr(logging, LOG_CONFIG['level']),
-    format=LOG_CONFIG['format']
-)
-
-# Ensure logs directory exists
-os.makedirs(os.path.dirname(LOG_CONFIG['file']), exist_ok=True)
-
-# Add file handler
-file_handler = logging.FileHandler(LOG_CONFIG['file'])
-file_handler.setFormatter(logging.Formatter(LOG_CONFIG['format']))
-logging.getLogger().addHandler(file_handler)
+setup_logging(LOG_CONFIG['file'], level=LOG_CONFIG['level'], console=True)
 
 logger = logging.getLogger(__name__)
 
@@ -0,0 +1,145 @@
+"""
+Counter store berbasis mmap untuk nomor urut tiket/capture di kiosk.
+
+Pengganti pola open/read/truncate-write counter.txt. File berukuran tetap
+(64 byte) dipetakan ke memori dan berisi dua slot (A/B). Setiap update
+ditulis ke slot yang lebih lama beserta nomor urut dan CRC32, lalu di-flush
+ke disk. Jika listrik padam saat menulis, slot yang rusak gagal cek CRC dan
+nilai dibaca dari slot lainnya. Increment dijaga file lock sehingga aman
+dipakai beberapa proses sekaligus (mis. ParkingCamera dan ParkingButton).
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+    import fcntl
+
+logger = logging.getLogger('counter_store')
+
+MAGIC = b'PKCT'
+VERSION = 1
+FILE_SIZE = 64
+
+_HEADER = struct.Struct('<4sI')
+_SLOT = struct.Struct('<QQI4x')  # value, seq, crc32
+_SLOT_OFFSETS = (_HEADER.size, _HEADER.size + _SLOT.size)
+
+def _slot_crc(value, seq):
+    return zlib.crc32(struct.pack('<QQ', value, seq)) & 0xFFFFFFFF
+
+class CounterStore:
+    """Counter persisten dengan increment atomik"""
+
+    def __init__(self, path, initial=0):
+        # counter.txt lama tetap dibaca sekali untuk migrasi nilai awal
+        base, ext = os.path.splitext(path)
+        self.path = path if ext == '.dat' else base + '.dat'
+        self.legacy_path = None if ext == '.dat' else path
+        self._lock = threading.Lock()
+
+        is_new = not os.path.exists(self.path) or os.path.getsize(self.path) < FILE_SIZE
+        self._file = open(self.path, 'r+b' if os.path.exists(self.path) else 'w+b')
+        if is_new:
+            self._file.truncate(FILE_SIZE)
+        self._map = mmap.mmap(self._file.fileno(), FILE_SIZE)
+
+        if is_new:
+            self._format(self._read_legacy(initial))
+
+    def _read_legacy(self, default):
+        if self.legacy_path and os.path.exists(self.legacy_path):
+            try:
+                with open(self.legacy_path, 'r') as f:
+                    value = int(f.read().strip())
+                logger.info(f"Counter dimigrasi dari {self.legacy_path}: {value}")
+                return value
+            except Exception as e:
+                logger.warning(f"Gagal membaca counter lama {self.legacy_path}: {str(e)}")
+        return default
+
+    def _format(self, value):
+        with self._file_lock():
+            self._map[:FILE_SIZE] = b'\x00' * FILE_SIZE
+            _HEADER.pack_into(self._map, 0, MAGIC, VERSION)
+            self._write_slot(0, value, 1)
+            self._map.flush()
+
+    def _file_lock(self):
+        return _FileLock(self._file)
+
+    def _read_slot(self, index):
+        value, seq, crc = _SLOT.unpack_from(self._map, _SLOT_OFFSETS[index])
+        if seq == 0 or crc != _slot_crc(value, seq):
+            return None
+        return value, seq
+
+    def _write_slot(self, index, value, seq):
+        _SLOT.pack_into(self._map, _SLOT_OFFSETS[index], value, seq, _slot_crc(value, seq))
+
+    def _current(self):
+        """Kembalikan (value, seq, index slot) dari slot valid terbaru"""
+        magic, _ = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"File counter {self.path} rusak")
+        slots = [(self._read_slot(i), i) for i in (0, 1)]
+        valid = [(slot[0], slot[1], i) for slot, i in slots if slot is not None]
+        if not valid:
+            raise ValueError(f"Kedua slot counter {self.path} rusak")
+        return max(valid, key=lambda item: item[1])
+
+    def get(self):
+        """Nilai counter saat ini (operasi memori, tanpa I/O file)"""
+        with self._lock:
+            return self._current()[0]
+
+    def set(self, value):
+        with self._lock, self._file_lock():
+            _, seq, index = self._current()
+            self._write_slot(1 - index, value, seq + 1)
+            self._map.flush()
+
+    def increment(self, step=1):
+        """Tambah counter secara atomik lintas proses dan kembalikan nilai baru"""
+        with self._lock, self._file_lock():
+            value, seq, index = self._current()
+            value += step
+            # Tulis ke slot lama agar slot terbaru tetap utuh jika crash
+            self._write_slot(1 - index, value, seq + 1)
+            self._map.flush()
+            return value
+
+    def close(self):
+        try:
+            self._map.close()
+            self._file.close()
+        except Exception as e:
+            logger.error(f"Error menutup counter store: {str(e)}")
+
+class _FileLock:
+    """Lock eksklusif antar proses pada byte pertama file counter"""
+
+    def __init__(self, file):
+        self.fd = file.fileno()
+
+    def __enter__(self):
+        if msvcrt:
+            os.lseek(self.fd, 0, os.SEEK_SET)
+            msvcrt.locking(self.fd, msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if msvcrt:
+            os.lseek(self.fd, 0, os.SEEK_SET)
+            msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        return False
@@ -1,18 +1,17 @@
 import os
 import psycopg2
+from psycopg2.extras import execute_values
 import json
-import requests
+from http_client import get_client
 import time
 from datetime import datetime
 import logging
 from dotenv import load_dotenv
+from ticket_id_client import TicketIdLease, db_lease
+from log_setup import setup_logging
 
 # Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    filename='parking_client.log'
-)
+setup_logging('parking_client.log')
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -36,6 +35,7 @@ class ParkingClient:
         """Initialize parking client with either API or direct DB connection"""
         self.use_api = use_api
         self.conn = None
+        self.http = get_client(API_URL, auth=API_AUTH)
         
         if not use_api:
             self._connect_to_db()
@@ -61,7 +61,7 @@ class ParkingClient:
         """Test connection to server"""
         if self.use_api:
             try:
-                response = requests.get(f"{API_URL}/api/test-connection", auth=API_AUTH)
+                response = self.http.get("/api/test-connection", auth=API_AUTH)
                 if response.status_code == 200:
                     logger.info(f"API connection test successful: {response.json()}")
                     return True
@@ -104,8 +104,8 @@ class ParkingClient:
                 
                 logger.info(f"Sending data to API: {json.dumps(payload)}")
                 
-                response = requests.post(
-                    f"{API_URL}/api/parking",
+                response = self.http.post(
+                    "/api/parking",
                     json=payload,
                     auth=API_AUTH,
                     headers={"Content-Type": "application/json"}
@@ -164,7 +164,7 @@ class ParkingClient:
         """Verify if a vehicle with the given number was saved"""
         if self.use_api:
             try:
-                response = requests.get(f"{API_URL}/api/vehicles", auth=API_AUTH)
+                response = self.http.get("/api/vehicles", auth=API_AUTH)
                 if response.status_code == 200:
                     data = response.json()
                     if "data" in data:
@@ -222,6 +222,15 @@ class DBConnector:
             'user': 'postgres',
             'password': 'postgres'
         }
+        # Nomor tiket dari SEQUENCE database, disewa per blok 100
+        self.ticket_ids = TicketIdLease(db_lease(self.connect))
+    
+    def next_ticket_number(self):
+        """Nomor tiket berikutnya, fallback ke timestamp jika database tidak bisa diakses"""
+        ticket_number = self.ticket_ids.next_id()
+        if ticket_number is None:
+            ticket_number = f"PK-{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+        return ticket_number
     
     def connect(self):
         """Create database connection"""
@@ -245,8 +254,7 @@ class DBConnector:
         connection = None
         try:
             # Generate ticket number
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            ticket_number = f"PK-{timestamp}"
+            ticket_number = self.next_ticket_number()
             
             # Connect to database
             connection = self.connect()
@@ -298,6 +306,57 @@ class DBConnector:
             if connection:
                 connection.close()
     
+    def insert_vehicles(self, entries):
+        """Insert many vehicle entry records in one round trip
+        
+        Args:
+            entries (list): List of (plate_number, vehicle_type) tuples
+        """
+        connection = None
+        try:
+            now = datetime.now()
+            rows = []
+            tickets = []
+            for plate_number, vehicle_type in entries:
+                ticket_number = self.next_ticket_number()
+                vehicle_type_id = 1 if vehicle_type.lower() == "motor" else 2
+                rows.append((plate_number, vehicle_type_id, True, now, ticket_number))
+                tickets.append({
+                    "plat": plate_number,
+                    "tiket": ticket_number,
+                    "waktu_masuk": now.strftime("%Y-%m-%d %H:%M:%S"),
+                    "jenis": vehicle_type.title()
+                })
+            
+            connection = self.connect()
+            cursor = connection.cursor()
+            
+            # Satu INSERT multi-row untuk seluruh batch
+            execute_values(
+                cursor,
+                """
+                    INSERT INTO Vehicles 
+                    (Id, VehicleType, IsParked, EntryTime, TicketNumber) 
+                    VALUES %s
+                """,
+                rows,
+                page_size=500
+            )
+            
+            connection.commit()
+            logger.info(f"Batch of {len(rows)} vehicle entries recorded")
+            return True, {"data": tickets}
+            
+        except Exception as e:
+            if connection:
+                connection.rollback()
+            logger.error(f"Error inserting vehicle batch: {e}")
+            return False, {"error": str(e)}
+            
+        finally:
+            if connection:
+                connection.close()
+    
     def get_vehicle_count(self):
         """Get total number of parked vehicles"""
         connection = None
@@ -0,0 +1,157 @@
+"""
+Worker database untuk aplikasi GUI (Tkinter).
+
+Query psycopg2 yang dijalankan langsung di event loop Tkinter membuat layar
+kasir membeku selama query berjalan. DBWorker menjalankan semua query di
+satu thread dengan koneksi miliknya sendiri; hasilnya dimasukkan ke antrian
+yang dibaca GUI lewat window.after() (lihat dispatch()), sehingga callback
+selalu berjalan di thread Tkinter.
+
+Job bisa diberi key (mis. 'search'). Job baru dengan key yang sama membuat
+job lama basi: job basi yang masih mengantri dilewati, query basi yang
+sedang berjalan dibatalkan lewat connection.cancel(), dan hasil basi yang
+sudah terlanjur masuk antrian tidak diteruskan ke callback. Job yang tidak
+basi tetapi ikut terkena pembatalan (cancel() sampai di server setelah job
+basi selesai) dijalankan ulang sekali; jika gagal lagi errback dipanggil.
+"""
+import itertools
+import logging
+import queue
+import threading
+import psycopg2
+from psycopg2.extensions import QueryCanceledError
+
+logger = logging.getLogger('db_worker')
+
+# Penanda hasil job yang querynya dibatalkan lewat connection.cancel()
+_CANCELED = object()
+
+class DBWorker:
+    """Satu thread + satu koneksi PostgreSQL untuk query dari GUI"""
+
+    def __init__(self, connect):
+        """
+        Args:
+            connect: fungsi tanpa argumen yang mengembalikan koneksi psycopg2
+        """
+        self._connect = connect
+        self._conn = connect()
+        self._jobs = queue.Queue()
+        self.results = queue.Queue()
+        self._ids = itertools.count(1)
+        self._latest = {}          # key -> id job terbaru
+        self._running = None       # (id, key) job yang sedang berjalan
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='db-worker', daemon=True)
+        self._thread.start()
+
+    def submit(self, func, callback=None, errback=None, key=None):
+        """Antrikan func(conn) di thread worker
+
+        callback(result) atau errback(exception) dipanggil dari dispatch().
+        Mengembalikan id job.
+        """
+        job_id = next(self._ids)
+        with self._lock:
+            if key is not None:
+                self._latest[key] = job_id
+                running = self._running
+                if running and running[1] == key and self._conn is not None:
+                    # Query dengan key sama yang masih berjalan sudah tidak dibutuhkan
+                    try:
+                        self._conn.cancel()
+                    except Exception as e:
+                        logger.debug(f"Gagal membatalkan query {key}: {e}")
+        self._jobs.put((job_id, key, func, callback, errback))
+        return job_id
+
+    def cancel(self, key):
+        """Batalkan job dengan key tertentu tanpa menggantinya"""
+        self.submit(lambda conn: None, key=key)
+
+    def _is_stale(self, job_id, key):
+        return key is not None and self._latest.get(key) != job_id
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            job_id, key, func, callback, errback = job
+            with self._lock:
+                if self._is_stale(job_id, key):
+                    continue
+                self._running = (job_id, key)
+
+            try:
+                result = self._execute(func)
+                if result is _CANCELED:
+                    if self._is_stale(job_id, key):
+                        logger.debug(f"Query {key} dibatalkan (digantikan job baru)")
+                        continue
+                    # cancel() diproses server secara asinkron: pembatalan untuk
+                    # job basi sebelumnya bisa mengenai job ini. Job sudah
+                    # di-rollback, jalankan sekali lagi.
+                    logger.info(f"Job database {key or job_id} terkena pembatalan job lain, diulang")
+                    result = self._execute(func)
+                    if result is _CANCELED:
+                        raise QueryCanceledError(f"Job database {key or job_id} dibatalkan")
+                self.results.put((job_id, key, callback, result, None))
+            except Exception as e:
+                self._rollback()
+                if (isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+                        and not isinstance(e, QueryCanceledError)):
+                    # Koneksi putus: buat ulang pada job berikutnya
+                    self._close_connection()
+                if errback is None:
+                    logger.error(f"Job database {key or job_id} gagal: {e}")
+                self.results.put((job_id, key, errback, None, e))
+            finally:
+                with self._lock:
+                    self._running = None
+
+    def _execute(self, func):
+        """func(conn) lalu commit; _CANCELED jika query dibatalkan"""
+        if self._conn is None or self._conn.closed:
+            self._conn = self._connect()
+        try:
+            result = func(self._conn)
+            self._conn.commit()
+            return result
+        except QueryCanceledError:
+            self._rollback()
+            return _CANCELED
+
+    def _rollback(self):
+        try:
+            if self._conn is not None and not self._conn.closed:
+                self._conn.rollback()
+        except Exception:
+            self._close_connection()
+
+    def _close_connection(self):
+        try:
+            if self._conn is not None:
+                self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def dispatch(self, limit=50):
+        """Jalankan callback untuk hasil yang sudah selesai (panggil dari thread GUI)"""
+        for _ in range(limit):
+            try:
+                job_id, key, handler, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if self._is_stale(job_id, key) or handler is None:
+                continue
+            try:
+                handler(error if error is not None else result)
+            except Exception as e:
+                logger.error(f"Error di callback job {job_id}: {e}")
+
+    def stop(self, timeout=5):
+        self._jobs.put(None)
+        self._thread.join(timeout=timeout)
+        self._close_connection()
@@ -0,0 +1,113 @@
+"""
+Inisialisasi perangkat gerbang secara paralel dengan batas waktu per perangkat.
+
+Sebelumnya kamera, tombol, printer dan database disiapkan satu per satu di
+__init__, jadi setelah listrik padam gerbang baru bisa mengeluarkan tiket
+setelah semua probe selesai (probe kamera dan scan port serial saja bisa
+puluhan detik). DeviceInitializer menjalankan setiap setup di thread daemon
+sendiri. Pemanggil hanya menunggu perangkat yang dibutuhkan untuk mengeluarkan
+tiket (printer dan tombol) sampai batas waktunya. Perangkat yang melewati
+batas waktu ditandai 'timeout' dan tetap diselesaikan di background; statusnya
+berubah menjadi 'ready' begitu setup selesai.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger('device_init')
+
+PENDING = 'pending'
+READY = 'ready'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+
+class DeviceInitializer:
+    """Setup perangkat paralel; status per perangkat bisa dibaca kapan saja"""
+
+    def __init__(self, on_change=None):
+        """
+        Args:
+            on_change: callback(name, status) setiap status perangkat berubah
+        """
+        self.on_change = on_change
+        self._devices = {}
+        self._lock = threading.Lock()
+
+    def start(self, name, setup, timeout):
+        """Jalankan setup() di thread sendiri dengan batas waktu `timeout` detik"""
+        device = {
+            'status': PENDING,
+            'started': time.monotonic(),
+            'deadline': time.monotonic() + timeout,
+            'elapsed': None,
+            'error': None,
+            'done': threading.Event(),
+        }
+        with self._lock:
+            self._devices[name] = device
+        # Thread daemon, bukan executor: setup yang macet tidak boleh
+        # menahan proses saat keluar
+        thread = threading.Thread(target=self._run, args=(name, setup, device),
+                                  name=f'init-{name}', daemon=True)
+        thread.start()
+
+    def _run(self, name, setup, device):
+        try:
+            setup()
+            status = READY
+        except Exception as e:
+            logger.error(f"Inisialisasi {name} gagal: {e}")
+            device['error'] = str(e)
+            status = FAILED
+        device['elapsed'] = time.monotonic() - device['started']
+        previous = self._set_status(name, device, status)
+        device['done'].set()
+        if previous == TIMEOUT:
+            logger.info(f"Inisialisasi {name} selesai terlambat ({device['elapsed']:.1f}s): {status}")
+        else:
+            logger.info(f"Inisialisasi {name} selesai dalam {device['elapsed']:.2f}s: {status}")
+
+    def _set_status(self, name, device, status, expect=None):
+        """Ubah status (hanya dari `expect` jika diberikan); kembalikan status lama"""
+        with self._lock:
+            previous = device['status']
+            if previous == status or (expect is not None and previous != expect):
+                return previous
+            device['status'] = status
+        if self.on_change:
+            try:
+                self.on_change(name, status)
+            except Exception as e:
+                logger.error(f"Error callback status {name}: {e}")
+        return previous
+
+    def wait(self, *names):
+        """Tunggu perangkat sampai selesai atau batas waktunya habis
+
+        Returns:
+            True jika semua perangkat selesai (ready atau failed)
+        """
+        finished = True
+        for name in names:
+            device = self._devices[name]
+            remaining = device['deadline'] - time.monotonic()
+            if not device['done'].wait(max(remaining, 0)):
+                if self._set_status(name, device, TIMEOUT, expect=PENDING) == PENDING:
+                    logger.warning(f"Inisialisasi {name} melewati batas waktu, dilanjutkan di background")
+                finished = False
+        return finished
+
+    def status(self, name):
+        device = self._devices.get(name)
+        return device['status'] if device else None
+
+    def is_ready(self, name):
+        return self.status(name) == READY
+
+    def summary(self):
+        """{nama: (status, detik)} untuk ditampilkan di layar operator"""
+        with self._lock:
+            return {
+                name: (device['status'], device['elapsed'])
+                for name, device in self._devices.items()
+            }
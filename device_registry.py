@@ -0,0 +1,278 @@
+"""
+Registry perangkat gerbang: Arduino (port serial), printer dan kamera lokal.
+
+Sebelumnya setiap start dan reconnect membuka dan mem-probe COM1..COM10 satu
+per satu (sekitar 3 detik per port karena Arduino reset saat port dibuka).
+Nama port COM juga bisa berubah setelah USB reset atau kabel dicolok ke port
+lain, sehingga arduino_port.txt sering menunjuk port yang salah.
+
+DeviceRegistry menyimpan identitas terakhir yang berhasil di
+device_registry.json:
+
+    arduino  - USB VID/PID/serial number + nama port terakhir
+    printer  - nama printer Windows
+    camera   - index kamera lokal
+
+Saat start/reconnect identitas tersimpan dicek lebih dulu. Port serial dengan
+VID/PID/serial number yang sama langsung dibuka tanpa handshake (beberapa
+milidetik). Hanya jika tidak ada yang cocok, port lain diprobe paralel.
+"""
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+import serial.tools.list_ports
+
+logger = logging.getLogger('device_registry')
+
+REGISTRY_FILE = 'device_registry.json'
+
+# Deskripsi port yang kemungkinan besar Arduino, diprobe lebih dulu
+ARDUINO_HINTS = ('arduino', 'ch340', 'usb serial', 'usb-serial')
+
+# Dipakai jika enumerasi port tidak mengembalikan apa pun
+FALLBACK_PORTS = [f'COM{number}' for number in range(1, 11)]
+
+def looks_like_arduino(port):
+    description = (getattr(port, 'description', '') or '').lower()
+    return any(hint in description for hint in ARDUINO_HINTS)
+
+def port_identity(port):
+    """Identitas USB port serial (VID/PID/serial number kosong untuk port non-USB)"""
+    return {
+        'device': port.device,
+        'vid': getattr(port, 'vid', None),
+        'pid': getattr(port, 'pid', None),
+        'serial_number': getattr(port, 'serial_number', None),
+        'description': getattr(port, 'description', None),
+    }
+
+class _NamedPort:
+    """Port dari FALLBACK_PORTS (tanpa info USB)"""
+
+    def __init__(self, device):
+        self.device = device
+        self.description = ''
+        self.vid = self.pid = self.serial_number = None
+
+def _close_quietly(handle):
+    try:
+        if handle is not None and hasattr(handle, 'close'):
+            handle.close()
+    except Exception:
+        pass
+
+class DeviceRegistry:
+    """Identitas perangkat terakhir yang berhasil, disimpan ke file JSON"""
+
+    def __init__(self, path=REGISTRY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Registry perangkat {self.path} tidak bisa dibaca, dibuat ulang: {e}")
+            return {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, role):
+        with self._lock:
+            entry = self._entries.get(role)
+            return dict(entry) if entry else None
+
+    def remember(self, role, **identity):
+        """Simpan identitas perangkat yang baru saja berhasil dipakai"""
+        with self._lock:
+            entry = {key: value for key, value in identity.items() if value is not None}
+            previous = self._entries.get(role, {})
+            if {k: v for k, v in previous.items() if k != 'verified_at'} == entry:
+                return
+            entry['verified_at'] = datetime.now().isoformat(timespec='seconds')
+            self._entries[role] = entry
+            try:
+                self._save()
+            except OSError as e:
+                logger.warning(f"Gagal menyimpan registry perangkat: {e}")
+
+    def forget(self, role):
+        with self._lock:
+            if self._entries.pop(role, None) is not None:
+                self._save()
+
+    # Port serial
+
+    def _match_rank(self, known, port):
+        """0 = VID/PID/serial sama, 1 = VID/PID sama, 2 = nama port sama, None = tidak cocok"""
+        if not known:
+            return None
+        if known.get('vid') is not None and (known.get('vid'), known.get('pid')) == (port.vid, port.pid):
+            if known.get('serial_number') and known['serial_number'] == port.serial_number:
+                return 0
+            return 1
+        if known.get('device') == port.device:
+            return 2
+        return None
+
+    def rank_ports(self, role, ports=None, match=None):
+        """Urutkan port untuk role
+
+        Returns:
+            (known, others): known berisi (rank, port) yang cocok dengan
+            identitas tersimpan, others port lain yang lolos `match`
+            (port mirip Arduino lebih dulu)
+        """
+        if ports is None:
+            ports = list(serial.tools.list_ports.comports())
+            if not ports:
+                ports = [_NamedPort(device) for device in FALLBACK_PORTS]
+        known_identity = self.get(role)
+        known, others = [], []
+        for port in ports:
+            rank = self._match_rank(known_identity, port)
+            if rank is not None:
+                known.append((rank, port))
+            elif match is None or match(port):
+                others.append(port)
+        known.sort(key=lambda item: item[0])
+        others.sort(key=lambda port: not looks_like_arduino(port))
+        return known, others
+
+    def find_port(self, role, match=looks_like_arduino):
+        """Nama port untuk role tanpa membuka port (identitas tersimpan dulu)"""
+        known, others = self.rank_ports(role, match=match)
+        if known:
+            return known[0][1].device
+        return others[0].device if others else None
+
+    def remember_serial(self, role, device, ports=None):
+        """Simpan identitas USB dari nama port yang berhasil dibuka"""
+        if ports is None:
+            ports = list(serial.tools.list_ports.comports())
+        for port in ports:
+            if port.device == device:
+                self.remember(role, **port_identity(port))
+                return
+        self.remember(role, device=device)
+
+    def find_serial(self, role, probe, quick_probe=None, match=None, workers=8):
+        """Cari dan buka perangkat serial untuk role
+
+        Args:
+            probe: probe(device) -> handle terbuka (mis. serial.Serial) atau
+                None; dipakai untuk port yang belum terverifikasi
+            quick_probe: dipakai sebagai ganti probe untuk port dengan
+                VID/PID/serial number yang sama persis (tanpa handshake)
+            match: filter port yang boleh diprobe jika identitas tersimpan
+                tidak ditemukan
+
+        Returns:
+            (device, handle) atau (None, None)
+        """
+        ports = list(serial.tools.list_ports.comports())
+        known, others = self.rank_ports(role, ports or None, match=match)
+
+        # 1. Identitas tersimpan, berurutan dari yang paling cocok
+        for rank, port in known:
+            check = quick_probe if rank == 0 and quick_probe else probe
+            handle = self._try_probe(check, port.device)
+            if handle is not None:
+                logger.info(f"{role} ditemukan di {port.device} (identitas tersimpan)")
+                self.remember_serial(role, port.device, ports)
+                return port.device, handle
+
+        # 2. Port lain diprobe paralel; yang pertama berhasil dipakai
+        tried = {port.device for _, port in known}
+        candidates = [port for port in others if port.device not in tried]
+        if not candidates:
+            return None, None
+        logger.info(f"Probe paralel {role} di {', '.join(port.device for port in candidates)}")
+        device, handle = self._probe_parallel(probe, candidates, workers)
+        if handle is not None:
+            logger.info(f"{role} ditemukan di {device}")
+            self.remember_serial(role, device, ports)
+        return device, handle
+
+    @staticmethod
+    def _try_probe(probe, device):
+        try:
+            return probe(device)
+        except Exception as e:
+            logger.debug(f"Probe {device} gagal: {e}")
+            return None
+
+    def _probe_parallel(self, probe, ports, workers):
+        executor = ThreadPoolExecutor(max_workers=min(workers, len(ports)), thread_name_prefix='port-probe')
+        futures = {executor.submit(self._try_probe, probe, port.device): port.device for port in ports}
+        winner = (None, None)
+        try:
+            for future in as_completed(futures):
+                handle = future.result()
+                if handle is not None:
+                    winner = (futures[future], handle)
+                    break
+        finally:
+            # Handle lain yang ikut berhasil setelah pemenang ditutup lagi
+            for future in futures:
+                if future.done():
+                    if future.result() is not winner[1]:
+                        _close_quietly(future.result())
+                else:
+                    future.add_done_callback(lambda done: _close_quietly(done.result()))
+            executor.shutdown(wait=False)
+        return winner
+
+    # Printer dan kamera
+
+    def find_printer(self, win32print, role='printer', prefer=()):
+        """Nama printer yang bisa dibuka: tersimpan, lalu yang cocok `prefer`, lalu default
+
+        Args:
+            win32print: modul win32print (atau penggantinya)
+            prefer: potongan nama printer yang diutamakan, mis. ('EPSON', 'TM-T')
+        """
+        known = self.get(role)
+        candidates = [known['name']] if known and known.get('name') else []
+        if prefer:
+            try:
+                names = [printer[2] for printer in win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL, None, 1)]
+            except Exception as e:
+                logger.warning(f"Gagal enumerasi printer: {e}")
+                names = []
+            candidates += [name for name in names if any(p in name.upper() for p in prefer)]
+        try:
+            candidates.append(win32print.GetDefaultPrinter())
+        except Exception as e:
+            logger.warning(f"Gagal membaca default printer: {e}")
+
+        for name in dict.fromkeys(name for name in candidates if name):
+            try:
+                handle = win32print.OpenPrinter(name)
+                win32print.ClosePrinter(handle)
+            except Exception as e:
+                logger.debug(f"Printer {name} tidak bisa dibuka: {e}")
+                continue
+            self.remember(role, name=name)
+            return name
+        return None
+
+    def camera_indices(self, role='camera', count=4):
+        """Index kamera lokal dengan index terakhir yang berhasil di depan"""
+        indices = list(range(count))
+        known = self.get(role)
+        if known and known.get('index') in indices:
+            indices.remove(known['index'])
+            indices.insert(0, known['index'])
+        return indices
@@ -4,6 +4,7 @@ import logging
 import os
 from datetime import datetime
 import win32print
+from device_registry import DeviceRegistry, looks_like_arduino
 
 def setup_logging():
     if not os.path.exists('logs'):
@@ -27,9 +28,15 @@ def scan_serial_ports():
     ports = list(serial.tools.list_ports.comports())
     if ports:
         logging.info("Found serial ports:")
+        known, _ = DeviceRegistry().rank_ports('arduino', ports)
+        registered = {port.device for _, port in known}
         for port in ports:
             logging.info(f"- {port.device}: {port.description}")
-            if "Arduino" in port.description:
+            if port.vid is not None:
+                logging.info(f"  VID:PID {port.vid:04X}:{port.pid:04X}, serial {port.serial_number}")
+            if port.device in registered:
+                logging.info(f"  ✅ Registered Arduino device: {port.device}")
+            elif looks_like_arduino(port):
                 logging.info(f"  ✅ Likely Arduino device: {port.device}")
     else:
         logging.warning("No serial ports found")
@@ -0,0 +1,109 @@
+"""
+Deteksi capture duplikat (tombol ditekan dua kali untuk kendaraan yang sama).
+
+Setiap capture disimpan sebagai thumbnail grayscale kecil dan dHash 64-bit
+dalam ring buffer numpy. Frame baru dibandingkan dengan seluruh buffer
+sekaligus (Hamming distance dan mean absolute difference tervektorisasi),
+jadi pengecekan hanya butuh beberapa mikrodetik setelah downscale.
+
+Perbandingan memakai seluruh frame, sehingga dua kendaraan berbeda dengan
+warna mirip bisa ikut dianggap duplikat. Hasilnya hanya untuk menandai
+capture, bukan untuk menolak tiket.
+"""
+import logging
+import time
+from lazy_import import lazy_module
+
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+
+logger = logging.getLogger('duplicate_detector')
+
+THUMB_SIZE = 32
+
+def dhash(gray):
+    """Difference hash 64-bit dari citra grayscale"""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return np.packbits(bits).view('>u8')[0]
+
+class DuplicateDetector:
+    """Ring buffer capture terakhir untuk menandai frame yang hampir identik"""
+
+    def __init__(self, min_diff=0.15, max_hamming=6, window_seconds=30, history=8):
+        """
+        Args:
+            min_diff: selisih rata-rata piksel minimum (0-1) agar frame dianggap berbeda
+            max_hamming: jarak Hamming dHash maksimum untuk dianggap mirip
+            window_seconds: hanya bandingkan dengan capture dalam jendela waktu ini
+            history: jumlah capture yang disimpan
+        """
+        self.min_diff = min_diff
+        self.max_hamming = max_hamming
+        self.window_seconds = window_seconds
+        self.history = history
+
+        self._thumbs = np.zeros((history, THUMB_SIZE, THUMB_SIZE), dtype=np.uint8)
+        self._hashes = np.zeros(history, dtype=np.uint64)
+        self._times = np.zeros(history, dtype=np.float64)
+        self._count = 0
+        self._pos = 0
+
+    @staticmethod
+    def _prepare(frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        # Downscale dulu agar hash dan thumbnail murah dihitung
+        small = cv2.resize(gray, (64, 64), interpolation=cv2.INTER_AREA)
+        thumb = cv2.resize(small, (THUMB_SIZE, THUMB_SIZE), interpolation=cv2.INTER_AREA)
+        return thumb, dhash(small)
+
+    def compare(self, frame, now=None):
+        """Bandingkan frame dengan buffer tanpa menyimpannya
+
+        Returns:
+            (is_duplicate, hamming_terdekat, mean_diff_terdekat)
+        """
+        thumb, frame_hash = self._prepare(frame)
+        return self._compare(thumb, frame_hash, now if now is not None else time.time())
+
+    def _compare(self, thumb, frame_hash, now):
+        n = min(self._count, self.history)
+        if n == 0:
+            return False, None, None
+
+        recent = (now - self._times[:n]) <= self.window_seconds
+        if not recent.any():
+            return False, None, None
+
+        xor = np.bitwise_xor(self._hashes[:n][recent], np.uint64(frame_hash))
+        hamming = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        diffs = np.abs(
+            self._thumbs[:n][recent].astype(np.int16) - thumb.astype(np.int16)
+        ).mean(axis=(1, 2)) / 255.0
+
+        best = int(np.argmin(diffs))
+        is_duplicate = bool(((hamming <= self.max_hamming) & (diffs < self.min_diff)).any())
+        return is_duplicate, int(hamming[best]), float(diffs[best])
+
+    def add(self, frame, now=None):
+        """Simpan frame ke ring buffer"""
+        thumb, frame_hash = self._prepare(frame)
+        self._add(thumb, frame_hash, now if now is not None else time.time())
+
+    def _add(self, thumb, frame_hash, now):
+        self._thumbs[self._pos] = thumb
+        self._hashes[self._pos] = frame_hash
+        self._times[self._pos] = now
+        self._pos = (self._pos + 1) % self.history
+        self._count += 1
+
+    def check_and_add(self, frame, now=None):
+        """Cek duplikat; frame yang bukan duplikat langsung disimpan ke buffer"""
+        now = now if now is not None else time.time()
+        thumb, frame_hash = self._prepare(frame)
+        is_duplicate, hamming, diff = self._compare(thumb, frame_hash, now)
+        if is_duplicate:
+            logger.warning(f"Capture duplikat terdeteksi (hamming={hamming}, diff={diff:.3f})")
+        else:
+            self._add(thumb, frame_hash, now)
+        return is_duplicate
@@ -0,0 +1,415 @@
+"""
+Satu proses untuk beberapa jalur masuk (mis. dua palang di satu PC kiosk).
+
+Sebelumnya setiap jalur menjalankan ParkingCamera sendiri, masing-masing
+dengan koneksi database, counter file, registry perangkat dan endpoint metrik
+sendiri. EntryLaneController menjalankan N jalur dalam satu proses di atas
+satu event loop asyncio:
+
+    per jalur   kamera, Arduino, printer, folder capture, encoder, antrian
+                tombol dan thread worker sendiri, sehingga cetak tiket di
+                jalur 1 tidak menahan jalur 2
+    bersama     pool koneksi PostgreSQL, counter nomor tiket, registry
+                perangkat dan endpoint /metrics (label lane per jalur)
+
+Konfigurasi di config.ini:
+
+    [lanes]
+    names = masuk-1, masuk-2
+    keys = 1, 2            ; tombol keyboard per jalur (default 1, 2, ...)
+    queue_size = 2         ; tekan tombol yang boleh menunggu per jalur
+
+    [lane:masuk-1]
+    camera.ip = 192.168.2.20
+    button.port = COM3
+    printer.name = EPSON TM-T82 A
+
+    [lane:masuk-2]
+    camera.ip = 192.168.2.21
+    button.port = COM4
+    printer.name = EPSON TM-T82 B
+
+Kunci "bagian.opsi" di [lane:<nama>] mengganti opsi yang sama di config.ini
+untuk jalur itu saja. Tanpa storage.capture_dir, capture jalur disimpan di
+subfolder <capture_dir>/<nama>.
+"""
+import asyncio
+import configparser
+import logging
+import msvcrt
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from counter_store import CounterStore
+from device_registry import DeviceRegistry
+from gate_metrics import MetricsServer, metrics_endpoint
+from lazy_import import lazy_module
+from parking_camera_windows import ParkingCamera
+
+logger = logging.getLogger('entry_lanes')
+
+psycopg2_pool = lazy_module('psycopg2.pool')
+
+# Jeda sebelum mencoba membuat pool lagi setelah database tidak bisa dihubungi
+POOL_RETRY_DELAY = 30
+
+class SharedServices:
+    """Sumber daya yang dipakai bersama semua jalur dalam satu proses"""
+
+    def __init__(self, config, base_dir, lane_count):
+        self.config = config
+        self.counter_store = CounterStore(os.path.join(base_dir, config['system']['counter_file']))
+        self.device_registry = DeviceRegistry(os.path.join(
+            base_dir, config['system'].get('device_registry', 'device_registry.json')
+        ))
+        self.db_config = config['database'] if config.has_section('database') else None
+        # Satu koneksi per jalur ditambah cadangan untuk reconnect
+        self.db_pool_size = lane_count + 1
+        self.serial_lock = threading.Lock()
+        self._pool = None
+        self._pool_retry_at = 0
+        self._pool_lock = threading.Lock()
+        self._tables_checked = False
+        self._claimed_ports = {}
+        self._lock = threading.Lock()
+
+    # Database
+
+    def acquire_db(self):
+        """Pinjam koneksi dari pool, atau None jika database tidak tersedia"""
+        if not self.db_config:
+            return None
+        # Lock sendiri: pembuatan pool bisa menunggu connect timeout
+        with self._pool_lock:
+            if self._pool is None:
+                if time.monotonic() < self._pool_retry_at:
+                    return None
+                try:
+                    self._pool = psycopg2_pool.ThreadedConnectionPool(
+                        1, self.db_pool_size,
+                        dbname=self.db_config['dbname'],
+                        user=self.db_config['user'],
+                        password=self.db_config['password'],
+                        host=self.db_config['host'],
+                        connect_timeout=10
+                    )
+                    logger.info(f"Pool database dibuat (maksimal {self.db_pool_size} koneksi)")
+                except Exception as e:
+                    logger.warning(f"Gagal membuat pool database: {str(e)}")
+                    self._pool_retry_at = time.monotonic() + POOL_RETRY_DELAY
+                    return None
+            pool = self._pool
+        try:
+            connection = pool.getconn()
+            connection.autocommit = False
+            return connection
+        except Exception as e:
+            logger.warning(f"Gagal mengambil koneksi dari pool: {str(e)}")
+            return None
+
+    def release_db(self, connection, broken=False):
+        """Kembalikan koneksi ke pool; koneksi rusak ditutup"""
+        with self._pool_lock:
+            pool = self._pool
+        if pool is None:
+            return
+        try:
+            pool.putconn(connection, close=broken or bool(connection.closed))
+        except Exception as e:
+            logger.warning(f"Gagal mengembalikan koneksi ke pool: {str(e)}")
+
+    def ensure_tables(self, create_tables):
+        """Jalankan create_tables sekali untuk semua jalur"""
+        with self._lock:
+            if self._tables_checked:
+                return
+            self._tables_checked = True
+        create_tables()
+
+    # Port serial
+
+    def claim_port(self, port, lane):
+        with self._lock:
+            for claimed, owner in list(self._claimed_ports.items()):
+                if owner == lane:
+                    del self._claimed_ports[claimed]
+            self._claimed_ports[port] = lane
+
+    def ports_claimed_by_others(self, lane):
+        with self._lock:
+            return {port for port, owner in self._claimed_ports.items() if owner != lane}
+
+    def close(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.closeall()
+        self.counter_store.close()
+
+class EntryLane(ParkingCamera):
+    """ParkingCamera untuk satu jalur dengan sumber daya bersama dari SharedServices"""
+
+    def __init__(self, name, shared):
+        self.name = name
+        self.shared = shared
+        self._pool_conn = None
+        # Counter nomor tiket dipakai bersama, sehingga nomor unik lintas jalur
+        self.counter_store = shared.counter_store
+        super().__init__()
+        # Keyboard dibaca EntryLaneController dan diteruskan ke jalur sesuai tombol
+        self.keyboard_enabled = False
+
+    def load_config(self):
+        super().load_config()
+        section = f'lane:{self.name}'
+        values = {'storage.capture_dir': os.path.join(self.config['storage']['capture_dir'], self.name)}
+        if self.config.has_section(section):
+            values.update(self.config[section])
+        # Endpoint metrik disajikan controller untuk semua jalur sekaligus
+        values.update({'metrics.entry_port': '0', 'metrics.lane': self.name})
+
+        for key, value in values.items():
+            target, _, option = key.partition('.')
+            if not option:
+                logger.warning(f"Opsi {key} di [{section}] diabaikan (format: bagian.opsi)")
+                continue
+            if not self.config.has_section(target):
+                self.config.add_section(target)
+            self.config[target][option] = value
+
+    def open_device_registry(self):
+        return self.shared.device_registry
+
+    def device_role(self, device):
+        return f"{device}:{self.name}"
+
+    # Tombol: port yang sudah dipakai jalur lain tidak ikut diprobe
+
+    def _arduino_port_filter(self):
+        configured = super()._arduino_port_filter()
+        claimed = self.shared.ports_claimed_by_others(self.name)
+        return lambda port: port.device not in claimed and (configured is None or configured(port))
+
+    def setup_button(self):
+        # Probe berurutan antar jalur agar dua jalur tidak membuka port yang sama
+        with self.shared.serial_lock:
+            super().setup_button()
+            if self.button_mode == "arduino":
+                self.shared.claim_port(self.current_port, self.name)
+
+    def reconnect_arduino(self):
+        with self.shared.serial_lock:
+            connected = super().reconnect_arduino()
+            if connected:
+                self.shared.claim_port(self.current_port, self.name)
+            return connected
+
+    # Database: koneksi dipinjam dari pool hanya selama dipakai
+
+    def setup_database(self):
+        super().setup_database()
+        self._release_db()
+
+    def connect_to_database(self):
+        """Ambil koneksi dari pool bersama (setup dan reconnect)"""
+        if not self.db_config:
+            return False
+        self.db_last_connect_attempt = time.time()
+        self._release_db(broken=True)
+        self.db_conn = self._pool_conn = self.shared.acquire_db()
+        if self.db_conn is None or not self.is_db_connected():
+            self._release_db(broken=True)
+            print(f"⚠️ [{self.name}] Gagal koneksi ke database")
+            return False
+        self.db_retry_count = 0
+        self.shared.ensure_tables(self.create_tables)
+        logger.info(f"Jalur {self.name} terkoneksi ke database lewat pool")
+        return True
+
+    def _release_db(self, broken=False):
+        connection, self._pool_conn = self._pool_conn, None
+        self.db_conn = None
+        if connection is not None:
+            self.shared.release_db(connection, broken=broken)
+
+    def _borrow_db(self):
+        """Pinjam koneksi; koneksi idle yang sudah putus (mis. database restart) diganti sekali"""
+        for _ in range(2):
+            self.db_conn = self._pool_conn = self.shared.acquire_db()
+            if self.db_conn is None or self.is_db_connected():
+                return
+            self._release_db(broken=True)
+
+    def save_to_database(self, ticket_number, image_path):
+        # Simpan ulang setelah reconnect memakai koneksi yang sudah dipinjam
+        owner = self._pool_conn is None
+        if owner:
+            self.devices.wait('database')
+            if self.db_config:
+                self._borrow_db()
+        try:
+            return super().save_to_database(ticket_number, image_path)
+        finally:
+            if owner:
+                self._release_db()
+
+    def cleanup(self):
+        # Counter store milik SharedServices, ditutup oleh controller
+        del self.counter_store
+        self._release_db()
+        if self.button is not None:
+            try:
+                self.button.close()
+            except Exception:
+                pass
+        super().cleanup()
+
+class EntryLaneController:
+    """Beberapa jalur masuk dalam satu proses di atas satu event loop"""
+
+    def __init__(self, config_file='config.ini'):
+        config = configparser.ConfigParser()
+        config.read(config_file)
+        names = [name.strip() for name in config.get('lanes', 'names', fallback='').split(',') if name.strip()]
+        if not names:
+            raise Exception("Bagian [lanes] names tidak ditemukan dalam config.ini")
+        keys = [key.strip() for key in config.get('lanes', 'keys', fallback='').split(',') if key.strip()]
+        keys += [str(index + 1) for index in range(len(keys), len(names))]
+        self.queue_size = int(config.get('lanes', 'queue_size', fallback='2'))
+
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.shared = SharedServices(config, base_dir, len(names))
+
+        # Jalur dibuat paralel; masing-masing menunggu printer dan tombolnya sendiri
+        with ThreadPoolExecutor(max_workers=len(names), thread_name_prefix='lane-init') as pool:
+            self.lanes = list(pool.map(lambda name: EntryLane(name, self.shared), names))
+        self.keys = {key.encode(): lane for key, lane in zip(keys, self.lanes)}
+
+        self.metrics_server = None
+        self._loop = None
+        self._queues = {}
+        self._stopped = None
+        self._stop = threading.Event()
+
+    def serve_metrics(self):
+        """Satu endpoint /metrics untuk semua jalur (dibedakan label lane)"""
+        host, port = metrics_endpoint('entry', self.shared.config)
+        if not port:
+            return
+        try:
+            self.metrics_server = MetricsServer([lane.metrics.registry for lane in self.lanes], port, host).start()
+            logger.info(f"Metrik {len(self.lanes)} jalur tersedia di http://{host}:{port}/metrics")
+        except OSError as e:
+            logger.warning(f"Endpoint metrik {host}:{port} tidak bisa dibuka: {e}")
+
+    # Event dari thread pembaca tombol dan keyboard
+
+    def _post(self, lane):
+        self._loop.call_soon_threadsafe(self._enqueue, lane)
+
+    def _enqueue(self, lane):
+        try:
+            self._queues[lane.name].put_nowait(time.time())
+        except asyncio.QueueFull:
+            print(f"\n⚠️ [{lane.name}] Masih memproses tiket sebelumnya, tekan tombol diabaikan")
+            lane.metrics.presses_rejected.inc(reason='queue_full')
+
+    def _button_reader(self, lane):
+        """Thread pembaca pushbutton Arduino satu jalur"""
+        while not self._stop.is_set():
+            if lane.check_button():
+                self._post(lane)
+            time.sleep(lane.button_check_interval)
+
+    def _keyboard_reader(self):
+        """Thread pembaca keyboard; tombol angka memilih jalur"""
+        while not self._stop.is_set():
+            if not msvcrt.kbhit():
+                time.sleep(0.05)
+                continue
+            key = msvcrt.getch()
+            lane = self.keys.get(key)
+            if lane is not None and lane.keyboard_press(f"{key.decode()} ({lane.name})"):
+                self._post(lane)
+
+    async def _lane_worker(self, lane, executor):
+        """Proses tekan tombol satu jalur secara berurutan di thread jalur itu"""
+        queue = self._queues[lane.name]
+        while True:
+            await queue.get()
+            try:
+                await self._loop.run_in_executor(executor, lane.process_button_press)
+            except Exception as e:
+                logger.error(f"Error memproses tombol jalur {lane.name}: {str(e)}")
+
+    def print_status(self):
+        print("""
+================================
+    SISTEM PARKIR RSI BNA
+       (multi-jalur masuk)
+================================
+""")
+        keys = {lane.name: key.decode() for key, lane in self.keys.items()}
+        for lane in self.lanes:
+            print(f"Jalur {lane.name} (tombol keyboard '{keys.get(lane.name, '-')}')")
+            print(f"  Kamera : {lane.connection_status['camera_type'] if lane.devices.is_ready('camera') else 'masih diinisialisasi'}")
+            print(f"  Input  : {'Arduino ' + lane.current_port if lane.button_mode == 'arduino' else 'Keyboard'}")
+            print(f"  Printer: {lane.printer_name if lane.printer_available else 'Tidak Tersedia'}")
+        print("\nStatus: Menunggu input...")
+        print("\n" + "="*32)
+
+    async def run(self):
+        """Jalankan semua jalur sampai stop() dipanggil atau Ctrl+C"""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self.serve_metrics()
+
+        executors = []
+        tasks = []
+        for lane in self.lanes:
+            self._queues[lane.name] = asyncio.Queue(self.queue_size)
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'lane-{lane.name}')
+            executors.append(executor)
+            tasks.append(asyncio.ensure_future(self._lane_worker(lane, executor)))
+            threading.Thread(target=self._button_reader, args=(lane,),
+                             name=f'button-{lane.name}', daemon=True).start()
+        threading.Thread(target=self._keyboard_reader, name='keyboard-reader', daemon=True).start()
+
+        self.print_status()
+        try:
+            await self._stopped.wait()
+        finally:
+            self._stop.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Tiket yang sedang diproses diselesaikan dulu
+            for executor in executors:
+                executor.shutdown(wait=True)
+
+    def stop(self):
+        self._stop.set()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    def cleanup(self):
+        for lane in self.lanes:
+            lane.cleanup()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        self.shared.close()
+
+if __name__ == "__main__":
+    controller = None
+    try:
+        controller = EntryLaneController()
+        asyncio.run(controller.run())
+    except KeyboardInterrupt:
+        print("\nProgram dihentikan dengan Ctrl+C...")
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        logger.error(f"Fatal error: {str(e)}")
+    finally:
+        if controller is not None:
+            controller.cleanup()
@@ -0,0 +1,287 @@
+"""
+Controller gate keluar berbasis asyncio.
+
+ParkingExit.run dulu mengerjakan baca barcode -> process_exit -> buka
+palang secara berurutan, sehingga server yang lambat menahan seluruh jalur
+dan scan yang masuk saat itu bisa hilang. Controller ini memisahkan ketiga
+pekerjaan tersebut: pembaca scanner dan loop detector hanya mengirim event
+ke antrian asyncio, validasi tiket berjalan dengan timeout, dan palang
+digerakkan di executor. Status jalur dibuat eksplisit:
+
+    IDLE -> VEHICLE_PRESENT -> VALIDATING -> OPEN -> CLOSING -> IDLE
+
+Satu validasi hanya membuka palang satu kali. Otorisasi yang belum terpakai
+(palang tertutup otomatis sebelum kendaraan lewat, atau jawaban server yang
+datang setelah timeout) disimpan di cache lokal, sehingga scan ulang tiket
+tersebut langsung membuka palang tanpa menunggu server. Entri cache dibuang
+begitu dipakai, jadi satu tiket tidak bisa mengeluarkan kendaraan kedua.
+"""
+import asyncio
+import logging
+import threading
+import time
+from barcode_token import is_token, normalize_scan
+
+logger = logging.getLogger('exit_lane')
+
+IDLE = 'IDLE'
+VEHICLE_PRESENT = 'VEHICLE_PRESENT'
+VALIDATING = 'VALIDATING'
+OPEN = 'OPEN'
+CLOSING = 'CLOSING'
+
+class ValidationCache:
+    """Otorisasi keluar yang belum dipakai membuka palang, dengan masa berlaku"""
+
+    def __init__(self, ttl=300, max_size=1000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = {}
+
+    def get(self, ticket_id):
+        entry = self._entries.get(ticket_id)
+        if entry is None:
+            return None
+        result, expires_at = entry
+        if time.monotonic() > expires_at:
+            del self._entries[ticket_id]
+            return None
+        return result
+
+    def pop(self, ticket_id):
+        """Ambil dan buang otorisasi (sekali pakai)"""
+        result = self.get(ticket_id)
+        self._entries.pop(ticket_id, None)
+        return result
+
+    def put(self, ticket_id, result):
+        if len(self._entries) >= self.max_size:
+            # Buang entri yang paling cepat kedaluwarsa
+            oldest = min(self._entries, key=lambda key: self._entries[key][1])
+            del self._entries[oldest]
+        self._entries[ticket_id] = (result, time.monotonic() + self.ttl)
+
+class ExitLaneController:
+    """State machine satu jalur keluar di atas ParkingExit"""
+
+    def __init__(self, gate, validate_timeout=None, open_timeout=30.0,
+                 require_vehicle=False, cache=None, replica=None):
+        """
+        Args:
+            gate: ParkingExit (GPIO, scanner dan process_exit)
+            replica: TicketReplica opsional untuk validasi lokal tanpa server;
+                juga dipakai untuk mengubah token barcode menjadi ID tiket
+                sebelum process-exit
+            validate_timeout: batas waktu validasi ke server (detik), default
+                timeout HTTP process-exit agar server tidak mencatat keluar
+                setelah jalur menolak kendaraan
+            open_timeout: palang ditutup jika kendaraan tidak lewat dalam waktu ini
+            require_vehicle: hanya terima scan saat ada kendaraan di loop
+        """
+        self.gate = gate
+        self.validate_timeout = validate_timeout or self._http_timeout()
+        self.open_timeout = open_timeout
+        self.require_vehicle = require_vehicle
+        self.cache = cache or ValidationCache()
+        self.replica = replica
+
+        self.state = IDLE
+        self.current_ticket = None
+        self.current_result = None
+        self.pending_ticket = None
+        self._events = None
+        self._loop = None
+        self._close_task = None
+        self._stop = threading.Event()
+
+    def _http_timeout(self):
+        """Connect + read timeout HTTP process-exit ditambah sedikit kelonggaran"""
+        http = getattr(self.gate, 'http', None)
+        if http is None:
+            return 8.0
+        connect, read = http.timeout_for('/api/process-exit/')
+        return connect + read + 1.0
+
+    def _set_state(self, state):
+        if state != self.state:
+            logger.info(f"Jalur keluar: {self.state} -> {state}")
+            self.state = state
+
+    # Event dari thread lain (callback GPIO, pembaca scanner)
+
+    def _post(self, event, value=None):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._events.put_nowait, (event, value))
+
+    def on_loop_change(self, vehicle_present):
+        """Listener ParkingExit untuk perubahan loop detector"""
+        self._post('loop', vehicle_present)
+
+    def _scanner_reader(self):
+        """Thread pembaca scanner; setiap barcode langsung masuk antrian"""
+        while not self._stop.is_set():
+            try:
+                barcode = self.gate.read_barcode()
+                if barcode:
+                    self._post('scan', barcode)
+                else:
+                    # Belum ada data: tunggu sebentar agar tidak busy loop
+                    time.sleep(0.02)
+            except EOFError:
+                break
+            except Exception as e:
+                logger.error(f"Error pembaca scanner: {e}")
+                time.sleep(1)
+
+    # State machine
+
+    async def _run_blocking(self, func, *args):
+        return await self._loop.run_in_executor(None, func, *args)
+
+    async def _validate(self, ticket_id):
+        """Validasi tiket: otorisasi yang belum terpakai, replika, lalu server"""
+        cached = self.cache.pop(ticket_id)
+        if cached is not None:
+            logger.info(f"Tiket {ticket_id} valid dari otorisasi yang belum terpakai")
+            return True, cached
+
+        if self.replica is not None:
+            # Tiket lunas di replika langsung keluar, data keluar diantrikan
+            status, data = self.replica.validate(ticket_id)
+            if status == 'paid':
+                self.replica.record_exit(data['ticket_id'])
+                logger.info(f"Tiket {ticket_id} valid dari replika lokal")
+                return True, data
+            if status == 'exited':
+                return False, "Tiket sudah digunakan untuk keluar"
+            # unknown/unpaid: replika bisa tertinggal, tanyakan server
+
+        exit_id = ticket_id
+        if self.replica is not None and is_token(normalize_scan(ticket_id)):
+            # process-exit menerima ID tiket, bukan token yang dicetak
+            try:
+                exit_id = await asyncio.wait_for(
+                    self._run_blocking(self.replica.resolve_token, ticket_id), timeout=self.validate_timeout
+                )
+            except Exception as e:
+                logger.warning(f"Gagal mencari token {ticket_id}: {e}")
+                return False, "Server tidak bisa dihubungi untuk mencari tiket"
+            if exit_id is None:
+                return False, "Tiket tidak dikenal"
+
+        # shield: request yang melewati timeout tetap ditunggu hasilnya
+        request = asyncio.ensure_future(self._run_blocking(self.gate.process_exit, exit_id))
+        try:
+            return await asyncio.wait_for(asyncio.shield(request), timeout=self.validate_timeout)
+        except asyncio.TimeoutError:
+            request.add_done_callback(lambda done: self._late_result(ticket_id, done))
+            return False, f"Server tidak merespon dalam {self.validate_timeout:.0f} detik"
+
+    def _late_result(self, ticket_id, request):
+        """Server mencatat keluar setelah jalur menolak: simpan untuk scan ulang"""
+        if request.cancelled() or request.exception() is not None:
+            return
+        success, result = request.result()
+        if success:
+            logger.warning(f"Validasi tiket {ticket_id} berhasil setelah timeout, scan ulang membuka palang")
+            print(f"ℹ️ Tiket {ticket_id} sudah divalidasi server, silakan scan ulang")
+            self.cache.put(ticket_id, result)
+
+    async def _handle_scan(self, ticket_id):
+        if self.state in (VALIDATING, OPEN, CLOSING):
+            if ticket_id != self.current_ticket:
+                # Simpan untuk kendaraan berikutnya, bukan dibuang
+                logger.info(f"Scan {ticket_id} ditunda, jalur sedang {self.state}")
+                self.pending_ticket = ticket_id
+            return
+        if self.require_vehicle and not self.gate.vehicle_detected:
+            print("⚠️ Tidak ada kendaraan di loop detector, scan diabaikan")
+            return
+
+        self.current_ticket = ticket_id
+        self._set_state(VALIDATING)
+        print(f"\n📋 Processing ticket: {ticket_id}")
+        success, result = await self._validate(ticket_id)
+
+        if success:
+            self.current_result = result
+            print("✅ Exit authorized")
+            if isinstance(result, dict):
+                print(f"💰 Fee: Rp {result.get('fee', 0)}")
+            await self._open()
+        else:
+            print(f"❌ Exit failed: {result}")
+            self._release_lane()
+
+    async def _open(self):
+        await self._run_blocking(self.gate.open_barrier)
+        self._set_state(OPEN)
+        self._close_task = asyncio.ensure_future(self._close_after_timeout())
+
+    async def _close_after_timeout(self):
+        await asyncio.sleep(self.open_timeout)
+        if self.state == OPEN:
+            logger.warning("Kendaraan tidak lewat, palang ditutup otomatis")
+            await self._close(passed=False)
+
+    async def _close(self, passed=True):
+        if not passed and self.current_ticket is not None:
+            # Otorisasi belum terpakai: scan ulang tiket yang sama membuka lagi
+            self.cache.put(self.current_ticket, self.current_result or {})
+        if self._close_task is not None and self._close_task is not asyncio.current_task():
+            self._close_task.cancel()
+        self._close_task = None
+        self._set_state(CLOSING)
+        await self._run_blocking(self.gate.close_barrier)
+        self._release_lane()
+
+    def _release_lane(self):
+        """Kembali ke IDLE/VEHICLE_PRESENT dan proses scan yang tertunda"""
+        self.current_ticket = None
+        self.current_result = None
+        self._set_state(VEHICLE_PRESENT if self.gate.vehicle_detected else IDLE)
+        if self.pending_ticket:
+            ticket_id, self.pending_ticket = self.pending_ticket, None
+            asyncio.ensure_future(self._safe(self._handle_scan, 'scan', ticket_id))
+
+    async def _handle_loop(self, vehicle_present):
+        if vehicle_present:
+            if self.state == IDLE:
+                self._set_state(VEHICLE_PRESENT)
+        elif self.state == OPEN:
+            # Kendaraan sudah melewati loop, tutup palang
+            await self._close()
+        elif self.state == VEHICLE_PRESENT:
+            self._set_state(IDLE)
+
+    async def _safe(self, handler, event, value):
+        try:
+            await handler(value)
+        except Exception as e:
+            logger.error(f"Error menangani event {event}: {e}")
+
+    async def run(self):
+        """Jalankan controller sampai stop() dipanggil"""
+        self._loop = asyncio.get_running_loop()
+        self._events = asyncio.Queue()
+        self.gate.loop_listener = self.on_loop_change
+        if self.gate.vehicle_detected:
+            self._set_state(VEHICLE_PRESENT)
+
+        threading.Thread(target=self._scanner_reader, name='scanner-reader', daemon=True).start()
+
+        handlers = {'scan': self._handle_scan, 'loop': self._handle_loop}
+        while not self._stop.is_set():
+            event, value = await self._events.get()
+            if event == 'stop':
+                break
+            # Setiap event jadi task sendiri agar validasi yang lambat tidak
+            # menahan antrian; status diubah sebelum await pertama sehingga
+            # scan kedua saat VALIDATING langsung terlihat dan diabaikan
+            asyncio.ensure_future(self._safe(handlers[event], event, value))
+
+        self.gate.loop_listener = None
+
+    def stop(self):
+        self._stop.set()
+        self._post('stop')
@@ -0,0 +1,705 @@
+"""
+Benchmark latensi gate masuk end-to-end.
+
+Mengukur jalur tombol ditekan -> tiket tercetak -> baris tiket terlihat di
+database secara berulang, memakai kode gate yang sebenarnya:
+
+    camera  ParkingCamera.process_button_press (parking_camera_windows.py)
+    button  ParkingButton._handle_button_press (button_handler.py)
+
+Perangkat diganti tiruan yang bisa diatur: kamera palsu dengan frame pada
+fps tertentu, spooler palsu pengganti win32print dengan waktu cetak per job,
+server /masuk palsu dengan latensi, dan database SQLite lokal (atau
+PostgreSQL scratch lewat --dsn). Setiap tahap dicatat p50/p95/p99 beserta
+throughput, lalu disimpan sebagai JSON di benchmark_results/ agar hasil antar
+rilis bisa dibandingkan:
+
+    python gate_benchmark.py camera --presses 200 --interval 1.0
+    python gate_benchmark.py button --presses 500 --server-latency 30
+    python gate_benchmark.py camera --dsn "dbname=parking_bench user=postgres"
+    python gate_benchmark.py compare benchmark_results/lama.json benchmark_results/baru.json
+"""
+import argparse
+import configparser
+import contextlib
+import itertools
+import json
+import logging
+import math
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger('gate_benchmark')
+
+PERCENTILES = (50, 95, 99)
+RESULTS_DIR = 'benchmark_results'
+
+SQLITE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tickets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ticket_id TEXT UNIQUE NOT NULL,
+        barcode_token TEXT UNIQUE,
+        entry_time TIMESTAMP NOT NULL,
+        exit_time TIMESTAMP,
+        image_path TEXT,
+        status TEXT NOT NULL,
+        vehicle_type TEXT,
+        license_plate TEXT,
+        fee INTEGER DEFAULT 0,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+POSTGRES_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tickets (
+        id SERIAL PRIMARY KEY,
+        ticket_id VARCHAR(50) UNIQUE NOT NULL,
+        entry_time TIMESTAMP NOT NULL,
+        exit_time TIMESTAMP,
+        image_path VARCHAR(255),
+        status VARCHAR(20) NOT NULL,
+        vehicle_type VARCHAR(20),
+        license_plate VARCHAR(20),
+        fee INTEGER DEFAULT 0,
+        created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+    );
+    ALTER TABLE tickets ADD COLUMN IF NOT EXISTS barcode_token VARCHAR(16);
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_tickets_barcode_token ON tickets (barcode_token);
+"""
+
+# Statistik
+
+def percentile(values, pct):
+    """Persentil nearest-rank dari daftar nilai"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+def summarize(samples):
+    """Ringkasan satu tahap dalam milidetik"""
+    summary = {'count': len(samples)}
+    if samples:
+        summary['mean_ms'] = round(sum(samples) / len(samples), 3)
+        for pct in PERCENTILES:
+            summary[f'p{pct}_ms'] = round(percentile(samples, pct), 3)
+        summary['max_ms'] = round(max(samples), 3)
+    return summary
+
+class StageRecorder:
+    """Kumpulan durasi per tahap; method perangkat dibungkus dengan wrap()"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.enabled = False
+        self.press_start = None
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds * 1000.0)
+
+    def wrap(self, obj, name, stage=None):
+        """Ganti obj.name dengan versi yang mencatat durasinya"""
+        original = getattr(obj, name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                if self.enabled:
+                    self.add(stage or name, time.perf_counter() - start)
+
+        setattr(obj, name, timed)
+
+    def summary(self):
+        with self._lock:
+            return {stage: summarize(values) for stage, values in sorted(self.samples.items())}
+
+# Perangkat tiruan
+
+class FakeSpooler:
+    """Pengganti win32print: menampung job RAW dan mensimulasikan waktu cetak
+
+    Args:
+        job_latency: waktu tetap per job (detik), mis. feed + cut kertas
+        bytes_per_second: kecepatan transfer ke printer, None = tanpa batas
+    """
+
+    def __init__(self, job_latency=0.02, bytes_per_second=None):
+        self.job_latency = job_latency
+        self.bytes_per_second = bytes_per_second
+        self.jobs = []
+        self.last_printed = None
+        self._handles = itertools.count(1)
+        self._buffers = {}
+        self._lock = threading.Lock()
+        self._printed = threading.Condition(self._lock)
+
+    def GetDefaultPrinter(self):
+        return 'BENCH-PRINTER'
+
+    def OpenPrinter(self, name):
+        handle = next(self._handles)
+        with self._lock:
+            self._buffers[handle] = bytearray()
+        return handle
+
+    def StartDocPrinter(self, handle, level, info):
+        # Handle dipakai ulang antar job (print_service), buffer per dokumen
+        with self._lock:
+            self._buffers[handle] = bytearray()
+        return handle
+
+    def StartPagePrinter(self, handle):
+        pass
+
+    def WritePrinter(self, handle, data):
+        self._buffers[handle].extend(data)
+        return len(data)
+
+    def EndPagePrinter(self, handle):
+        pass
+
+    def EndDocPrinter(self, handle):
+        size = len(self._buffers.get(handle, b''))
+        delay = self.job_latency
+        if self.bytes_per_second:
+            delay += size / self.bytes_per_second
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self.jobs.append(size)
+            self.last_printed = time.perf_counter()
+            self._printed.notify_all()
+
+    def wait_for_jobs(self, count, timeout):
+        """Tunggu sampai `count` job tercetak (job dicetak thread print_service)"""
+        with self._printed:
+            return self._printed.wait_for(lambda: len(self.jobs) >= count, timeout)
+
+    def ClosePrinter(self, handle):
+        with self._lock:
+            self._buffers.pop(handle, None)
+
+class FakeCamera:
+    """Kamera palsu: frame berbeda setiap read() dengan laju seperti stream RTSP"""
+
+    def __init__(self, width, height, fps=25):
+        import numpy as np
+        self.frame_interval = 1.0 / fps if fps else 0
+        self.frames = 0
+        self._base = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+        self._next_frame = time.perf_counter()
+
+    def read(self):
+        if self.frame_interval:
+            now = time.perf_counter()
+            if self._next_frame > now:
+                time.sleep(self._next_frame - now)
+            self._next_frame = max(self._next_frame, now) + self.frame_interval
+        self.frames += 1
+        frame = self._base.copy()
+        # Penanda agar tiap frame berbeda (deteksi duplikat tidak terpicu)
+        frame[:16, :, :] = self.frames % 256
+        return True, frame
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        pass
+
+class FakeResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self.ok = 200 <= status_code < 300
+        self._data = data
+
+    def json(self):
+        return self._data
+
+class FakeEntryServer:
+    """Pengganti endpoint /masuk: latensi jaringan lalu insert tiket ke database"""
+
+    def __init__(self, database, latency=0.03):
+        self.latency = latency
+        self.conn = database.connect()
+        self._seq = itertools.count(1)
+        self._prefix = datetime.now().strftime('%H%M%S')
+
+    def post(self, path, json=None, headers=None, timeout=None, **kwargs):
+        if timeout is not None and self.latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Server tidak merespon dalam {timeout} detik")
+        time.sleep(self.latency)
+
+        ticket = f"BN{self._prefix}{next(self._seq):06d}"
+        now = datetime.now()
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            INSERT INTO tickets (ticket_id, entry_time, status, vehicle_type, license_plate,
+                                 created_at, updated_at)
+            VALUES (%s, %s, %s, %s, %s, NOW(), NOW())
+        """, (ticket, now, 'ACTIVE', json.get('jenis'), json.get('plat')))
+        self.conn.commit()
+        cursor.close()
+        return FakeResponse(200, {'success': True, 'data': {
+            'plat': json.get('plat'),
+            'jenis': json.get('jenis'),
+            'ticket': ticket,
+            'waktu': now.strftime('%Y-%m-%d %H:%M:%S')
+        }})
+
+    def close(self):
+        self.conn.close()
+
+class FakeHealth:
+    """Pengganti HealthMonitor dengan status server tetap"""
+
+    def __init__(self, online=True):
+        self.is_online = online
+
+    def report_failure(self):
+        pass
+
+    def check_now(self):
+        pass
+
+    def stop(self):
+        pass
+
+# Database
+
+class _SQLiteCursor:
+    def __init__(self, db):
+        self._cursor = db.cursor()
+
+    def execute(self, query, params=()):
+        import psycopg2
+        query = query.replace('%s', '?').replace('NOW()', 'CURRENT_TIMESTAMP')
+        params = tuple(p.isoformat(' ') if isinstance(p, datetime) else p for p in params or ())
+        try:
+            self._cursor.execute(query, params)
+        except sqlite3.IntegrityError as e:
+            # Kode gate menangkap psycopg2.IntegrityError (mis. tabrakan token barcode)
+            raise psycopg2.IntegrityError(str(e)) from e
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def close(self):
+        self._cursor.close()
+
+class SQLiteStandIn:
+    """Koneksi SQLite dengan API psycopg2 secukupnya untuk kode gate"""
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Commit di-fsync seperti PostgreSQL default
+        self._db.execute("PRAGMA synchronous=FULL")
+        self.autocommit = False
+        self.closed = 0
+
+    def cursor(self):
+        return _SQLiteCursor(self._db)
+
+    def executescript(self, script):
+        self._db.executescript(script)
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def close(self):
+        self._db.close()
+        self.closed = 1
+
+class BenchDatabase:
+    """Database benchmark: SQLite lokal, atau PostgreSQL scratch jika dsn diisi"""
+
+    def __init__(self, workdir, dsn=None):
+        self.dsn = dsn
+        self.path = os.path.join(workdir, 'bench.db')
+        conn = self.connect()
+        cursor = conn.cursor()
+        if dsn:
+            cursor.execute(POSTGRES_SCHEMA)
+        else:
+            conn.executescript(SQLITE_SCHEMA)
+        conn.commit()
+        conn.close()
+
+    @property
+    def is_postgres(self):
+        return bool(self.dsn)
+
+    def connect(self):
+        if self.dsn:
+            import psycopg2
+            return psycopg2.connect(self.dsn)
+        return SQLiteStandIn(self.path)
+
+class RowWatcher:
+    """Ukur kapan tiket baru terlihat dari koneksi database lain"""
+
+    def __init__(self, database, poll_interval=0.002, grace=1.0):
+        self.poll_interval = poll_interval
+        self.grace = grace
+        self._deadline = None
+        self.conn = database.connect()
+        if database.is_postgres:
+            self.conn.autocommit = True
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='row-watcher')
+
+    def _max_id(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM tickets")
+        value = cursor.fetchone()[0]
+        cursor.close()
+        if not self.conn.autocommit:
+            # Snapshot baru setiap probe
+            self.conn.rollback()
+        return value
+
+    def arm(self):
+        """Catat id terakhir lalu pantau di background; Future berisi perf_counter saat terlihat"""
+        baseline = self._max_id()
+        self._deadline = None
+        return self._executor.submit(self._wait, baseline)
+
+    def finish(self, future):
+        """Tekan selesai: tunggu paling lama `grace` detik lagi, None jika tidak terlihat"""
+        self._deadline = time.perf_counter() + self.grace
+        return future.result()
+
+    def _wait(self, baseline):
+        while self._deadline is None or time.perf_counter() < self._deadline:
+            if self._max_id() > baseline:
+                return time.perf_counter()
+            time.sleep(self.poll_interval)
+        return None
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.conn.close()
+
+# Target benchmark
+
+def _install_platform_fakes(spooler):
+    """Modul khusus Windows diganti agar benchmark juga jalan di Linux/CI"""
+    try:
+        import win32print  # noqa: F401
+    except ImportError:
+        sys.modules['win32print'] = spooler
+
+def _install_msvcrt_placeholder():
+    """parking_camera_windows mengimpor msvcrt (hanya untuk baca keyboard)"""
+    # counter_store memilih jenis file lock dari ada/tidaknya msvcrt,
+    # jadi harus sudah diimpor sebelum placeholder dipasang
+    import counter_store  # noqa: F401
+    try:
+        import msvcrt  # noqa: F401
+    except ImportError:
+        sys.modules['msvcrt'] = types.ModuleType('msvcrt')
+
+def make_camera_target(args, workdir, spooler, database, recorder):
+    """ParkingCamera dengan kamera, printer dan database tiruan"""
+    _install_msvcrt_placeholder()
+    import parking_camera_windows
+    # Jangan pernah mencetak ke printer sungguhan
+    parking_camera_windows.win32print = spooler
+
+    config = configparser.ConfigParser()
+    config.read_dict({
+        'camera': {'type': 'bench', 'ip': 'bench'},
+        'image': {
+            'width': str(args.width),
+            'height': str(args.height),
+            'quality': '60',
+            'encoder': args.encoder,
+            'encoder_workers': str(args.encoder_workers),
+            'check_similar': 'false'
+        },
+        'storage': {
+            'capture_dir': os.path.join(workdir, 'captures'),
+            'retention_days': '3650'
+        },
+        'system': {
+            'counter_file': os.path.join(workdir, 'counter.txt'),
+            'device_registry': os.path.join(workdir, 'device_registry.json'),
+        },
+        'metrics': {'entry_port': '0'}
+    })
+
+    class BenchCamera(parking_camera_windows.ParkingCamera):
+        def load_config(self):
+            self.config = config
+
+        def setup_camera(self):
+            self.camera = FakeCamera(args.width, args.height, fps=args.fps)
+            self.connection_status['is_connected'] = True
+
+        def setup_button(self):
+            self.button_mode = "keyboard"
+
+        def setup_database(self):
+            self.db_last_connect_attempt = 0
+            self.db_reconnect_delay = 60
+            self.db_max_retry = 3
+            self.db_retry_count = 0
+            self.db_config = {'dbname': 'bench'}
+            self.db_conn = database.connect()
+
+    camera = BenchCamera()
+    # Ukur jalur tombol dengan semua perangkat sudah siap
+    camera.devices.wait('camera', 'database')
+    recorder.wrap(camera, 'capture_image', 'capture')
+    recorder.wrap(camera, 'save_to_database', 'db_insert')
+    recorder.wrap(camera, 'print_ticket', 'print')
+
+    # Foto selesai ditulis encoder (asinkron terhadap tombol)
+    submit = camera.encoder.submit
+
+    def timed_submit(*submit_args, **submit_kwargs):
+        future = submit(*submit_args, **submit_kwargs)
+        if recorder.enabled:
+            start = recorder.press_start
+            future.add_done_callback(lambda _: recorder.add('photo_written', time.perf_counter() - start))
+        return future
+
+    camera.encoder.submit = timed_submit
+    return camera.process_button_press, camera.cleanup
+
+def make_button_target(args, workdir, spooler, database, recorder):
+    """ParkingButton dengan server /masuk, printer dan database tiruan"""
+    import button_handler
+    from counter_store import CounterStore
+    from gate_metrics import GateMetrics
+    from print_service import PrintService, Win32Backend
+    button_handler.win32print = spooler
+    server = FakeEntryServer(database, latency=args.server_latency / 1000.0)
+
+    class BenchButton(button_handler.ParkingButton):
+        def __init__(self):
+            # Tanpa Arduino, health monitor dan koneksi server sungguhan
+            self.terminal = None
+            self.api = None
+            self.metrics = GateMetrics('button', config=configparser.ConfigParser())
+            self.http = server
+            self.health = FakeHealth(online=not args.offline)
+            self.printer_name = spooler.GetDefaultPrinter()
+            self.print_service = PrintService(Win32Backend(self.printer_name, spooler), metrics=self.metrics).start()
+            self.counter_store = CounterStore(os.path.join(workdir, 'counter.txt'), initial=1)
+            self.offline_counter = self._load_counter()
+            self.running = False
+            self.arduino = None
+
+    button = BenchButton()
+    recorder.wrap(button, '_get_ticket_from_server', 'server')
+    recorder.wrap(button, '_print_ticket', 'print')
+
+    def cleanup():
+        button.stop()
+        server.close()
+
+    return button._handle_button_press, cleanup
+
+TARGETS = {
+    'camera': make_camera_target,
+    'button': make_button_target,
+}
+
+# Driver
+
+def run_benchmark(args):
+    workdir = tempfile.mkdtemp(prefix='gate_bench_')
+    spooler = FakeSpooler(
+        job_latency=args.print_latency / 1000.0,
+        bytes_per_second=args.print_bps or None
+    )
+    _install_platform_fakes(spooler)
+    database = BenchDatabase(workdir, dsn=args.dsn)
+    # Mode offline tidak menulis tiket ke database
+    watcher = None if getattr(args, 'offline', False) else RowWatcher(database)
+    recorder = StageRecorder()
+    press, cleanup = TARGETS[args.target](args, workdir, spooler, database, recorder)
+
+    print(f"\n⏱️ Benchmark {args.target}: {args.warmup} warmup + {args.presses} tekan, "
+          f"interval {args.interval}s, database {'PostgreSQL' if database.is_postgres else 'SQLite'}")
+
+    output = None if args.verbose else open(os.devnull, 'w')
+    completed = 0
+    first_start = last_end = None
+    next_press = time.perf_counter()
+    try:
+        for i in range(args.warmup + args.presses):
+            measuring = i >= args.warmup
+            now = time.perf_counter()
+            if next_press > now:
+                time.sleep(next_press - now)
+
+            printed_before = len(spooler.jobs)
+            visible = watcher.arm() if watcher else None
+            recorder.enabled = measuring
+            start = recorder.press_start = time.perf_counter()
+            with contextlib.redirect_stdout(output) if output else contextlib.nullcontext():
+                press()
+            end = time.perf_counter()
+            # Jadwal tetap; jika gate tertinggal, tekan berikutnya langsung
+            next_press = start + args.interval
+            visible_at = watcher.finish(visible) if watcher else None
+
+            if not measuring:
+                continue
+            first_start = first_start or start
+            last_end = end
+            recorder.add('press', end - start)
+            if spooler.wait_for_jobs(printed_before + 1, timeout=5.0):
+                completed += 1
+                recorder.add('printed', spooler.last_printed - start)
+            if visible_at is not None:
+                recorder.add('db_visible', visible_at - start)
+            if args.progress and (i - args.warmup + 1) % args.progress == 0:
+                print(f"  {i - args.warmup + 1}/{args.presses} tekan")
+    finally:
+        # Tunggu encoder/index selesai sebelum statistik dibaca
+        cleanup()
+        if watcher:
+            watcher.close()
+        if output:
+            output.close()
+
+    elapsed = (last_end - first_start) if first_start else 0
+    return {
+        'target': args.target,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'params': {key: value for key, value in vars(args).items() if key not in ('func', 'output')},
+        'presses': args.presses,
+        'completed': completed,
+        'failed': args.presses - completed,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_min': round(completed / elapsed * 60, 2) if elapsed else None,
+        'stages': recorder.summary()
+    }
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+def save_result(result, directory):
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = os.path.join(directory, f"{result['target']}_{stamp}.json")
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+    return path
+
+def print_result(result):
+    print(f"\n📊 {result['target']}: {result['completed']}/{result['presses']} tiket tercetak "
+          f"dalam {result['elapsed_s']}s ({result['throughput_per_min']} tiket/menit)")
+    print(f"{'tahap':<15}{'n':>6}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'max ms':>11}")
+    for stage, stats in result['stages'].items():
+        if not stats['count']:
+            continue
+        print(f"{stage:<15}{stats['count']:>6}{stats['p50_ms']:>11.1f}{stats['p95_ms']:>11.1f}"
+              f"{stats['p99_ms']:>11.1f}{stats['max_ms']:>11.1f}")
+
+def compare_results(baseline_path, current_path, threshold):
+    """Bandingkan dua hasil; True jika ada tahap yang lebih lambat dari threshold (%)"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+
+    print(f"\n📈 {baseline.get('git_commit')} -> {current.get('git_commit')} ({current['target']})")
+    regressed = False
+    for stage, stats in current['stages'].items():
+        old = baseline['stages'].get(stage)
+        if not old or not old.get('count') or not stats.get('count'):
+            continue
+        cells = []
+        for pct in PERCENTILES:
+            key = f'p{pct}_ms'
+            change = (stats[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            mark = ''
+            if change > threshold:
+                mark = ' ▲'
+                regressed = True
+            cells.append(f"p{pct} {old[key]:.1f}->{stats[key]:.1f} ({change:+.0f}%){mark}")
+        print(f"{stage:<15}" + "  ".join(cells))
+
+    if baseline.get('throughput_per_min') and current.get('throughput_per_min'):
+        print(f"{'throughput':<15}{baseline['throughput_per_min']} -> {current['throughput_per_min']} tiket/menit")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark latensi gate masuk end-to-end")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for target in TARGETS:
+        sub = subparsers.add_parser(target, help=f"benchmark target {target}")
+        sub.set_defaults(target=target)
+        sub.add_argument('--presses', type=int, default=100, help="jumlah tekan yang diukur")
+        sub.add_argument('--warmup', type=int, default=5, help="tekan awal yang tidak diukur")
+        sub.add_argument('--interval', type=float, default=1.0,
+                         help="jarak antar tekan (detik); 0 = secepat mungkin")
+        sub.add_argument('--print-latency', type=float, default=20.0, help="waktu cetak per job (ms)")
+        sub.add_argument('--print-bps', type=int, default=0, help="kecepatan transfer printer (byte/detik)")
+        sub.add_argument('--dsn', help="PostgreSQL scratch (tabel tickets akan diisi); default SQLite lokal")
+        sub.add_argument('--output', default=RESULTS_DIR, help="folder hasil JSON")
+        sub.add_argument('--progress', type=int, default=0, help="tampilkan progres setiap N tekan")
+        sub.add_argument('--verbose', action='store_true', help="tampilkan output gate")
+        if target == 'camera':
+            sub.add_argument('--width', type=int, default=1920)
+            sub.add_argument('--height', type=int, default=1080)
+            sub.add_argument('--fps', type=float, default=25.0, help="laju frame kamera palsu")
+            sub.add_argument('--encoder', default='auto', help="backend ImageEncoder")
+            sub.add_argument('--encoder-workers', type=int, default=2)
+        else:
+            sub.add_argument('--server-latency', type=float, default=30.0, help="latensi /masuk (ms)")
+            sub.add_argument('--offline', action='store_true', help="server dianggap offline")
+
+    compare = subparsers.add_parser('compare', help="bandingkan dua hasil JSON")
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=10.0, help="batas regresi (%%)")
+
+    args = parser.parse_args()
+    if args.command == 'compare':
+        sys.exit(1 if compare_results(args.baseline, args.current, args.threshold) else 0)
+
+    result = run_benchmark(args)
+    print_result(result)
+    path = save_result(result, args.output)
+    print(f"\n💾 Hasil disimpan: {path}")
+
+if __name__ == "__main__":
+    main()
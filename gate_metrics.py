@@ -0,0 +1,360 @@
+"""
+Metrik in-process untuk controller gerbang (ParkingCamera, ParkingButton,
+ParkingExit).
+
+Log teks dan print emoji tidak bisa dipakai untuk melihat throughput atau
+jalur yang macet. Modul ini menyimpan counter, gauge dan histogram di memori
+proses dan menyajikannya dalam format teks Prometheus lewat HTTP server kecil
+(GET /metrics). Setiap controller membuat satu GateMetrics; nama metriknya
+sama di semua jalur sehingga bisa dibandingkan lewat label gate dan lane.
+
+Konfigurasi di config.ini (semua opsional):
+
+    [metrics]
+    host = 127.0.0.1
+    entry_port = 9101      ; ParkingCamera
+    button_port = 9102     ; ParkingButton
+    exit_port = 9103       ; ParkingExit
+    lane = masuk-1
+
+Port 0 mematikan endpoint. GATE_METRICS_PORT di environment mengganti port
+dari config.ini.
+"""
+import bisect
+import configparser
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger('gate_metrics')
+
+# Batas bucket histogram durasi (detik)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Port default per jenis controller, supaya bisa jalan bersamaan di satu PC
+DEFAULT_PORTS = {'entry': 9101, 'button': 9102, 'exit': 9103}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_label(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    # repr menjaga presisi penuh (timestamp unix tidak dibulatkan seperti :g)
+    return repr(value) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} butuh label {self.labelnames}, diberi {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """[(suffix, [(label, nilai)], value)] untuk render"""
+        with self._lock:
+            items = list(self._values.items())
+        return [('', list(zip(self.labelnames, key)), value) for key, value in items]
+
+class Counter(_Metric):
+    """Nilai yang hanya bertambah (jumlah tombol, cetak, error)"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counter tidak boleh berkurang")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+class Gauge(_Metric):
+    """Nilai yang bisa naik turun (kedalaman antrian, timestamp terakhir)"""
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_to_current_time(self, **labels):
+        self.set(time.time(), **labels)
+
+    def set_function(self, function):
+        """Nilai dibaca dari function() setiap kali metrik di-render (tanpa label)"""
+        self._function = function
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                return [('', [], self._function())]
+            except Exception as e:
+                logger.debug(f"Gagal membaca gauge {self.name}: {e}")
+                return []
+        return super().samples()
+
+class Histogram(_Metric):
+    """Distribusi durasi dalam bucket kumulatif"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+            state['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            state['sum'] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Catat durasi blok with, juga jika blok melempar exception"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return sum(state['counts']) if state else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state['counts']), state['sum']) for key, state in self._values.items()]
+        result = []
+        for key, counts, total in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                result.append(('_bucket', labels + [('le', '+Inf' if bound == float('inf') else f'{bound:g}')], cumulative))
+            result.append(('_sum', labels, total))
+            result.append(('_count', labels, cumulative))
+        return result
+
+class MetricsRegistry:
+    """Kumpulan metrik satu proses, dengan label konstan (gate, lane)"""
+
+    def __init__(self, const_labels=None):
+        self.const_labels = [(name, value) for name, value in (const_labels or {}).items() if value]
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metrik {name} sudah terdaftar sebagai {metric.kind}")
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self):
+        """Format teks Prometheus (exposition format 0.0.4)"""
+        return render_registries([self])
+
+def render_registries(registries):
+    """Gabungkan beberapa registry (mis. satu per jalur) dalam satu halaman
+
+    HELP/TYPE ditulis sekali per nama metrik, sample setiap registry
+    dibedakan oleh label konstannya.
+    """
+    grouped = {}
+    for registry in registries:
+        for metric in registry.metrics():
+            grouped.setdefault(metric.name, []).append((registry, metric))
+    lines = []
+    for name, entries in grouped.items():
+        first = entries[0][1]
+        lines.append(f"# HELP {name} {first.help}")
+        lines.append(f"# TYPE {name} {first.kind}")
+        for registry, metric in entries:
+            for suffix, labels, value in metric.samples():
+                lines.append(
+                    f"{name}{suffix}{_format_labels(registry.const_labels + labels)} "
+                    f"{_format_value(value)}"
+                )
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registries = ()
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = render_registries(self.registries).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+class MetricsServer:
+    """HTTP server kecil di thread daemon yang menyajikan GET /metrics"""
+
+    def __init__(self, registry, port, host='127.0.0.1'):
+        """
+        Args:
+            registry: MetricsRegistry, atau list registry (controller multi-jalur)
+        """
+        registries = list(registry) if isinstance(registry, (list, tuple)) else [registry]
+        handler = type('MetricsHandler', (_MetricsHandler,), {'registries': registries})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self.address = self._server.server_address
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='metrics-server', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join(timeout=5)
+
+def metrics_endpoint(gate, config=None):
+    """(host, port) endpoint metrik untuk jenis gate; port 0 berarti nonaktif"""
+    if config is None:
+        config = configparser.ConfigParser()
+        config.read('config.ini')
+    section = config['metrics'] if config.has_section('metrics') else {}
+    host = section.get('host', '127.0.0.1')
+    port = os.getenv('GATE_METRICS_PORT') or section.get(f'{gate}_port') or DEFAULT_PORTS.get(gate, 0)
+    return host, int(port)
+
+class GateMetrics:
+    """Set metrik standar controller gerbang"""
+
+    def __init__(self, gate, lane=None, config=None):
+        """
+        Args:
+            gate: jenis controller ('entry', 'button' atau 'exit')
+            lane: nama jalur; default [metrics] lane di config.ini
+            config: ConfigParser yang sudah dibaca, atau None untuk config.ini
+        """
+        if config is None:
+            config = configparser.ConfigParser()
+            config.read('config.ini')
+        self.gate = gate
+        self.config = config
+        if lane is None and config.has_section('metrics'):
+            lane = config['metrics'].get('lane')
+        self.registry = MetricsRegistry({'gate': gate, 'lane': lane})
+        self.server = None
+
+        r = self.registry
+        self.presses = r.counter('parking_presses_total',
+                                 'Tombol/scan yang diterima controller', ['source'])
+        self.presses_rejected = r.counter('parking_presses_rejected_total',
+                                          'Tombol yang ditolak (debounce, terlalu cepat, antrian penuh)', ['reason'])
+        self.last_press = r.gauge('parking_last_press_timestamp_seconds',
+                                  'Waktu unix tombol/scan terakhir diterima')
+        self.captures = r.counter('parking_captures_total', 'Capture kamera per hasil', ['result'])
+        self.capture_seconds = r.histogram('parking_capture_duration_seconds',
+                                           'Durasi capture sampai frame diserahkan ke encoder')
+        self.tickets = r.counter('parking_tickets_total', 'Tiket yang dikeluarkan per mode', ['mode'])
+        self.prints = r.counter('parking_prints_total', 'Job cetak per hasil', ['result'])
+        self.print_seconds = r.histogram('parking_print_duration_seconds', 'Durasi kirim job cetak ke printer')
+        self.print_queue = r.gauge('parking_print_queue_depth', 'Job cetak yang menunggu di antrian')
+        self.printer_condition = r.gauge('parking_printer_condition',
+                                         'Kondisi printer dari status DLE EOT (1 aktif)', ['condition'])
+        self.db_inserts = r.counter('parking_db_inserts_total', 'Insert tiket ke database per hasil', ['result'])
+        self.db_insert_seconds = r.histogram('parking_db_insert_duration_seconds',
+                                             'Durasi insert tiket ke database')
+        self.server_requests = r.histogram('parking_server_request_duration_seconds',
+                                           'Durasi request ke server parkir', ['endpoint'])
+        self.offline_queue = r.gauge('parking_offline_queue_depth',
+                                     'Data yang menunggu dikirim ke server')
+        self.reconnects = r.counter('parking_reconnect_attempts_total',
+                                    'Percobaan reconnect per perangkat dan hasil', ['target', 'result'])
+        self.serial_errors = r.counter('parking_serial_errors_total', 'Error port serial', ['device'])
+        self.barrier_opens = r.counter('parking_barrier_opens_total', 'Palang dibuka')
+        self.server_up = r.gauge('parking_server_up', 'Status server menurut health monitor (1 online)')
+        self.ready = r.gauge('parking_ready', 'Controller siap mengeluarkan tiket (1 siap)')
+        self.device_up = r.gauge('parking_device_up', 'Perangkat selesai diinisialisasi (1 siap)', ['device'])
+        r.gauge('parking_controller_start_time_seconds', 'Waktu unix controller dijalankan').set_to_current_time()
+
+    def press(self, source):
+        """Catat tombol/scan yang diterima"""
+        self.presses.inc(source=source)
+        self.last_press.set_to_current_time()
+
+    def serve(self):
+        """Jalankan endpoint /metrics sesuai config; gagal bind tidak menghentikan controller"""
+        host, port = metrics_endpoint(self.gate, self.config)
+        if not port:
+            return None
+        try:
+            self.server = MetricsServer(self.registry, port, host).start()
+            logger.info(f"Metrik {self.gate} tersedia di http://{host}:{port}/metrics")
+        except OSError as e:
+            logger.warning(f"Endpoint metrik {host}:{port} tidak bisa dibuka: {e}")
+            self.server = None
+        return self.server
+
+    def stop(self):
+        if self.server is not None:
+            self.server.stop()
+            self.server = None
@@ -7,16 +7,10 @@ import logging
 import threading
 import os
 from datetime import datetime
+from log_setup import setup_logging
 
 # Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("parking.log"),
-        logging.StreamHandler()
-    ]
-)
+setup_logging('parking.log', console=True)
 logger = logging.getLogger(__name__)
 
 class GetInTerminal:
@@ -1,10 +1,23 @@
 """
 GPIO Simulator for Windows environment
 This module simulates basic GPIO functionality for testing on Windows
+
+Input pins behave like RPi.GPIO edge detection: changing a pin with
+set_input() fires callbacks registered with add_event_detect() for the
+matching edge, honouring bouncetime. Timed edge sequences can be replayed
+with replay() (or `python gpio_simulator.py sequence.json`) so the exit
+gate logic can be exercised on Linux without hardware or keyboard hooks.
 """
+import json
 import logging
-import keyboard
-from typing import Callable, Optional, Dict
+import threading
+import time
+from typing import Callable, Optional, Dict, List, Tuple
+
+try:
+    import keyboard
+except ImportError:
+    keyboard = None
 
 logger = logging.getLogger(__name__)
 
@@ -31,8 +44,11 @@ PUD_DOWN = "PUD_DOWN"
 
 # Store pin states and callbacks
 _pin_states: Dict[int, int] = {}
-_pin_callbacks: Dict[int, Callable] = {}
+_pin_callbacks: Dict[int, List[Callable]] = {}
+_pin_events: Dict[int, Tuple[str, float]] = {}   # pin -> (edge, bouncetime detik)
+_last_event: Dict[int, float] = {}
 _current_mode = None
+_lock = threading.RLock()
 
 # Map GPIO pins to keyboard keys
 PIN_TO_KEY = {
@@ -42,6 +58,8 @@ PIN_TO_KEY = {
     22: '4'   # Loop detector pin mapped to '4' key
 }
 
+LOOP_DETECTOR_PIN = 22
+
 def setmode(mode: str) -> None:
     """Set GPIO mode (BCM or BOARD)"""
     global _current_mode
@@ -67,44 +85,156 @@ def input(pin: int) -> int:
     """Read input pin state"""
     return _pin_states.get(pin, LOW)
 
-def add_event_detect(pin: int, edge: str, callback: Callable, bouncetime: int = None) -> None:
+def set_input(pin: int, state: int) -> None:
+    """Simulate an external level change on an input pin
+
+    Callbacks run in the calling thread, like the RPi.GPIO event thread.
+    """
+    with _lock:
+        previous = _pin_states.get(pin, LOW)
+        _pin_states[pin] = state
+        if previous == state or pin not in _pin_events:
+            return
+
+        edge, bouncetime = _pin_events[pin]
+        observed = FALLING if state == LOW else RISING
+        if edge != BOTH and edge != observed:
+            return
+
+        now = time.monotonic()
+        if now - _last_event.get(pin, float('-inf')) < bouncetime:
+            logger.debug(f"Edge on pin {pin} ignored (bouncetime)")
+            return
+        _last_event[pin] = now
+        callbacks = list(_pin_callbacks.get(pin, []))
+
+    for callback in callbacks:
+        try:
+            callback(pin)
+        except Exception as e:
+            logger.error(f"Error in callback for pin {pin}: {e}")
+
+def add_event_detect(pin: int, edge: str, callback: Callable = None, bouncetime: int = None) -> None:
     """Add event detection to a pin"""
-    _pin_callbacks[pin] = callback
+    with _lock:
+        _pin_events[pin] = (edge, (bouncetime or 0) / 1000.0)
+        _pin_callbacks[pin] = [callback] if callback else []
+
     key = PIN_TO_KEY.get(pin)
-    if key:
-        keyboard.on_press_key(key, lambda _: _trigger_callback(pin))
+    if key and pin != LOOP_DETECTOR_PIN and _hook_key(key, lambda _: _simulate_press(pin)):
         logger.info(f"Event detection added to pin {pin} (Press '{key}' to trigger)")
     else:
-        logger.warning(f"No key mapping found for pin {pin}")
-
-def _trigger_callback(pin: int) -> None:
-    """Trigger pin callback"""
-    if pin in _pin_callbacks:
-        _pin_callbacks[pin](pin)
+        logger.info(f"Event detection added to pin {pin} ({edge})")
+
+def add_event_callback(pin: int, callback: Callable) -> None:
+    """Add another callback to a pin with event detection"""
+    with _lock:
+        _pin_callbacks.setdefault(pin, []).append(callback)
+
+def remove_event_detect(pin: int) -> None:
+    """Remove event detection from a pin"""
+    with _lock:
+        _pin_events.pop(pin, None)
+        _pin_callbacks.pop(pin, None)
+        _last_event.pop(pin, None)
+
+def _simulate_press(pin: int) -> None:
+    """Simulate a momentary press on an active-low button"""
+    set_input(pin, LOW)
+    set_input(pin, HIGH)
+
+def replay(events, speed: float = 1.0, block: bool = True):
+    """Replay a timed edge sequence
+
+    Args:
+        events: iterable of (seconds_from_start, pin, state)
+        speed: playback speed multiplier (2.0 = twice as fast)
+        block: if False, replay in a background thread and return it
+    """
+    events = sorted((float(t), int(pin), int(state)) for t, pin, state in events)
+
+    def run():
+        start = time.monotonic()
+        for at, pin, state in events:
+            delay = start + at / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            logger.info(f"Replay t={at:.3f}s pin {pin} -> {state}")
+            set_input(pin, state)
+
+    if block:
+        run()
+        return None
+    thread = threading.Thread(target=run, name='gpio-replay', daemon=True)
+    thread.start()
+    return thread
+
+def load_sequence(path: str):
+    """Load an edge sequence from JSON: [[t, pin, state], ...] or [{"t", "pin", "state"}, ...]"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    return [
+        (item['t'], item['pin'], item['state']) if isinstance(item, dict) else tuple(item)
+        for item in data
+    ]
 
 def cleanup() -> None:
     """Cleanup GPIO (reset all pins)"""
-    global _pin_states, _pin_callbacks, _current_mode
-    _pin_states = {}
-    _pin_callbacks = {}
-    _current_mode = None
-    keyboard.unhook_all()
+    global _pin_states, _pin_callbacks, _pin_events, _last_event, _current_mode
+    with _lock:
+        _pin_states = {}
+        _pin_callbacks = {}
+        _pin_events = {}
+        _last_event = {}
+        _current_mode = None
+    if keyboard:
+        try:
+            keyboard.unhook_all()
+        except Exception:
+            pass
     logger.info("GPIO cleanup completed")
 
-# Add loop detector simulation
-keyboard.on_press_key('4', lambda _: _simulate_loop_detector_enter())
-keyboard.on_press_key('5', lambda _: _simulate_loop_detector_exit())
+def _hook_key(key: str, handler: Callable) -> bool:
+    """Register a keyboard hook; False when keyboard hooks are unavailable"""
+    if keyboard is None:
+        return False
+    try:
+        keyboard.on_press_key(key, handler)
+        return True
+    except Exception as e:
+        # Linux tanpa root atau tanpa display: pakai set_input()/replay()
+        logger.warning(f"Keyboard hook unavailable: {e}")
+        return False
 
 def _simulate_loop_detector_enter():
     """Simulate vehicle entering loop detector"""
-    if 22 in _pin_states:  # Loop detector pin
-        _pin_states[22] = LOW
+    if LOOP_DETECTOR_PIN in _pin_states:
         logger.info("Loop detector: Vehicle entered")
         print("🚗 Loop detector: Vehicle entered")
+        set_input(LOOP_DETECTOR_PIN, LOW)
 
 def _simulate_loop_detector_exit():
     """Simulate vehicle exiting loop detector"""
-    if 22 in _pin_states:  # Loop detector pin
-        _pin_states[22] = HIGH
+    if LOOP_DETECTOR_PIN in _pin_states:
         logger.info("Loop detector: Vehicle exited")
-        print("🚗 Loop detector: Vehicle exited") 
\ No newline at end of file
+        print("🚗 Loop detector: Vehicle exited")
+        set_input(LOOP_DETECTOR_PIN, HIGH)
+
+# Add loop detector simulation
+_hook_key('4', lambda _: _simulate_loop_detector_enter())
+_hook_key('5', lambda _: _simulate_loop_detector_exit())
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) < 2:
+        print("Usage: python gpio_simulator.py sequence.json [speed]")
+        sys.exit(1)
+
+    # Print edges as they are replayed
+    sequence = load_sequence(sys.argv[1])
+    for pin in sorted({pin for _, pin, _ in sequence}):
+        setup(pin, IN, pull_up_down=PUD_UP)
+        add_event_detect(pin, BOTH, callback=lambda ch: print(f"⚡ Edge on pin {ch}: {input(ch)}"))
+    replay(sequence, speed=float(sys.argv[2]) if len(sys.argv) > 2 else 1.0)
@@ -0,0 +1,120 @@
+"""
+Health monitor server di background untuk client gate.
+
+Menggantikan GET /test sebelum setiap kendaraan. Thread monitor melakukan
+probe berkala, mencatat status online dan latency, dan memperlambat probe
+secara eksponensial selama server offline. Jalur tombol cukup membaca
+`is_online` yang sudah di-cache.
+"""
+import logging
+import threading
+import time
+import requests
+
+logger = logging.getLogger('health_monitor')
+
+class HealthMonitor:
+    """Probe reachability server dengan exponential backoff"""
+
+    def __init__(self, client, path='/test', interval=5.0, max_interval=60.0,
+                 timeout=(1, 2)):
+        """
+        Args:
+            client: http_client.HttpClient untuk server yang dipantau
+            path: endpoint ringan untuk probe
+            interval: jeda probe saat server online (detik)
+            max_interval: jeda probe maksimum saat server offline (detik)
+        """
+        self.client = client
+        self.path = path
+        self.interval = interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+
+        self.is_online = False
+        self.latency_ms = None
+        self.last_check = None
+        self.last_online = None
+        self.consecutive_failures = 0
+
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Mulai thread probe; probe pertama langsung dijalankan"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='health-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def next_delay(self):
+        """Jeda sampai probe berikutnya"""
+        if self.is_online:
+            return self.interval
+        return min(self.max_interval, self.interval * (2 ** min(self.consecutive_failures, 10)))
+
+    def probe(self):
+        """Satu kali probe ke server, update status dan kembalikan is_online"""
+        start = time.perf_counter()
+        try:
+            # Probe langsung lewat session agar tidak terblokir circuit breaker
+            response = self.client.session.get(self.client.url(self.path), timeout=self.timeout)
+            ok = response.ok
+        except requests.exceptions.RequestException:
+            ok = False
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.last_check = time.time()
+
+        if ok:
+            # Rata-rata bergerak agar satu lonjakan tidak mendominasi
+            self.latency_ms = elapsed_ms if self.latency_ms is None else 0.7 * self.latency_ms + 0.3 * elapsed_ms
+            self.report_success()
+        else:
+            self.report_failure()
+        return self.is_online
+
+    def report_success(self):
+        """Tandai online, juga dipanggil saat request biasa berhasil"""
+        if not self.is_online:
+            logger.info("Server online")
+        self.is_online = True
+        self.last_online = time.time()
+        self.consecutive_failures = 0
+        self.client.breaker.record_success()
+
+    def report_failure(self):
+        """Tandai offline, juga dipanggil saat request biasa gagal"""
+        if self.is_online:
+            logger.warning("Server offline, probe akan diperlambat")
+        self.is_online = False
+        self.consecutive_failures += 1
+
+    def check_now(self):
+        """Minta probe segera tanpa menunggu jadwal"""
+        self._wakeup.set()
+
+    def status(self):
+        return {
+            'is_online': self.is_online,
+            'latency_ms': round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            'last_check': self.last_check,
+            'last_online': self.last_online,
+            'consecutive_failures': self.consecutive_failures,
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.probe()
+            except Exception as e:
+                logger.error(f"Error pada health probe: {str(e)}")
+            self._wakeup.wait(self.next_delay())
+            self._wakeup.clear()
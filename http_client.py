@@ -0,0 +1,205 @@
+"""
+HTTP client bersama untuk semua client REST sistem parkir.
+
+Semua request ke server lewat satu requests.Session per proses sehingga
+koneksi TCP dipakai ulang (keep-alive) dan tidak dibuka ulang per kendaraan.
+Setiap base URL (per kredensial) punya HttpClient sendiri dengan timeout per
+endpoint, retry dengan jitter, dan circuit breaker yang dipakai bersama per
+base URL. Saat breaker terbuka request langsung
+gagal dengan CircuitOpenError (turunan ConnectionError), sehingga fallback
+mode offline yang sudah ada langsung jalan tanpa menunggu connect timeout.
+"""
+import logging
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger('http_client')
+
+# (connect timeout, read timeout) default dalam detik
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Timeout per endpoint, dicocokkan dengan awalan path
+ENDPOINT_TIMEOUTS = {
+    '/api/test': (1, 2),
+    '/test': (1, 2),
+    '/api/masuk': (2, 5),
+    '/masuk': (2, 5),
+    '/api/keluar': (2, 5),
+    '/api/process-exit/': (2, 5),
+    '/api/entry/batch/': (2, 10),
+    '/api/ticket-ids/lease/': (2, 3),
+    '/api/tickets/changes/': (2, 10),
+    '/api/tickets/token/': (1, 2),
+    '/api/exits/batch/': (2, 10),
+}
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Session bersama dengan connection pool keep-alive"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Request ditolak karena server dianggap offline"""
+
+class CircuitBreaker:
+    """Circuit breaker sederhana: closed -> open -> half-open -> closed"""
+
+    def __init__(self, failure_threshold=3, reset_timeout=15):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self.opened_at is not None and time.time() - self.opened_at < self.reset_timeout
+
+    def allow_request(self):
+        """True jika request boleh dikirim (closed, atau half-open untuk percobaan)"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.time() - self.opened_at >= self.reset_timeout:
+                # Half-open: izinkan satu percobaan, buka lagi jika gagal
+                self.opened_at = time.time()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info("Circuit breaker ditutup, server kembali online")
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Circuit breaker dibuka setelah {self.failures} kegagalan")
+                self.opened_at = time.time()
+
+class HttpClient:
+    """Client untuk satu base URL dengan timeout, retry dan circuit breaker"""
+
+    def __init__(self, base_url, retries=2, backoff=0.2, max_backoff=2.0,
+                 timeouts=None, breaker=None, session=None, auth=None):
+        self.base_url = base_url.rstrip('/')
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeouts = dict(ENDPOINT_TIMEOUTS, **(timeouts or {}))
+        self.breaker = breaker or CircuitBreaker()
+        self.session = session or get_session()
+        self.auth = auth
+
+    @property
+    def is_offline(self):
+        return self.breaker.is_open
+
+    def url(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def timeout_for(self, path):
+        # Awalan terpanjang yang cocok menang
+        path = '/' + path.lstrip('/')
+        matches = [prefix for prefix in self.timeouts if path.startswith(prefix)]
+        if not matches:
+            return DEFAULT_TIMEOUT
+        return self.timeouts[max(matches, key=len)]
+
+    def _sleep_before_retry(self, attempt):
+        # Exponential backoff dengan full jitter
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        time.sleep(random.uniform(0, delay))
+
+    def request(self, method, path, retry=None, **kwargs):
+        """Kirim request; retry default hanya untuk method idempotent
+
+        Method non-idempotent (POST) hanya diulang jika koneksi gagal dibuka,
+        karena pada kasus itu request pasti belum sampai ke server.
+        """
+        method = method.upper()
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        kwargs.setdefault('timeout', self.timeout_for(path))
+        if self.auth is not None:
+            kwargs.setdefault('auth', self.auth)
+        url = self.url(path)
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow_request():
+                raise CircuitOpenError(f"Server {self.base_url} offline (circuit breaker terbuka)")
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.ConnectTimeout:
+                self.breaker.record_failure()
+                if attempt >= self.retries:
+                    raise
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.breaker.record_failure()
+                if not retry or attempt >= self.retries:
+                    raise
+            else:
+                if response.status_code >= 500:
+                    self.breaker.record_failure()
+                    if retry and attempt < self.retries:
+                        attempt += 1
+                        self._sleep_before_retry(attempt)
+                        continue
+                else:
+                    self.breaker.record_success()
+                return response
+
+            attempt += 1
+            logger.debug(f"Retry {attempt}/{self.retries} {method} {url}")
+            self._sleep_before_retry(attempt)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+_clients = {}
+_breakers = {}
+_clients_lock = threading.Lock()
+
+def get_client(base_url, auth=None, **kwargs):
+    """HttpClient bersama per (base URL, auth); breaker dipakai bersama per base URL
+
+    Client dengan kredensial berbeda mendapat HttpClient sendiri, sehingga
+    auth tidak pernah hilang karena client untuk URL yang sama sudah dibuat
+    lebih dulu. Opsi lain (timeouts, retries, ...) yang berbeda dari client
+    yang sudah ada ditolak dengan ValueError.
+    """
+    base_url = base_url.rstrip('/')
+    key = (base_url, auth)
+    with _clients_lock:
+        if key not in _clients:
+            options = dict(kwargs)
+            options.setdefault('breaker', _breakers.setdefault(base_url, CircuitBreaker()))
+            _clients[key] = (HttpClient(base_url, auth=auth, **options), kwargs)
+        client, options = _clients[key]
+        conflicts = [name for name, value in kwargs.items() if name not in options or options[name] != value]
+        if conflicts:
+            raise ValueError(f"Client {base_url} sudah dibuat dengan opsi lain: {', '.join(sorted(conflicts))}")
+        return client
@@ -0,0 +1,139 @@
+"""
+Encoder JPEG di thread terpisah untuk capture ParkingCamera.
+
+Frame dari kamera diserahkan ke pool worker sehingga jalur tombol tidak
+menunggu resize, encode dan tulis file. Resize hanya dilakukan jika ukuran
+frame berbeda dari konfigurasi, kualitas mengikuti [image] quality, dan
+metadata capture disisipkan sebagai segmen COM di dalam JPEG (dibaca ulang
+dengan read_metadata) sebagai pengganti file sidecar .jpg.json.
+
+Backend encoder:
+    cv2     - cv2.imencode (default)
+    turbo   - PyTurboJPEG (libjpeg-turbo), jika terpasang
+    pillow  - Pillow / Pillow-SIMD, jika terpasang
+    auto    - turbo jika tersedia, selain itu cv2
+"""
+import json
+import logging
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from lazy_import import lazy_module, module_available
+
+# Diimpor saat encode pertama, bukan saat modul dimuat
+cv2 = lazy_module('cv2')
+turbojpeg = lazy_module('turbojpeg') if module_available('turbojpeg') else None
+Image = lazy_module('PIL.Image') if module_available('PIL') else None
+
+logger = logging.getLogger('image_encoder')
+
+COM_MARKER = b'\xFF\xFE'
+MAX_COM_LENGTH = 65533
+
+def embed_comment(jpeg, data):
+    """Sisipkan segmen COM berisi data tepat setelah marker SOI"""
+    if jpeg[:2] != b'\xFF\xD8':
+        raise ValueError("Data bukan JPEG")
+    if len(data) > MAX_COM_LENGTH:
+        raise ValueError("Metadata terlalu besar untuk segmen COM")
+    return jpeg[:2] + COM_MARKER + struct.pack('>H', len(data) + 2) + data + jpeg[2:]
+
+def read_metadata(path):
+    """Baca metadata JSON dari segmen COM pertama file JPEG, None jika tidak ada"""
+    with open(path, 'rb') as f:
+        head = f.read(4 + MAX_COM_LENGTH + 2)
+    if head[:2] != b'\xFF\xD8' or head[2:4] != COM_MARKER:
+        return None
+    length = struct.unpack('>H', head[4:6])[0]
+    try:
+        return json.loads(head[6:4 + length].decode('utf-8'))
+    except ValueError:
+        return None
+
+class ImageEncoder:
+    """Pool worker untuk resize, encode JPEG dan tulis file capture"""
+
+    def __init__(self, width=None, height=None, quality=60, progressive=False,
+                 optimize=False, backend='auto', workers=2):
+        self.size = (width, height) if width and height else None
+        self.quality = int(quality)
+        self.progressive = progressive
+        self.optimize = optimize
+        self.backend = self._select_backend(backend)
+        self._turbo = turbojpeg.TurboJPEG() if self.backend == 'turbo' else None
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='jpeg-encoder')
+        logger.info(f"Encoder JPEG: {self.backend}, kualitas {self.quality}")
+
+    @staticmethod
+    def _select_backend(backend):
+        if backend == 'auto':
+            return 'turbo' if turbojpeg is not None else 'cv2'
+        if backend == 'turbo' and turbojpeg is None:
+            logger.warning("PyTurboJPEG tidak terpasang, memakai cv2")
+            return 'cv2'
+        if backend == 'pillow' and Image is None:
+            logger.warning("Pillow tidak terpasang, memakai cv2")
+            return 'cv2'
+        return backend
+
+    def _resize(self, frame):
+        # Lewati resize jika frame sudah berukuran sesuai konfigurasi
+        if self.size is None or (frame.shape[1], frame.shape[0]) == self.size:
+            return frame
+        return cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+
+    def encode(self, frame):
+        """Encode frame BGR menjadi bytes JPEG"""
+        if self.backend == 'turbo':
+            flags = turbojpeg.TJFLAG_PROGRESSIVE if self.progressive else 0
+            return self._turbo.encode(frame, quality=self.quality, flags=flags)
+
+        if self.backend == 'pillow':
+            buffer = BytesIO()
+            Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)).save(
+                buffer, 'JPEG', quality=self.quality,
+                progressive=self.progressive, optimize=self.optimize
+            )
+            return buffer.getvalue()
+
+        params = [
+            cv2.IMWRITE_JPEG_QUALITY, self.quality,
+            cv2.IMWRITE_JPEG_PROGRESSIVE, int(self.progressive),
+            cv2.IMWRITE_JPEG_OPTIMIZE, int(self.optimize)
+        ]
+        ok, encoded = cv2.imencode('.jpg', frame, params)
+        if not ok:
+            raise Exception("cv2.imencode gagal")
+        return encoded.tobytes()
+
+    def _write(self, frame, filepath, metadata):
+        frame = self._resize(frame)
+        jpeg = self.encode(frame)
+        if metadata is not None:
+            metadata = dict(metadata, resolution={'width': frame.shape[1], 'height': frame.shape[0]})
+            jpeg = embed_comment(jpeg, json.dumps(metadata, separators=(',', ':')).encode('utf-8'))
+
+        # Tulis ke file sementara lalu rename agar tidak ada JPEG setengah jadi
+        temp_path = filepath + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(jpeg)
+        os.replace(temp_path, filepath)
+        logger.debug(f"Gambar disimpan: {filepath} ({len(jpeg) / 1024:.1f} KB)")
+        return filepath, len(jpeg)
+
+    def submit(self, frame, filepath, metadata=None):
+        """Antrikan frame untuk disimpan; kembalikan Future (filepath, ukuran byte)"""
+        future = self._pool.submit(self._write, frame, filepath, metadata)
+        future.add_done_callback(self._log_error)
+        return future
+
+    @staticmethod
+    def _log_error(future):
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Gagal menyimpan gambar: {str(error)}")
+
+    def shutdown(self, wait=True):
+        """Tunggu antrian encode selesai lalu hentikan worker"""
+        self._pool.shutdown(wait=wait)
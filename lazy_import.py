@@ -0,0 +1,69 @@
+"""
+Import modul berat saat pertama kali dipakai.
+
+cv2, numpy, psycopg2, PIL, barcode dan win32print butuh ratusan milidetik
+sampai beberapa detik untuk diimpor di PC kiosk. Jika diimpor di atas modul,
+semuanya harus selesai sebelum perangkat mulai diinisialisasi. Dengan
+
+    cv2 = lazy_module('cv2')
+
+kode tetap memakai cv2.VideoCapture(...) seperti biasa, tetapi impor baru
+terjadi pada akses atribut pertama, biasanya di thread inisialisasi perangkat
+yang memang membutuhkannya (lihat device_init).
+"""
+import importlib
+import importlib.util
+import threading
+import types
+
+class LazyModule(types.ModuleType):
+    """Proxy modul yang mengimpor modul aslinya pada akses atribut pertama"""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            # Import lock Python menjaga agar modul hanya dimuat sekali
+            module = importlib.import_module(self.__name__)
+            self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_lazy_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+def lazy_module(name):
+    return LazyModule(name)
+
+def module_available(name):
+    """Cek modul terpasang tanpa mengimpornya"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+def preload(*modules):
+    """Impor modul lazy di thread background agar pemakaian pertama tidak menunggu"""
+    def load():
+        for module in modules:
+            try:
+                module._load()
+            except Exception:
+                # Error yang sama akan muncul lagi di tempat modul dipakai
+                pass
+
+    thread = threading.Thread(target=load, name='preload-modules', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,524 @@
+"""
+Load generator jam sibuk untuk server Django parking_manager.
+
+Mensimulasikan banyak gate sekaligus terhadap server lokal: kendaraan datang
+mengikuti profil per jam (proses Poisson), parkir selama waktu tinggal
+log-normal, membayar di kasir lalu keluar. Operator dashboard membuka daftar
+tiket aktif secara berkala. Waktu simulasi dipercepat dengan --time-scale
+(60 = satu detik nyata mewakili satu menit).
+
+Endpoint yang dipakai:
+
+    POST api/entry/batch/      vehicle_entry_batch (gate masuk)
+    GET  payment/<tiket>/      payment_process (kasir membuka form)
+    POST payment/<tiket>/      payment_process (pembayaran)
+    POST exit/<tiket>/         vehicle_exit (gate keluar)
+    GET  /                     dashboard (daftar tiket aktif)
+
+Profil kedatangan bisa diambil dari output get_peak_hours
+({"days_analyzed": n, "data": [{"hour", "entries", "vehicle_type"}, ...]}).
+Jumlah query database per endpoint dibaca dari header X-DB-Queries, jadi
+jalankan server dengan QUERY_COUNT_HEADER=true:
+
+    QUERY_COUNT_HEADER=true python manage.py runserver 8000
+    python load_generator.py --url http://127.0.0.1:8000 --gates 10 --preload 3000 --duration 300
+    python load_generator.py --peak-hours peak.json --start-hour 7 --rate-scale 2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+from gate_benchmark import RESULTS_DIR, save_result, summarize, _git_commit
+
+logger = logging.getLogger('load_generator')
+
+# Kedatangan kendaraan per jam (rumah sakit, hari kerja)
+DEFAULT_PROFILE = [
+    5, 3, 2, 2, 3, 10, 60, 180, 220, 200, 170, 150,
+    140, 150, 160, 140, 120, 100, 80, 60, 40, 25, 15, 8,
+]
+DEFAULT_MIX = {'Motor': 0.7, 'Mobil': 0.3}
+
+# Batas bucket histogram latensi (ms)
+HISTOGRAM_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+ENTRY_BATCH_SIZE = 500
+
+# Profil kedatangan
+
+def load_peak_hours(path):
+    """Profil per jam dan komposisi jenis kendaraan dari output get_peak_hours"""
+    with open(path) as f:
+        result = json.load(f)
+    rows = result['data'] if isinstance(result, dict) else result
+    days = result.get('days_analyzed', 1) if isinstance(result, dict) else 1
+
+    profile = [0.0] * 24
+    mix = defaultdict(float)
+    for row in rows:
+        entries = float(row['entries'])
+        profile[int(row['hour']) % 24] += entries / days
+        vehicle_type = str(row.get('vehicle_type') or 'Mobil')
+        mix['Motor' if vehicle_type.upper() in ('MOTOR', 'MOTORCYCLE') else 'Mobil'] += entries
+
+    total = sum(mix.values())
+    if not total:
+        return profile, dict(DEFAULT_MIX)
+    return profile, {key: value / total for key, value in mix.items()}
+
+def sample_dwell(median_minutes, sigma):
+    """Waktu tinggal log-normal dalam menit, dibatasi 5 menit - 12 jam"""
+    minutes = random.lognormvariate(math.log(median_minutes), sigma)
+    return min(max(minutes, 5), 12 * 60)
+
+# Client HTTP
+
+class HttpError(Exception):
+    pass
+
+class AsyncHttpClient:
+    """Client HTTP/1.1 minimal di atas asyncio: keep-alive, cookie dan CSRF Django"""
+
+    def __init__(self, base_url, timeout=10.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.base_path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.cookies = {}
+        self._reader = None
+        self._writer = None
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+        self._reader = self._writer = None
+
+    async def request(self, method, path, body=b'', headers=None):
+        """Kirim request; kembalikan (status, headers, body)"""
+        for attempt in range(2):
+            reused = self._writer is not None
+            try:
+                if not reused:
+                    self._reader, self._writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port), self.timeout
+                    )
+                return await asyncio.wait_for(self._exchange(method, path, body, headers or {}), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                # Koneksi keep-alive yang sudah ditutup server: ulangi sekali
+                if not reused or attempt:
+                    raise
+            except BaseException:
+                await self.close()
+                raise
+
+    async def _exchange(self, method, path, body, headers):
+        lines = [
+            f"{method} {self.base_path}{path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Connection: keep-alive",
+            f"Content-Length: {len(body)}",
+        ]
+        if self.cookies:
+            lines.append("Cookie: " + "; ".join(f"{k}={v}" for k, v in self.cookies.items()))
+        if method != 'GET' and 'csrftoken' in self.cookies:
+            lines.append(f"X-CSRFToken: {self.cookies['csrftoken']}")
+        lines.extend(f"{key}: {value}" for key, value in headers.items())
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Koneksi ditutup server")
+        status = int(status_line.split()[1])
+
+        response_headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                self._store_cookie(value)
+            response_headers[name] = value
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self._reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await self._reader.readline()
+                    break
+                chunks.append(await self._reader.readexactly(size))
+                await self._reader.readline()
+            content = b''.join(chunks)
+        elif 'content-length' in response_headers:
+            content = await self._reader.readexactly(int(response_headers['content-length']))
+        else:
+            content = await self._reader.read()
+            response_headers['connection'] = 'close'
+
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, response_headers, content
+
+    def _store_cookie(self, header):
+        name, _, rest = header.partition('=')
+        value = rest.split(';', 1)[0]
+        if value and 'max-age=0' not in rest.lower():
+            self.cookies[name.strip()] = value
+        else:
+            self.cookies.pop(name.strip(), None)
+
+    async def post_form(self, path, fields):
+        return await self.request('POST', path, urlencode(fields).encode(), {
+            'Content-Type': 'application/x-www-form-urlencoded'
+        })
+
+    async def post_json(self, path, data):
+        return await self.request('POST', path, json.dumps(data).encode(), {
+            'Content-Type': 'application/json'
+        })
+
+    async def login(self, username, password):
+        """Login session Django (form /login/ dengan token CSRF)"""
+        await self.request('GET', '/login/')
+        status, headers, _ = await self.post_form('/login/', {
+            'username': username,
+            'password': password,
+            'csrfmiddlewaretoken': self.cookies.get('csrftoken', '')
+        })
+        if status != 302 or 'sessionid' not in self.cookies:
+            raise HttpError(f"Login {username} gagal (HTTP {status})")
+
+# Statistik per endpoint
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.db_queries = []
+        self.db_time = []
+
+    def record(self, latency, status=None, headers=None, error=None):
+        self.latencies.append(latency * 1000.0)
+        if status is not None:
+            self.statuses[str(status)] += 1
+        if error:
+            self.errors[error] += 1
+        if headers and 'x-db-queries' in headers:
+            self.db_queries.append(int(headers['x-db-queries']))
+            self.db_time.append(float(headers.get('x-db-time-ms', 0)))
+
+    def histogram(self):
+        buckets = {f"le_{bound}": 0 for bound in HISTOGRAM_BUCKETS}
+        buckets['le_inf'] = 0
+        for value in self.latencies:
+            for bound in HISTOGRAM_BUCKETS:
+                if value <= bound:
+                    buckets[f"le_{bound}"] += 1
+                    break
+            else:
+                buckets['le_inf'] += 1
+        return buckets
+
+    def summary(self):
+        total = len(self.latencies)
+        errors = sum(self.errors.values())
+        result = {
+            'latency': summarize(self.latencies),
+            'histogram_ms': self.histogram(),
+            'statuses': dict(self.statuses),
+            'errors': dict(self.errors),
+            'error_rate': round(errors / total, 4) if total else 0.0,
+        }
+        if self.db_queries:
+            result['db_queries'] = {
+                'mean': round(sum(self.db_queries) / len(self.db_queries), 2),
+                'max': max(self.db_queries),
+                'db_time_mean_ms': round(sum(self.db_time) / len(self.db_time), 2),
+            }
+        return result
+
+# Simulasi
+
+class RushHourLoad:
+    """Penjadwal kedatangan, waktu tinggal dan pembayaran untuk banyak gate"""
+
+    def __init__(self, args, profile, mix):
+        self.args = args
+        self.profile = profile
+        self.mix = mix
+        self.stats = defaultdict(EndpointStats)
+        self.lanes = asyncio.Queue()
+        self.clients = []
+        self.tasks = set()
+        self.arrivals = 0
+        self.completed = 0
+        self.waiting = 0
+        self.max_backlog = 0
+        self.started = None
+        self.stopping = False
+        self._plate_seq = 0
+
+    # Waktu simulasi
+
+    def sim_hour(self):
+        elapsed = (time.monotonic() - self.started) * self.args.time_scale
+        return (self.args.start_hour + elapsed / 3600.0) % 24
+
+    def arrival_rate(self):
+        """Kedatangan per detik nyata pada jam simulasi sekarang"""
+        per_hour = self.profile[int(self.sim_hour())] * self.args.rate_scale
+        return per_hour / 3600.0 * self.args.time_scale
+
+    def next_plate(self):
+        self._plate_seq += 1
+        return f"LT{os.getpid() % 1000:03d}{self._plate_seq:06d}"
+
+    def vehicle_type(self):
+        return random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+
+    # Request
+
+    async def call(self, client, name, method, path, expect, **kwargs):
+        """Request dengan pencatatan latensi; expect(status, headers, body) -> error atau None"""
+        start = time.perf_counter()
+        try:
+            if method == 'GET':
+                status, headers, body = await client.request('GET', path)
+            elif 'json' in kwargs:
+                status, headers, body = await client.post_json(path, kwargs['json'])
+            else:
+                status, headers, body = await client.post_form(path, kwargs['form'])
+        except asyncio.TimeoutError:
+            self.stats[name].record(time.perf_counter() - start, error='timeout')
+            return None
+        except Exception as e:
+            self.stats[name].record(time.perf_counter() - start, error=type(e).__name__)
+            return None
+
+        error = expect(status, headers, body)
+        self.stats[name].record(time.perf_counter() - start, status, headers, error)
+        return None if error else (status, headers, body)
+
+    @staticmethod
+    def _expect_ok(status, headers, body):
+        return None if status == 200 else f"http_{status}"
+
+    @staticmethod
+    def _expect_redirect(target):
+        def check(status, headers, body):
+            if status != 302:
+                return f"http_{status}"
+            location = headers.get('location', '')
+            if '/login/' in location:
+                return 'not_logged_in'
+            return None if target(location) else f"redirect_{location.strip('/').split('/')[0] or 'root'}"
+        return check
+
+    @staticmethod
+    def _expect_entry(status, headers, body):
+        if status != 200:
+            return f"http_{status}"
+        return None if json.loads(body).get('success') else 'entry_rejected'
+
+    async def entry(self, client, vehicles):
+        """Catat kendaraan masuk; kembalikan daftar ID tiket"""
+        result = await self.call(client, 'POST vehicle_entry_batch', 'POST', '/api/entry/batch/',
+                                 self._expect_entry, json={'entries': vehicles})
+        if result is None:
+            return []
+        return [item['tiket'] for item in json.loads(result[2])['data']]
+
+    async def pay_and_exit(self, client, ticket_id):
+        if not await self.call(client, 'GET payment_process', 'GET', f'/payment/{ticket_id}/', self._expect_ok):
+            return False
+        paid = await self.call(client, 'POST payment_process', 'POST', f'/payment/{ticket_id}/',
+                               self._expect_redirect(lambda location: '/exit/' in location),
+                               form={
+                                   'amount': self.args.payment_amount,
+                                   'payment_method': random.choice(['CASH', 'CASH', 'CARD', 'EWALLET']),
+                                   'notes': 'load test',
+                                   'voucher_code': ''
+                               })
+        if not paid:
+            return False
+        return bool(await self.call(client, 'POST vehicle_exit', 'POST', f'/exit/{ticket_id}/',
+                                    self._expect_redirect(lambda location: location.rstrip('/') in ('', '/')),
+                                    form={}))
+
+    # Alur kendaraan
+
+    async def with_lane(self, work):
+        """Jalankan work(client) di lane (koneksi) yang sedang kosong"""
+        self.waiting += 1
+        self.max_backlog = max(self.max_backlog, self.waiting)
+        try:
+            client = await self.lanes.get()
+        finally:
+            self.waiting -= 1
+        try:
+            return await work(client)
+        finally:
+            self.lanes.put_nowait(client)
+
+    async def vehicle(self):
+        self.arrivals += 1
+        vehicles = [{'plat': self.next_plate(), 'jenis': self.vehicle_type()}]
+        tickets = await self.with_lane(lambda client: self.entry(client, vehicles))
+        if not tickets:
+            return
+        dwell = sample_dwell(self.args.dwell_median, self.args.dwell_sigma) * 60
+        await self.leave_after(tickets[0], dwell)
+
+    async def leave_after(self, ticket_id, dwell_seconds):
+        await asyncio.sleep(dwell_seconds / self.args.time_scale)
+        if self.stopping:
+            return
+        if await self.with_lane(lambda client: self.pay_and_exit(client, ticket_id)):
+            self.completed += 1
+
+    def spawn(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def arrivals_loop(self, deadline):
+        while time.monotonic() < deadline:
+            rate = self.arrival_rate()
+            wait = random.expovariate(rate) if rate > 0 else 1.0
+            await asyncio.sleep(min(wait, max(0.0, deadline - time.monotonic())))
+            if rate > 0 and time.monotonic() < deadline:
+                self.spawn(self.vehicle())
+
+    async def dashboard_loop(self, client, deadline):
+        while time.monotonic() < deadline:
+            await self.call(client, 'GET dashboard', 'GET', '/', self._expect_ok)
+            await asyncio.sleep(self.args.dashboard_interval)
+
+    async def preload(self, client):
+        """Isi tiket aktif awal; keluarnya dijadwalkan dengan sisa waktu tinggal"""
+        remaining = self.args.preload
+        while remaining > 0:
+            size = min(ENTRY_BATCH_SIZE, remaining)
+            vehicles = [{'plat': self.next_plate(), 'jenis': self.vehicle_type()} for _ in range(size)]
+            tickets = await self.entry(client, vehicles)
+            if not tickets:
+                raise HttpError("Preload tiket aktif gagal, cek server dan kredensial")
+            for ticket_id in tickets:
+                dwell = sample_dwell(self.args.dwell_median, self.args.dwell_sigma) * 60
+                self.spawn(self.leave_after(ticket_id, dwell * random.random()))
+            remaining -= size
+        # Statistik preload tidak ikut dilaporkan
+        self.stats.clear()
+
+    async def run(self):
+        args = self.args
+        for _ in range(args.gates + args.dashboards):
+            client = AsyncHttpClient(args.url, timeout=args.timeout)
+            await client.login(args.username, args.password)
+            self.clients.append(client)
+        for client in self.clients[:args.gates]:
+            self.lanes.put_nowait(client)
+
+        self.started = time.monotonic()
+        if args.preload:
+            print(f"⏳ Preload {args.preload} tiket aktif...")
+            await self.preload(self.clients[0])
+
+        self.started = time.monotonic()
+        deadline = self.started + args.duration
+        print(f"🚦 {args.gates} gate, {args.dashboards} dashboard, {args.duration}s "
+              f"(x{args.time_scale} waktu, mulai jam {args.start_hour:02d}:00)")
+
+        workers = [self.arrivals_loop(deadline)]
+        workers += [self.dashboard_loop(client, deadline) for client in self.clients[args.gates:]]
+        await asyncio.gather(*workers)
+
+        # Kendaraan yang masih parkir tidak ditunggu
+        self.stopping = True
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        elapsed = time.monotonic() - self.started
+        for client in self.clients:
+            await client.close()
+
+        requests_total = sum(len(s.latencies) for s in self.stats.values())
+        return {
+            'target': 'load',
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': _git_commit(),
+            'params': {key: value for key, value in vars(args).items() if key != 'password'},
+            'elapsed_s': round(elapsed, 3),
+            'arrivals': self.arrivals,
+            'completed_exits': self.completed,
+            'max_lane_backlog': self.max_backlog,
+            'requests': requests_total,
+            'requests_per_s': round(requests_total / elapsed, 2) if elapsed else None,
+            'endpoints': {name: stats.summary() for name, stats in sorted(self.stats.items())}
+        }
+
+def print_report(result):
+    print(f"\n📊 {result['arrivals']} kendaraan masuk, {result['completed_exits']} keluar, "
+          f"{result['requests']} request ({result['requests_per_s']}/s), "
+          f"antrian lane maks {result['max_lane_backlog']}")
+    print(f"{'endpoint':<26}{'n':>7}{'err%':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'query':>8}{'q max':>7}")
+    for name, endpoint in result['endpoints'].items():
+        latency = endpoint['latency']
+        if not latency['count']:
+            continue
+        queries = endpoint.get('db_queries', {})
+        print(f"{name:<26}{latency['count']:>7}{endpoint['error_rate'] * 100:>7.1f}"
+              f"{latency['p50_ms']:>9.1f}{latency['p95_ms']:>9.1f}{latency['p99_ms']:>9.1f}"
+              f"{queries.get('mean', '-'):>8}{queries.get('max', '-'):>7}")
+        if endpoint['errors']:
+            print(f"{'':<26}error: {endpoint['errors']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator jam sibuk untuk API parkir")
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help="server Django lokal")
+    parser.add_argument('--username', default=os.getenv('API_USERNAME', 'admin'))
+    parser.add_argument('--password', default=os.getenv('API_PASSWORD', 'admin'))
+    parser.add_argument('--gates', type=int, default=10, help="jumlah client gate/kasir bersamaan")
+    parser.add_argument('--dashboards', type=int, default=2, help="operator yang membuka dashboard")
+    parser.add_argument('--dashboard-interval', type=float, default=5.0, help="detik antar refresh dashboard")
+    parser.add_argument('--duration', type=float, default=120.0, help="lama pengujian (detik nyata)")
+    parser.add_argument('--time-scale', type=float, default=60.0, help="percepatan waktu simulasi")
+    parser.add_argument('--start-hour', type=int, default=7, help="jam simulasi saat mulai")
+    parser.add_argument('--rate-scale', type=float, default=1.0, help="pengali laju kedatangan")
+    parser.add_argument('--peak-hours', help="JSON output get_peak_hours untuk profil kedatangan")
+    parser.add_argument('--preload', type=int, default=0, help="jumlah tiket aktif awal")
+    parser.add_argument('--dwell-median', type=float, default=90.0, help="median waktu parkir (menit)")
+    parser.add_argument('--dwell-sigma', type=float, default=0.9, help="sigma log-normal waktu parkir")
+    parser.add_argument('--payment-amount', type=int, default=1000000, help="nominal bayar (>= tarif)")
+    parser.add_argument('--timeout', type=float, default=10.0, help="timeout per request (detik)")
+    parser.add_argument('--seed', type=int, help="seed random agar skenario bisa diulang")
+    parser.add_argument('--output', default=RESULTS_DIR, help="folder hasil JSON")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    profile, mix = load_peak_hours(args.peak_hours) if args.peak_hours else (DEFAULT_PROFILE, DEFAULT_MIX)
+
+    result = asyncio.run(RushHourLoad(args, profile, mix).run())
+    print_report(result)
+    print(f"\n💾 Hasil disimpan: {save_result(result, args.output)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Setup logging bersama untuk skrip client (gerbang masuk/keluar, simulator).
+
+logging.basicConfig(filename=...) menulis ke disk di thread yang memanggil
+logger, jadi setiap logger.info() di jalur tombol ikut menunggu I/O file dan
+console. setup_logging() memasang satu QueueHandler di root logger: record
+hanya dimasukkan ke antrian, lalu QueueListener di thread terpisah menulis ke
+file JSON lines yang dirotasi berdasarkan ukuran dan (opsional) ke console.
+
+Pesan yang sama berulang-ulang (mis. error serial setiap 50 ms) dibatasi oleh
+RateLimitFilter; jumlah pesan yang ditahan dilaporkan di field "suppressed"
+pada pesan berikutnya yang lolos.
+
+Level bisa diganti lewat environment LOG_LEVEL (mis. LOG_LEVEL=DEBUG).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+# Batas antrian record; jika penuh record dibuang, bukan memblokir pemanggil
+QUEUE_SIZE = 10000
+
+# Atribut standar LogRecord, sisanya (extra=...) ikut ditulis ke JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_listener = None
+_queue_handler = None
+_setup_lock = threading.Lock()
+
+class JsonFormatter(logging.Formatter):
+    """Satu objek JSON per baris"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).astimezone().isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class RateLimitFilter(logging.Filter):
+    """Loloskan maksimal `burst` pesan identik per `interval` detik"""
+
+    def __init__(self, interval=10.0, burst=3):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.levelno, record.msg if not record.args else (record.msg, record.args))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                if len(self._windows) > 1000:
+                    self._prune(now)
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+    def _prune(self, now):
+        for key, window in list(self._windows.items()):
+            if now - window[0] >= self.interval and not window[2]:
+                del self._windows[key]
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler yang membuang record saat antrian penuh"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Pesan dan traceback dirender di sini karena args/exc_info tidak
+        # aman dibawa ke thread lain; format akhir dikerjakan listener
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if self.dropped:
+            record.dropped, self.dropped = self.dropped, 0
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def setup_logging(filename, level=logging.INFO, console=False,
+                  max_bytes=5 * 1024 * 1024, backup_count=5,
+                  rate_interval=10.0, rate_burst=3):
+    """Pasang logging lewat antrian untuk seluruh proses
+
+    Hanya panggilan pertama yang berlaku (seperti logging.basicConfig), jadi
+    modul yang saling mengimpor tidak memasang handler dua kali.
+
+    Args:
+        filename: file log JSON lines (folder dibuat jika belum ada)
+        level: level root logger; LOG_LEVEL di environment menggantinya
+        console: juga tampilkan log (format teks) di console
+        max_bytes, backup_count: rotasi file berdasarkan ukuran
+        rate_interval, rate_burst: batas pesan identik per interval
+
+    Returns:
+        QueueListener yang berjalan (dihentikan otomatis saat proses keluar)
+    """
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+
+        level = os.getenv('LOG_LEVEL', level)
+        if isinstance(level, str):
+            level = logging.getLevelName(level.upper())
+
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        file_handler = logging.handlers.RotatingFileHandler(
+            filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers = [file_handler]
+        if console:
+            stream_handler = logging.StreamHandler()
+            stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+            handlers.append(stream_handler)
+
+        log_queue = queue.Queue(QUEUE_SIZE)
+        _queue_handler = _NonBlockingQueueHandler(log_queue)
+        _queue_handler.addFilter(RateLimitFilter(rate_interval, rate_burst))
+
+        root = logging.getLogger()
+        root.setLevel(level)
+        root.addHandler(_queue_handler)
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _listener
+
+def stop_logging():
+    """Tulis sisa antrian ke file dan hentikan thread listener"""
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is not None:
+            logging.getLogger().removeHandler(_queue_handler)
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+            _queue_handler = None
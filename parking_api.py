@@ -1,16 +1,16 @@
 import requests
+from http_client import get_client
 import json
 from datetime import datetime
 import logging
 from dotenv import load_dotenv
 import os
+import threading
+from counter_store import CounterStore
+from log_setup import setup_logging
 
 # Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    filename='parking_client.log'
-)
+setup_logging('parking_client.log')
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -20,12 +20,18 @@ class ParkingAPI:
     def __init__(self):
         """Initialize API client"""
         self.base_url = "http://192.168.2.6:5051"
+        self.http = get_client(self.base_url)
+        # Batch masuk hanya ada di server Django (butuh login, Basic auth)
+        self.django_url = os.getenv('DJANGO_API_URL', 'http://192.168.2.6:8000')
+        self.django = get_client(self.django_url)
+        self.django_auth = (os.getenv('API_USERNAME', 'admin'), os.getenv('API_PASSWORD', 'admin'))
+        self.counter_store = CounterStore("counter.txt", initial=1)
         
     def test_connection(self):
         """Test connection to API server"""
         try:
-            response = requests.get(f"{self.base_url}/api/test")
-            logger.info(f"Test connection response: {response.text}")
+            response = self.http.get("/api/test")
+            logger.debug(f"Test connection response ({response.status_code}): {response.text[:200]}")
             
             if response.status_code == 200:
                 data = response.json()
@@ -58,13 +64,13 @@ class ParkingAPI:
             logger.info(f"Sending request to {self.base_url}/api/masuk with data: {json.dumps(data)}")
             
             # Send request with correct headers
-            response = requests.post(
-                f"{self.base_url}/api/masuk",
+            response = self.http.post(
+                "/api/masuk",
                 json=data,
                 headers={"Content-Type": "application/json"}
             )
             
-            logger.info(f"Raw response: {response.text}")
+            logger.debug(f"Raw response ({response.status_code}): {response.text[:200]}")
             
             if response.status_code == 200:
                 try:
@@ -107,20 +113,9 @@ class ParkingAPI:
         """Handle vehicle entry in offline mode"""
         try:
             # Generate offline ticket number
-            counter_file = "counter.txt"
-            counter = 1
-            
-            if os.path.exists(counter_file):
-                with open(counter_file, "r") as f:
-                    counter = int(f.read().strip())
-            
-            # Format: OFF0001, OFF0002, etc.
-            ticket_number = f"OFF{counter:04d}"
-            
-            # Increment counter and save
-            counter = (counter % 9999) + 1  # Reset at 9999
-            with open(counter_file, "w") as f:
-                f.write(str(counter))
+            # Format: OFF0001, OFF0002, etc. Reset at 9999
+            counter = self.counter_store.increment() - 1
+            ticket_number = f"OFF{(counter - 1) % 9999 + 1:04d}"
             
             # Return offline ticket data
             return True, {
@@ -133,10 +128,50 @@ class ParkingAPI:
             logger.error(f"Error in offline mode: {e}")
             return False, {'error': str(e)}
     
+    def add_vehicles_batch(self, entries):
+        """Add many vehicles in one request
+        
+        Args:
+            entries (list): List of dicts with 'plat' and 'jenis' keys
+        
+        Returns:
+            (success, list of ticket data in the same order as entries)
+        """
+        if not entries:
+            return True, []
+            
+        try:
+            logger.info(f"Sending batch of {len(entries)} vehicles to {self.django_url}/api/entry/batch/")
+            
+            response = self.django.post(
+                "/api/entry/batch/",
+                json={"entries": entries},
+                headers={"Content-Type": "application/json"},
+                auth=self.django_auth
+            )
+            
+            if response.status_code == 200:
+                result = response.json()
+                if result.get('success'):
+                    return True, [{
+                        'plat': item.get('plat'),
+                        'tiket': item.get('tiket'),
+                        'waktu_masuk': item.get('waktu')
+                    } for item in result.get('data', [])]
+                logger.error(f"Batch entry failed: {result.get('message', 'Unknown error')}")
+                return False, {'error': result.get('message', 'Unknown error')}
+            
+            logger.error(f"Batch entry failed with status {response.status_code}")
+            return False, {'error': f'HTTP {response.status_code}'}
+            
+        except Exception as e:
+            logger.error(f"Error sending vehicle batch: {str(e)}")
+            return False, {'error': str(e)}
+    
     def get_vehicles(self):
         """Get list of parked vehicles"""
         try:
-            response = requests.get(f"{self.base_url}/api/kendaraan")
+            response = self.http.get("/api/kendaraan")
             if response.status_code == 200:
                 result = response.json()
                 if result.get('success'):
@@ -165,8 +200,8 @@ class ParkingAPI:
             
             logger.info(f"Processing vehicle exit: {ticket_number}")
             
-            response = requests.post(
-                f"{self.base_url}/api/keluar",
+            response = self.http.post(
+                "/api/keluar",
                 json=data
             )
             
@@ -186,6 +221,75 @@ class ParkingAPI:
             logger.error(f"Error processing vehicle exit: {str(e)}")
             return False, {"error": str(e)}
 
+class EntryBatcher:
+    """Kumpulkan kendaraan masuk dan kirim ke server per micro-batch
+    
+    Dipakai gate controller saat jam sibuk: setiap entri masuk antrian,
+    lalu dikirim sekaligus setiap `flush_interval` detik atau saat antrian
+    mencapai `max_batch`.
+    """
+    
+    def __init__(self, api, flush_interval=0.3, max_batch=50, on_result=None):
+        self.api = api
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.on_result = on_result
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread = None
+        
+    def start(self):
+        """Start background flush thread"""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        
+    def stop(self):
+        """Stop flush thread and send remaining entries"""
+        self._running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.flush()
+        
+    def submit(self, plate_number, vehicle_type="Motor"):
+        """Queue one vehicle entry"""
+        with self._lock:
+            self._pending.append({"plat": plate_number, "jenis": vehicle_type})
+            if len(self._pending) >= self.max_batch:
+                self._wakeup.set()
+                
+    def flush(self):
+        """Send all queued entries now"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return
+            
+        success, result = self.api.add_vehicles_batch(batch)
+        if not success:
+            result = []
+        elif len(result) < len(batch):
+            logger.error(f"Server hanya mengembalikan {len(result)} dari {len(batch)} tiket batch")
+        # Server gagal atau entri tidak dijawab: tetap layani dengan tiket offline
+        result = list(result[:len(batch)]) + [
+            self.api._handle_offline_entry(e['plat'], e['jenis'])[1] for e in batch[len(result):]
+        ]
+        if self.on_result:
+            for entry, ticket in zip(batch, result):
+                self.on_result(entry, ticket)
+                
+    def _run(self):
+        while self._running:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing entry batch: {str(e)}")
+
 # Example usage
 if __name__ == "__main__":
     api = ParkingAPI()
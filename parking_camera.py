@@ -1,18 +1,25 @@
 import cv2
-import RPi.GPIO as GPIO
 import time
+import threading
 import os
 from datetime import datetime
 import logging
+import shutil
+from counter_store import CounterStore
+from capture_store import CaptureStore
+from log_setup import setup_logging
 
 # Setup logging
-logging.basicConfig(
-    filename='parking.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+setup_logging('parking.log', level=logging.DEBUG)
 logger = logging.getLogger('parking_system')
 
+try:
+    import RPi.GPIO as GPIO
+except ImportError:
+    # Tanpa Raspberry Pi: pakai simulator (set_input/replay untuk uji edge)
+    import gpio_simulator as GPIO
+    logger.info("RPi.GPIO tidak tersedia, memakai gpio_simulator")
+
 class ParkingCamera:
     def __init__(self):
         # Inisialisasi folder dan file
@@ -25,10 +32,17 @@ class ParkingCamera:
             os.makedirs(self.capture_dir)
             logger.info(f"Folder capture dibuat: {self.capture_dir}")
         
+        # Capture per tanggal + index SQLite, arsip lama ke folder backups
+        self.retention_days = 90
+        self.capture_store = CaptureStore(self.capture_dir, backup_dir=os.path.join(self.base_dir, "backups"))
+        self.capture_store.start_retention(days=self.retention_days)
+        
         # Setup GPIO
         self.BUTTON_PIN = 18
+        self.button_bouncetime = 500  # ms
         GPIO.setmode(GPIO.BCM)
         GPIO.setup(self.BUTTON_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        self._busy = threading.Lock()
         
         # Inisialisasi kamera
         self.setup_camera()
@@ -57,34 +71,34 @@ class ParkingCamera:
     def load_counter(self):
         """Load atau inisialisasi counter untuk nomor urut file"""
         try:
-            if os.path.exists(self.counter_file):
-                with open(self.counter_file, 'r') as f:
-                    self.counter = int(f.read().strip())
-            else:
-                self.counter = 0
-                self.save_counter()
+            self.counter_store = CounterStore(self.counter_file)
+            self.counter = self.counter_store.get()
         except Exception as e:
             logger.error(f"Error loading counter: {str(e)}")
+            self.counter_store = None
             self.counter = 0
 
     def save_counter(self):
-        """Simpan nilai counter ke file"""
+        """Simpan nilai counter ke counter store"""
         try:
-            with open(self.counter_file, 'w') as f:
-                f.write(str(self.counter))
+            if self.counter_store:
+                self.counter_store.set(self.counter)
         except Exception as e:
             logger.error(f"Error saving counter: {str(e)}")
 
     def capture_image(self):
         """Ambil gambar dari kamera dan simpan"""
         try:
-            # Increment counter
-            self.counter += 1
+            # Increment counter (atomik, langsung tersimpan)
+            if self.counter_store:
+                self.counter = self.counter_store.increment()
+            else:
+                self.counter += 1
             
             # Generate nama file
             timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
             filename = f"TKT{timestamp}_{str(self.counter).zfill(4)}.jpg"
-            filepath = os.path.join(self.capture_dir, filename)
+            filepath = self.capture_store.path_for(filename)
             
             # Ambil beberapa frame untuk stabilisasi kamera
             for _ in range(5):
@@ -95,11 +109,9 @@ class ParkingCamera:
             ret, frame = self.camera.read()
             if ret:
                 cv2.imwrite(filepath, frame)
+                self.capture_store.record(filename.replace('.jpg', ''), filepath, size=os.path.getsize(filepath))
                 logger.info(f"Gambar berhasil disimpan: {filename}")
                 print(f"\n✅ Gambar disimpan: {filename}")
-                
-                # Simpan counter baru
-                self.save_counter()
                 return True, filename
             else:
                 logger.error("Gagal mengambil gambar dari kamera")
@@ -117,6 +129,11 @@ class ParkingCamera:
             if free_gb < 1:
                 logger.warning(f"Storage tersisa kurang dari 1GB: {free_gb}GB")
                 print(f"\n⚠️ Peringatan: Storage tersisa {free_gb}GB")
+                # Arsipkan lebih awal di background agar loop capture tidak menunggu
+                if self.capture_store.request_retention(days=self.retention_days // 3):
+                    print("📦 Pengarsipan capture lama dimulai")
+                else:
+                    print("📦 Pengarsipan capture lama sedang berjalan")
             return free_gb
         except Exception as e:
             logger.error(f"Error checking storage: {str(e)}")
@@ -127,10 +144,30 @@ class ParkingCamera:
         try:
             self.camera.release()
             GPIO.cleanup()
+            if self.counter_store:
+                self.counter_store.close()
+            self.capture_store.close()
             logger.info("Cleanup berhasil")
         except Exception as e:
             logger.error(f"Error during cleanup: {str(e)}")
 
+    def button_callback(self, channel):
+        """Dipanggil GPIO saat tombol ditekan (falling edge)"""
+        # Tekanan saat capture masih berjalan diabaikan
+        if not self._busy.acquire(blocking=False):
+            logger.info("Tombol ditekan saat capture masih diproses, diabaikan")
+            return
+        try:
+            print("\nMemproses... Mohon tunggu...")
+            success, filename = self.capture_image()
+            
+            if success:
+                print("Status: Menunggu kendaraan berikutnya...")
+            else:
+                print("❌ Gagal mengambil gambar!")
+        finally:
+            self._busy.release()
+
     def run(self):
         """Main loop program"""
         print("""
@@ -142,26 +179,14 @@ Status: Menunggu kendaraan...
         """)
         
         try:
+            # Tombol lewat edge callback, tidak ada polling pin
+            GPIO.add_event_detect(self.BUTTON_PIN, GPIO.FALLING,
+                                callback=self.button_callback,
+                                bouncetime=self.button_bouncetime)
+            
             while True:
-                # Baca status button
-                if GPIO.input(self.BUTTON_PIN) == GPIO.LOW:  # Button ditekan
-                    print("\nMemproses... Mohon tunggu...")
-                    success, filename = self.capture_image()
-                    
-                    if success:
-                        print("Status: Menunggu kendaraan berikutnya...")
-                    else:
-                        print("❌ Gagal mengambil gambar!")
-                        
-                    # Tunggu button dilepas
-                    while GPIO.input(self.BUTTON_PIN) == GPIO.LOW:
-                        time.sleep(0.1)
-                    
-                    # Delay untuk debounce
-                    time.sleep(0.5)
-                
-                # Delay kecil untuk mengurangi CPU usage
-                time.sleep(0.1)
+                time.sleep(60)
+                self.check_storage()
                 
         except KeyboardInterrupt:
             print("\nProgram dihentikan...")
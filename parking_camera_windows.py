@@ -1,36 +1,48 @@
-import cv2
 import time
 import os
 from datetime import datetime, timedelta
 import logging
 import shutil
-import requests
 from urllib.parse import quote
 import configparser
-import json
-import numpy as np
 import serial
-import win32print
-import psycopg2
-from psycopg2 import Error
 import random
 import msvcrt
-import barcode
-from barcode.writer import ImageWriter
+from lazy_import import lazy_module
+from device_init import DeviceInitializer
+from device_registry import DeviceRegistry
+from counter_store import CounterStore
+from duplicate_detector import DuplicateDetector
+from stream_capture import DualStreamCapture
+from image_encoder import ImageEncoder
+from capture_store import CaptureStore
+from barcode_token import make_token
+from ticket_id_client import TicketIdLease, db_lease
+from gate_metrics import GateMetrics
+from print_service import PrintService, open_backend
+from log_setup import setup_logging
 
 # Setup logging
-logging.basicConfig(
-    filename='parking.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+setup_logging('parking.log', level=logging.DEBUG)
 logger = logging.getLogger('parking_system')
 
+# Modul berat diimpor saat pertama dipakai (di thread inisialisasi perangkat)
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+win32print = lazy_module('win32print')
+psycopg2 = lazy_module('psycopg2')
+
+# Batas waktu inisialisasi per perangkat (detik), bisa diubah di [system]
+DEFAULT_INIT_TIMEOUTS = {'camera': 10, 'button': 15, 'printer': 5, 'database': 12}
+
 class ParkingCamera:
     def __init__(self):
         # Load konfigurasi
         self.load_config()
         
+        # Metrik tombol, capture, cetak dan database (lihat gate_metrics)
+        self.metrics = GateMetrics('entry', config=self.config)
+        
         # Inisialisasi folder dan file
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
         self.capture_dir = os.path.join(self.base_dir, self.config['storage']['capture_dir'])
@@ -49,6 +61,7 @@ class ParkingCamera:
         self.last_button_press = 0
         self.debounce_delay = 1.0  # Ubah menjadi 1 detik
         self.button_mode = "keyboard"  # Default to keyboard mode
+        self.keyboard_enabled = True  # False jika keyboard dibaca controller multi-jalur
         
         # Add additional timing parameters
         self.camera_initialization_delay = 2.0
@@ -59,17 +72,40 @@ class ParkingCamera:
             os.makedirs(self.capture_dir)
             logger.info(f"Folder capture dibuat: {self.capture_dir}")
         
-        # Setup kamera
-        self.setup_camera()
+        # Capture disimpan per tanggal dan dicatat di index SQLite
+        backup_dir = self.config['storage'].get('backup_dir')
+        self.capture_store = CaptureStore(
+            self.capture_dir,
+            backup_dir=os.path.join(self.base_dir, backup_dir) if backup_dir else None
+        )
+        self.capture_store.start_retention(
+            days=int(self.config['storage'].get('retention_days', '90')),
+            quality=int(self.config['storage'].get('archive_quality', '40'))
+        )
+        self.last_capture_path = None
+        
+        # Nilai awal selama perangkat masih diinisialisasi
+        self.camera = None
+        self.button = None
+        self.printer_available = False
+        self.print_service = None
+        self.db_conn = None
+        self.db_config = None
         
-        # Setup button
-        self.setup_button()
+        # Identitas perangkat terakhir yang berhasil (port Arduino, printer, kamera)
+        self.device_registry = self.open_device_registry()
         
-        # Setup printer
-        self.setup_printer()
+        # Nomor tiket dari SEQUENCE database per blok 100; counter lokal
+        # hanya dipakai saat database tidak bisa dihubungi. Dibuat sebelum
+        # thread perangkat dimulai karena setup_database memanggil warm_up()
+        self.ticket_ids = TicketIdLease(db_lease(self._lease_connection))
         
-        # Setup database
-        self.setup_database()
+        # Kamera, tombol, printer dan database disiapkan paralel
+        self.devices = DeviceInitializer(on_change=self._device_changed)
+        for name, setup in (('camera', self.setup_camera), ('button', self.setup_button),
+                            ('printer', self.setup_printer), ('database', self.setup_database)):
+            timeout = float(self.config['system'].get(f'{name}_init_timeout', DEFAULT_INIT_TIMEOUTS[name]))
+            self.devices.start(name, setup, timeout)
         
         # Initialize counter and capture time
         self.load_counter()
@@ -77,10 +113,44 @@ class ParkingCamera:
         
         # Initialize image comparison parameters
         self.last_image = None
-        self.min_image_diff = 0.15
-        self.check_similar_images = False
+        self.min_image_diff = float(self.config['image'].get('min_diff', '0.15'))
+        self.check_similar_images = self.config['image'].getboolean('check_similar', fallback=False)
+        self.duplicate_detector = DuplicateDetector(
+            min_diff=self.min_image_diff,
+            window_seconds=int(self.config['image'].get('similar_window', '30'))
+        )
+        self.last_capture_duplicate = False
+        
+        # Encoder JPEG di background agar jalur tombol tidak menunggu tulis file
+        self.encoder = ImageEncoder(
+            width=int(self.config['image']['width']),
+            height=int(self.config['image']['height']),
+            quality=int(self.config['image'].get('quality', '60')),
+            progressive=self.config['image'].getboolean('progressive', fallback=False),
+            backend=self.config['image'].get('encoder', 'auto'),
+            workers=int(self.config['image'].get('encoder_workers', '2'))
+        )
         
-        logger.info("Sistem parkir berhasil diinisialisasi")
+        self.metrics.serve()
+        
+        # Siap mengeluarkan tiket begitu printer dan tombol siap; kamera dan
+        # database boleh menyusul (capture dummy / tiket belum tersimpan)
+        self.devices.wait('printer', 'button')
+        self.metrics.ready.set(1)
+        logger.info(f"Sistem parkir siap: {self.devices.summary()}")
+
+    def open_device_registry(self):
+        return DeviceRegistry(os.path.join(
+            self.base_dir, self.config['system'].get('device_registry', 'device_registry.json')
+        ))
+
+    def device_role(self, device):
+        """Nama perangkat di registry (jalur lain memakai role sendiri)"""
+        return device
+
+    def _device_changed(self, name, status):
+        """Catat status inisialisasi perangkat ke metrik"""
+        self.metrics.device_up.set(1 if status == 'ready' else 0, device=name)
 
     def load_config(self):
         """Load konfigurasi dari file config.ini"""
@@ -116,6 +186,25 @@ class ParkingCamera:
                     rtsp_url = main_stream.format(username=username, password=password, ip=ip)
                     print(f"Mencoba koneksi ke kamera IP {ip}...")
                     
+                    # Sub-stream untuk deteksi, main stream hanya saat cetak tiket
+                    sub_stream = self.config['camera'].get('sub_stream')
+                    if sub_stream and self.config['camera'].getboolean('dual_stream', fallback=True):
+                        camera = DualStreamCapture(
+                            sub_stream.format(username=username, password=password, ip=ip),
+                            rtsp_url,
+                            snapshot_timeout=self.config['camera'].getfloat('snapshot_timeout', fallback=None),
+                            snapshot_fallback=self.config['camera'].get('snapshot_fallback', 'sub'),
+                            main_stream_mode=self.config['camera'].get('main_stream_mode', 'on_demand')
+                        )
+                        if camera.start():
+                            self.camera = camera
+                            print("✅ Kamera IP terdeteksi (dual stream)")
+                            self.connection_status['is_connected'] = True
+                            self.connection_status['last_connected'] = datetime.now()
+                            self.connection_status['camera_type'] = 'IP Dahua'
+                            return
+                        logger.warning("Sub-stream tidak tersedia, memakai main stream")
+                    
                     self.camera = cv2.VideoCapture(rtsp_url)
                     if self.camera.isOpened():
                         # Set resolusi kamera
@@ -144,7 +233,7 @@ class ParkingCamera:
             
             # Jika kamera IP gagal atau tidak dikonfigurasi, coba kamera lokal
             print("\nMencoba kamera lokal...")
-            for i in range(4):
+            for i in self.device_registry.camera_indices(self.device_role('camera')):
                 try:
                     self.camera = cv2.VideoCapture(i, cv2.CAP_DSHOW)
                     if self.camera.isOpened():
@@ -158,6 +247,7 @@ class ParkingCamera:
                         ret, frame = self.camera.read()
                         if ret:
                             print(f"✅ Kamera lokal terdeteksi pada device {i}")
+                            self.device_registry.remember(self.device_role('camera'), index=i)
                             print(f"✅ Resolusi: {width}x{height}")
                             self.connection_status['is_connected'] = True
                             self.connection_status['last_connected'] = datetime.now()
@@ -180,56 +270,65 @@ class ParkingCamera:
             logger.error(f"Error setting up camera: {str(e)}")
             raise Exception(f"Gagal setup kamera: {str(e)}")
 
+    def _flag_duplicate(self, frame):
+        """Tandai capture yang mirip capture sebelumnya
+
+        Thumbnail seluruh frame tidak bisa membedakan dua kendaraan berwarna
+        mirip di gate yang sama, jadi tiket tetap dicetak; penandaan hanya
+        dicatat di log, metrik dan metadata capture untuk diperiksa petugas.
+        """
+        if self.duplicate_detector.check_and_add(frame):
+            self.last_capture_duplicate = True
+            logger.warning("Capture mirip capture sebelumnya, tiket tetap dicetak")
+            print("⚠️ Gambar mirip capture sebelumnya (kemungkinan duplikat), tiket tetap dicetak")
+
     def capture_image(self):
         """Ambil gambar dari kamera atau buat dummy image jika kamera tidak tersedia"""
         try:
+            self.last_capture_duplicate = False
+            
             # Generate filename
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            counter = self.load_counter()
-            filename = f"{timestamp}_{counter:04d}.jpg"
-            filepath = os.path.join(self.capture_dir, filename)
+            
+            # Kamera yang masih diprobe belum boleh dipakai
+            camera_ready = self.camera is not None and self.devices.is_ready('camera')
             
             # Coba ambil gambar dari kamera jika tersedia
-            if self.camera:
+            if camera_ready:
                 print("\n📸 Mengambil gambar dari kamera...")
                 
-                # Stabilize camera - read beberapa frame
-                for _ in range(5):
-                    ret = self.camera.read()[0]
+                if isinstance(self.camera, DualStreamCapture):
+                    # Cek duplikat pada frame sub-stream yang murah sebelum ambil main stream
+                    ret, preview = self.camera.read()
+                    if ret and self.check_similar_images:
+                        self._flag_duplicate(preview)
+                    ret, frame = self.camera.snapshot()
+                else:
+                    # Stabilize camera - read beberapa frame
+                    for _ in range(5):
+                        ret = self.camera.read()[0]
+                    
+                    # Capture frame
+                    ret, frame = self.camera.read()
+                    
+                    if ret and self.check_similar_images:
+                        self._flag_duplicate(frame)
                 
-                # Capture frame
-                ret, frame = self.camera.read()
+                ticket_number = self.next_ticket_number(timestamp)
+                filename = f"{ticket_number}.jpg"
+                filepath = self.capture_store.path_for(filename)
                 
                 if ret:
-                    # Resize untuk mengurangi ukuran file
-                    height = int(self.config['image']['height'])
-                    width = int(self.config['image']['width'])
-                    frame = cv2.resize(frame, (width, height))
-                    
-                    # Simpan dengan kompresi
-                    cv2.imwrite(filepath, frame, [
-                        cv2.IMWRITE_JPEG_QUALITY, 90,
-                        cv2.IMWRITE_JPEG_OPTIMIZE, 1
-                    ])
-                    
-                    # Hitung ukuran file dalam KB
-                    file_size = os.path.getsize(filepath) / 1024
-                    print(f"✅ File disimpan: {filename} ({file_size:.1f} KB)")
-                    
-                    # Simpan metadata
-                    metadata = {
+                    # Resize, encode dan tulis file dikerjakan worker encoder
+                    future = self.encoder.submit(frame, filepath, {
                         "timestamp": timestamp,
-                        "counter": counter,
+                        "ticket": ticket_number,
                         "mode": "camera",
-                        "resolution": {
-                            "width": width,
-                            "height": height
-                        },
-                        "file_size": f"{file_size:.1f} KB"
-                    }
-                    
-                    with open(filepath + ".json", 'w') as f:
-                        json.dump(metadata, f, indent=4)
+                        "stream": getattr(self.camera, 'last_snapshot_source', None) or "main",
+                        "possible_duplicate": self.last_capture_duplicate
+                    })
+                    self._index_capture(future, filepath)
+                    print(f"✅ Gambar masuk antrian simpan: {filename}")
                     
                     self.last_capture_time = time.time()
                     return True, filename
@@ -239,6 +338,10 @@ class ParkingCamera:
             
             # Jika kamera tidak tersedia atau capture gagal, buat dummy image
             print("📸 Menggunakan mode dummy (tanpa kamera)")
+            if not camera_ready:
+                ticket_number = self.next_ticket_number(timestamp)
+                filename = f"{ticket_number}.jpg"
+                filepath = self.capture_store.path_for(filename)
             
             # Buat dummy image dengan informasi
             height = int(self.config['image']['height'])
@@ -255,26 +358,14 @@ class ParkingCamera:
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
             
             # Simpan dummy image
-            cv2.imwrite(filepath, dummy_image, [
-                cv2.IMWRITE_JPEG_QUALITY, 90,
-                cv2.IMWRITE_JPEG_OPTIMIZE, 1
-            ])
-            
-            print(f"✅ File dummy disimpan: {filename}")
-            
-            # Simpan metadata
-            metadata = {
+            future = self.encoder.submit(dummy_image, filepath, {
                 "timestamp": timestamp,
-                "counter": counter,
-                "mode": "dummy",
-                "resolution": {
-                    "width": width,
-                    "height": height
-                }
-            }
+                "ticket": ticket_number,
+                "mode": "dummy"
+            })
+            self._index_capture(future, filepath)
             
-            with open(filepath + ".json", 'w') as f:
-                json.dump(metadata, f, indent=4)
+            print(f"✅ Gambar dummy masuk antrian simpan: {filename}")
             
             self.last_capture_time = time.time()
             return True, filename
@@ -283,9 +374,30 @@ class ParkingCamera:
             logger.error(f"Error capturing image: {str(e)}")
             return False, None
 
+    def _index_capture(self, future, filepath):
+        """Catat capture ke index setelah file selesai ditulis encoder
+        
+        Tiket sudah dicetak sebelum file selesai ditulis; jika encode gagal
+        foto tiket tersebut tidak ada (image_path di database tidak valid).
+        """
+        ticket_number = os.path.basename(filepath).replace('.jpg', '')
+        captured_at = time.time()
+        self.last_capture_path = filepath
+        
+        def record(done):
+            error = done.exception()
+            if error is not None:
+                self.metrics.captures.inc(result='encode_failed')
+                logger.error(f"Foto tiket {ticket_number} gagal disimpan ke {filepath}: {error}")
+                print(f"❌ Foto tiket {ticket_number} gagal disimpan: {error}")
+                return
+            _, size = done.result()
+            self.capture_store.record(ticket_number, filepath, captured_at, size)
+        
+        future.add_done_callback(record)
+
     def setup_button(self):
         """Setup koneksi ke pushbutton melalui serial Arduino dengan fitur auto-reconnect"""
-        print("\nMencoba koneksi ke Arduino pushbutton...")
         logging.info("Mencoba koneksi ke pushbutton...")
         
         # Inisialisasi variabel reconnect
@@ -296,125 +408,28 @@ class ParkingCamera:
         self.last_port_found = None
         
         try:
-            # Coba ambil port terakhir yang berhasil dari file
-            if os.path.exists("arduino_port.txt"):
+            role = self.device_role('arduino')
+            
+            # Port dari arduino_port.txt lama dipakai sebagai identitas awal
+            if role == 'arduino' and self.device_registry.get(role) is None and os.path.exists("arduino_port.txt"):
                 with open("arduino_port.txt", "r") as f:
                     saved_port = f.read().strip()
-                    if saved_port:
-                        self.last_port_found = saved_port
-                        print(f"Port Arduino terakhir yang berhasil digunakan: {saved_port}")
-                        try:
-                            # Coba hubungkan ke port yang tersimpan terlebih dahulu
-                            self.button = serial.Serial(
-                                port=saved_port,
-                                baudrate=9600,
-                                bytesize=serial.EIGHTBITS,
-                                parity=serial.PARITY_NONE,
-                                stopbits=serial.STOPBITS_ONE,
-                                timeout=1,
-                                write_timeout=1  # Tambahkan write timeout
-                            )
-                            time.sleep(2)  # Berikan waktu Arduino untuk reset
-                            
-                            # Bersihkan buffer
-                            try:
-                                if self.button.in_waiting:
-                                    self.button.read_all()
-                            except Exception as e:
-                                logger.warning(f"Error membersihkan buffer: {str(e)}")
-                                
-                            # Kirim perintah test
-                            try:
-                                self.button.write(b'test\n')
-                                time.sleep(1)  # Tunggu respons lebih lama
-                                
-                                # Baca respons
-                                if self.button.in_waiting:
-                                    response = self.button.read_all().decode(errors='ignore').strip()
-                                    print(f"Respons dari {saved_port}: {response}")
-                                    if any(signal in response.upper() for signal in ['READY', 'OK', 'ARDUINO']):
-                                        print(f"✅ Arduino terdeteksi di port {saved_port}")
-                                        logging.info(f"Push button Arduino terkoneksi di port {saved_port}")
-                                        self.button_mode = "arduino"
-                                        self.current_port = saved_port
-                                        
-                                        # Simpan port yang berhasil
-                                        with open("arduino_port.txt", "w") as f:
-                                            f.write(saved_port)
-                                            
-                                        return
-                            except Exception as e:
-                                logger.warning(f"Error saat komunikasi dengan port tersimpan: {str(e)}")
-                            
-                            # Jika tidak berhasil, tutup koneksi
-                            if hasattr(self, 'button') and self.button and self.button.is_open:
-                                self.button.close()
-                        except Exception as e:
-                            logger.warning(f"Error mencoba port tersimpan {saved_port}: {str(e)}")
-                            if hasattr(self, 'button') and self.button and self.button.is_open:
-                                self.button.close()
+                if saved_port:
+                    self.device_registry.remember(role, device=saved_port)
             
-            # Jika koneksi ke port tersimpan gagal atau tidak ada port tersimpan,
-            # lakukan pencarian di semua port
-            for port_num in range(1, 11):
-                port = f'COM{port_num}'
-                try:
-                    print(f"Mencoba port {port}...")
-                    self.button = serial.Serial(
-                        port=port,
-                        baudrate=9600,
-                        bytesize=serial.EIGHTBITS,
-                        parity=serial.PARITY_NONE,
-                        stopbits=serial.STOPBITS_ONE,
-                        timeout=1,
-                        write_timeout=1  # Tambahkan write timeout
-                    )
-                    time.sleep(2)  # Berikan waktu Arduino untuk reset
-                    
-                    # Bersihkan buffer
-                    try:
-                        if self.button.in_waiting:
-                            self.button.read_all()
-                    except Exception as e:
-                        logger.warning(f"Error membersihkan buffer port {port}: {str(e)}")
-                        continue
-                        
-                    # Kirim perintah test
-                    try:
-                        self.button.write(b'test\n')
-                        time.sleep(1)  # Tunggu respons lebih lama
-                        
-                        # Baca respons
-                        if self.button.in_waiting:
-                            response = self.button.read_all().decode(errors='ignore').strip()
-                            print(f"Respons dari {port}: {response}")
-                            if any(signal in response.upper() for signal in ['READY', 'OK', 'ARDUINO']):
-                                print(f"✅ Arduino terdeteksi di port {port}")
-                                logging.info(f"Push button Arduino terkoneksi di port {port}")
-                                self.button_mode = "arduino"
-                                self.current_port = port
-                                self.last_port_found = port
-                                
-                                # Simpan port yang berhasil
-                                with open("arduino_port.txt", "w") as f:
-                                    f.write(port)
-                                    
-                                return
-                    except Exception as e:
-                        logger.warning(f"Error saat komunikasi dengan port {port}: {str(e)}")
-                    
-                    # Jika tidak ada respons yang valid, tutup port
-                    if hasattr(self, 'button') and self.button and self.button.is_open:
-                        self.button.close()
-                    
-                except serial.SerialException as se:
-                    print(f"Port {port} tidak tersedia: {str(se)}")
-                    continue
-                except Exception as e:
-                    print(f"Error pada port {port}: {str(e)}")
-                    if hasattr(self, 'button') and self.button and self.button.is_open:
-                        self.button.close()
-                    continue
+            # Identitas USB tersimpan dicek dulu, port lain diprobe paralel
+            port, arduino = self.device_registry.find_serial(
+                role, self._probe_arduino, quick_probe=self._open_arduino,
+                match=self._arduino_port_filter()
+            )
+            if arduino is not None:
+                print(f"✅ Arduino terdeteksi di port {port}")
+                logging.info(f"Push button Arduino terkoneksi di port {port}")
+                self.button = arduino
+                self.button_mode = "arduino"
+                self.current_port = port
+                self.last_port_found = port
+                return
                     
             # Jika tidak ada Arduino yang terdeteksi
             print("\n⚠️ Tidak ada Arduino yang terdeteksi")
@@ -434,6 +449,49 @@ class ParkingCamera:
         self.button = None
         self.button_mode = "keyboard"
 
+    def _arduino_port_filter(self):
+        """Filter port yang boleh diprobe; [button] port membatasi ke satu port"""
+        configured = self.config.get('button', 'port', fallback=None)
+        if configured:
+            return lambda port: port.device == configured
+        return None
+
+    def _open_arduino(self, port):
+        """Buka port Arduino tanpa handshake (identitas USB sudah cocok)"""
+        return serial.Serial(
+            port=port,
+            baudrate=9600,
+            bytesize=serial.EIGHTBITS,
+            parity=serial.PARITY_NONE,
+            stopbits=serial.STOPBITS_ONE,
+            timeout=1,
+            write_timeout=1
+        )
+
+    def _probe_arduino(self, port):
+        """Buka port dan pastikan Arduino menjawab perintah test; None jika bukan"""
+        connection = self._open_arduino(port)
+        try:
+            time.sleep(2)  # Berikan waktu Arduino untuk reset
+            
+            # Bersihkan buffer
+            if connection.in_waiting:
+                connection.read_all()
+            
+            # Kirim perintah test dan tunggu respons
+            connection.write(b'test\n')
+            time.sleep(1)
+            
+            if connection.in_waiting:
+                response = connection.read_all().decode(errors='ignore').strip()
+                logger.debug(f"Respons dari {port}: {response}")
+                if any(signal in response.upper() for signal in ['READY', 'OK', 'ARDUINO']):
+                    return connection
+        except Exception as e:
+            logger.warning(f"Error saat komunikasi dengan port {port}: {str(e)}")
+        connection.close()
+        return None
+
     def reconnect_arduino(self):
         """Mencoba menghubungkan kembali ke Arduino jika koneksi terputus"""
         current_time = time.time()
@@ -454,53 +512,36 @@ class ParkingCamera:
         logger.info(f"Mencoba reconnect Arduino (Percobaan ke-{self.reconnect_attempts})...")
         print(f"\n🔄 Mencoba menghubungkan kembali ke Arduino (Percobaan ke-{self.reconnect_attempts})...")
         
-        # Jika ada port terakhir yang berhasil, coba itu terlebih dahulu
-        if self.last_port_found:
+        # Pastikan tidak ada koneksi yang masih terbuka
+        if self.button is not None:
             try:
-                # Pastikan tidak ada koneksi yang masih terbuka
-                if hasattr(self, 'button') and self.button and self.button.is_open:
-                    self.button.close()
-                    
-                # Buka koneksi baru
-                self.button = serial.Serial(
-                    port=self.last_port_found,
-                    baudrate=9600,
-                    bytesize=serial.EIGHTBITS,
-                    parity=serial.PARITY_NONE,
-                    stopbits=serial.STOPBITS_ONE,
-                    timeout=1,
-                    write_timeout=1
-                )
-                time.sleep(2)  # Berikan waktu Arduino untuk reset
-                
-                # Test koneksi
-                if self.button.is_open:
-                    try:
-                        self.button.write(b'test\n')
-                        time.sleep(1)
-                        
-                        if self.button.in_waiting:
-                            response = self.button.read_all().decode(errors='ignore').strip()
-                            if any(signal in response.upper() for signal in ['READY', 'OK', 'ARDUINO']):
-                                print(f"✅ Reconnect berhasil di port {self.last_port_found}")
-                                logger.info(f"Reconnect Arduino berhasil di port {self.last_port_found}")
-                                self.button_mode = "arduino"
-                                self.current_port = self.last_port_found
-                                self.reconnect_attempts = 0  # Reset counter percobaan
-                                return True
-                    except Exception as e:
-                        logger.warning(f"Error saat test koneksi reconnect: {str(e)}")
-                        
-                # Jika gagal, tutup koneksi
-                if hasattr(self, 'button') and self.button and self.button.is_open:
-                    self.button.close()
-                    
-            except Exception as e:
-                logger.warning(f"Reconnect gagal: {str(e)}")
-                if hasattr(self, 'button') and self.button and self.button.is_open:
-                    self.button.close()
+                self.button.close()
+            except Exception:
+                pass
+            self.button = None
+        
+        # Setelah USB reset nama COM bisa berubah; identitas VID/PID/serial
+        # di registry menemukan port barunya tanpa probe satu per satu
+        try:
+            port, arduino = self.device_registry.find_serial(
+                self.device_role('arduino'), self._probe_arduino, quick_probe=self._open_arduino,
+                match=self._arduino_port_filter()
+            )
+            if arduino is not None:
+                print(f"✅ Reconnect berhasil di port {port}")
+                logger.info(f"Reconnect Arduino berhasil di port {port}")
+                self.button = arduino
+                self.button_mode = "arduino"
+                self.current_port = port
+                self.last_port_found = port
+                self.reconnect_attempts = 0  # Reset counter percobaan
+                self.metrics.reconnects.inc(target='arduino', result='ok')
+                return True
+        except Exception as e:
+            logger.warning(f"Reconnect gagal: {str(e)}")
                     
         # Jika reconnect gagal, tetap gunakan keyboard
+        self.metrics.reconnects.inc(target='arduino', result='failed')
         return False
 
     def setup_printer(self):
@@ -511,16 +552,26 @@ class ParkingCamera:
             print("\nMencari printer thermal...")
             
             try:
-                # Get default printer
-                self.printer_name = win32print.GetDefaultPrinter()
-                if not self.printer_name:
-                    print("❌ Tidak ada default printer yang diset")
-                    return
-                    
-                # Test printer
-                test_handle = win32print.OpenPrinter(self.printer_name)
-                win32print.ClosePrinter(test_handle)
+                backend = self.config.get('printer', 'backend', fallback='win32')
+                if backend == 'win32':
+                    # Printer terakhir yang berhasil, lalu [printer] name, lalu default printer
+                    preferred = self.config.get('printer', 'name', fallback=None)
+                    self.printer_name = self.device_registry.find_printer(
+                        win32print, role=self.device_role('printer'),
+                        prefer=(preferred.upper(),) if preferred else ()
+                    )
+                    if not self.printer_name:
+                        print("❌ Tidak ada printer yang bisa dibuka")
+                        return
+                else:
+                    # Printer jaringan/serial/file tanpa spooler Windows
+                    self.printer_name = backend
                 
+                # Handle printer tetap terbuka, tiket dicetak lewat antrian
+                self.print_service = PrintService(
+                    open_backend(backend, win32print=win32print, printer_name=self.printer_name),
+                    metrics=self.metrics
+                ).start()
                 print(f"✅ Printer terdeteksi: {self.printer_name}")
                 self.printer_available = True
                 return
@@ -557,6 +608,7 @@ class ParkingCamera:
 
             self.db_config = self.config['database']
             self.connect_to_database()
+            self.ticket_ids.warm_up()
             
         except Exception as e:
             logger.warning(f"Gagal koneksi ke database: {str(e)}")
@@ -639,7 +691,9 @@ class ParkingCamera:
             self.db_conn = None
             
         # Coba buat koneksi baru
-        return self.connect_to_database()
+        connected = self.connect_to_database()
+        self.metrics.reconnects.inc(target='database', result='ok' if connected else 'failed')
+        return connected
         
     def is_db_connected(self):
         """Cek apakah koneksi database masih aktif"""
@@ -682,6 +736,13 @@ class ParkingCamera:
                 )
             """)
             
+            # Token barcode yang dicetak di tiket, dicari gate keluar dengan satu index probe
+            cursor.execute("ALTER TABLE tickets ADD COLUMN IF NOT EXISTS barcode_token VARCHAR(16)")
+            cursor.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_tickets_barcode_token
+                ON tickets (barcode_token)
+            """)
+            
             self.db_conn.commit()
             cursor.close()
             logger.info("Tabel tickets berhasil dibuat/diperiksa")
@@ -691,11 +752,15 @@ class ParkingCamera:
             if self.db_conn:
                 self.db_conn.rollback()
 
-    def print_ticket(self, filename):
-        """Cetak tiket parkir menggunakan win32print"""
+    def print_ticket(self, filename, barcode_token=None):
+        """Masukkan tiket parkir ke antrian cetak
+        
+        Returns:
+            PrintJob, atau None jika printer tidak tersedia
+        """
         if not self.printer_available:
             logger.info("Melewati pencetakan tiket - printer tidak tersedia")
-            return
+            return None
 
         try:
             # Parse data dari filename
@@ -706,77 +771,90 @@ class ParkingCamera:
             print(f"Nomor: {ticket_number}")
             print(f"Waktu: {timestamp}")
             
-            # Buka printer
-            printer_handle = win32print.OpenPrinter(self.printer_name)
-            print("✅ Berhasil membuka koneksi printer")
-            
-            # Start document
-            job_id = win32print.StartDocPrinter(printer_handle, 1, ("Parking Ticket", None, "RAW"))
-            win32print.StartPagePrinter(printer_handle)
-            
-            # Initialize printer dan reset
-            win32print.WritePrinter(printer_handle, b"\x1B\x40")  # Initialize printer
+            job = self.print_service.submit(
+                self.build_ticket(ticket_number, timestamp, barcode_token),
+                title=f"Parking Ticket {ticket_number}"
+            )
+            logger.info(f"Tiket masuk antrian cetak: {filename} (job {job.id})")
+            print(f"✅ Tiket masuk antrian cetak (job {job.id})")
             
-            # Center alignment
-            win32print.WritePrinter(printer_handle, b"\x1B\x61\x01")  # Center alignment
+            # Printer yang melaporkan kertas habis/cover terbuka: tiket menunggu
+            status = self.print_service.status
+            if status is not None and not status.ok:
+                print(f"⚠️ Printer: {status.describe()} - tiket dicetak setelah printer siap")
+            return job
             
-            # Header - double height & width
-            win32print.WritePrinter(printer_handle, b"\x1B\x21\x30")  # Double width & height
-            win32print.WritePrinter(printer_handle, b"RSI BANJARNEGARA\n")
-            win32print.WritePrinter(printer_handle, b"TIKET PARKIR\n")
-            win32print.WritePrinter(printer_handle, b"\x1B\x21\x00")  # Normal text
-            win32print.WritePrinter(printer_handle, b"================================\n")
+        except Exception as e:
+            logger.error(f"Gagal mencetak tiket: {str(e)}")
+            print(f"❌ Gagal mencetak tiket: {str(e)}")
+            self.metrics.prints.inc(result='failed')
+            return None
+
+    def build_ticket(self, ticket_number, timestamp, barcode_token=None):
+        """Perintah ESC/POS satu tiket parkir
+
+        Tanpa barcode_token (tiket tidak tersimpan di database) tiket dicetak
+        tanpa barcode, karena barcode tersebut tidak akan ditemukan gate keluar.
+        """
+        if barcode_token:
+            # Barcode CODE39 - center, HRI di bawah, tinggi 80 dot, lebar 2
+            barcode = [
+                b"\x1B\x61\x01",
+                b"\x1B\x21\x00",
+                b"\x1D\x48\x02",
+                b"\x1D\x68\x50",
+                b"\x1D\x77\x02",
+                b"\x1D\x6B\x04",
+                f"*{barcode_token}*".encode(),
+                b"\x00",  # GS k 4: data CODE39 diakhiri NUL
+                b"\n\n",
+            ]
+        else:
+            barcode = [
+                b"\x1B\x61\x01",
+                b"TIKET TIDAK TERCATAT\n",
+                b"Tunjukkan ke petugas saat keluar\n\n",
+            ]
+        return b"".join([
+            b"\x1B\x40",  # Initialize printer
+            
+            # Header - center, double height & width
+            b"\x1B\x61\x01",
+            b"\x1B\x21\x30",
+            b"RSI BANJARNEGARA\n",
+            b"TIKET PARKIR\n",
+            b"\x1B\x21\x00",  # Normal text
+            b"================================\n",
             
             # Ticket details - left align
-            win32print.WritePrinter(printer_handle, b"\x1B\x61\x00")  # Left alignment
-            win32print.WritePrinter(printer_handle, f"Nomor : {ticket_number}\n".encode())
-            win32print.WritePrinter(printer_handle, f"Waktu : {timestamp}\n".encode())
-            win32print.WritePrinter(printer_handle, b"================================\n\n")
-            
-            # Center untuk barcode
-            win32print.WritePrinter(printer_handle, b"\x1B\x61\x01")  # Center alignment
-            
-            # Reset text size to normal before barcode
-            win32print.WritePrinter(printer_handle, b"\x1B\x21\x00")  # Normal text
-            
-            # Barcode configuration - CODE39
-            win32print.WritePrinter(printer_handle, b"\x1D\x48\x02")  # HRI below barcode
-            win32print.WritePrinter(printer_handle, b"\x1D\x68\x50")  # Barcode height = 80 dots
-            win32print.WritePrinter(printer_handle, b"\x1D\x77\x02")  # Barcode width = 2
+            b"\x1B\x61\x00",
+            f"Nomor : {ticket_number}\n".encode(),
+            f"Waktu : {timestamp}\n".encode(),
+            b"================================\n\n",
             
-            # Use CODE39 with clear format
-            win32print.WritePrinter(printer_handle, b"\x1D\x6B\x04")  # Select CODE39
-            
-            # Simplify ticket number for better scanning
-            simple_number = ticket_number.split('_')[1] if '_' in ticket_number else ticket_number[-10:]
-            barcode_data = f"*{simple_number}*".encode()  # Format CODE39
-            win32print.WritePrinter(printer_handle, barcode_data)
-            
-            # Extra space after barcode
-            win32print.WritePrinter(printer_handle, b"\n\n")
+            *barcode,
             
             # Footer - center align
-            win32print.WritePrinter(printer_handle, b"\x1B\x61\x01")  # Center alignment
-            win32print.WritePrinter(printer_handle, b"Terima kasih\n")
-            win32print.WritePrinter(printer_handle, b"Jangan hilangkan tiket ini\n")
-            
-            # Feed and cut
-            win32print.WritePrinter(printer_handle, b"\x1B\x64\x05")  # Feed 5 lines
-            win32print.WritePrinter(printer_handle, b"\x1D\x56\x41\x00")  # Cut paper
-            
-            print("✅ Berhasil mengirim data ke printer")
-            
-            # Close printer
-            win32print.EndPagePrinter(printer_handle)
-            win32print.EndDocPrinter(printer_handle)
-            win32print.ClosePrinter(printer_handle)
-            
-            logger.info(f"Tiket berhasil dicetak: {filename}")
-            print("✅ Tiket berhasil dicetak")
-            
-        except Exception as e:
-            logger.error(f"Gagal mencetak tiket: {str(e)}")
-            print(f"❌ Gagal mencetak tiket: {str(e)}")
+            b"\x1B\x61\x01",
+            b"Terima kasih\n",
+            b"Jangan hilangkan tiket ini\n",
+            
+            # Feed 5 lines and cut
+            b"\x1B\x64\x05",
+            b"\x1D\x56\x41\x00",
+        ])
+
+    def reprint_last_ticket(self):
+        """Cetak ulang tiket terakhir yang tercetak (tombol R)"""
+        if self.print_service is None:
+            print("❌ Printer tidak tersedia")
+            return None
+        job = self.print_service.reprint()
+        if job is None:
+            print("ℹ️ Belum ada tiket yang bisa dicetak ulang")
+        else:
+            print(f"🔁 Cetak ulang tiket (job {job.id})")
+        return job
 
     def run(self):
         """Main loop program"""
@@ -787,7 +865,9 @@ class ParkingCamera:
 """)
         
         # Tampilkan mode operasi
-        if self.connection_status['camera_type'] == 'IP Dahua':
+        if not self.devices.is_ready('camera'):
+            print("Mode Kamera: masih diinisialisasi (capture dummy sampai kamera siap)")
+        elif self.connection_status['camera_type'] == 'IP Dahua':
             print("Mode Kamera: IP Dahua")
             print(f"IP: {self.config['camera']['ip']}")
             print(f"Resolution: 1920x1080 (Main) / 704x576 (Sub)")
@@ -807,6 +887,13 @@ class ParkingCamera:
             
         # Tampilkan status printer
         print(f"\nStatus Printer: {'Tersedia - ' + self.printer_name if self.printer_available else 'Tidak Tersedia'}")
+        if self.print_service is not None and self.print_service.status is not None:
+            print(f"Kondisi Printer: {self.print_service.status.describe()}")
+        
+        # Perangkat yang masih diinisialisasi di background
+        pending = [name for name, (status, _) in self.devices.summary().items() if status in ('pending', 'timeout')]
+        if pending:
+            print(f"⏳ Masih diinisialisasi: {', '.join(pending)}")
             
         # Tampilkan petunjuk input
         print("\nStatus: Menunggu input...")
@@ -819,6 +906,7 @@ class ParkingCamera:
         print("   - Tekan tombol '1' pada keyboard")
         print("   - Tekan tombol SPASI pada keyboard")
         print("   - Tekan tombol ENTER pada keyboard")
+        print("   - Tekan tombol 'R' untuk cetak ulang tiket terakhir")
         
         print("\n2. Jangan tekan tombol terlalu cepat (minimal jeda 1 detik)")
         print("3. Pastikan printer dalam keadaan siap (kertas tersedia)")
@@ -843,32 +931,17 @@ class ParkingCamera:
         try:
             current_time = time.time()
             
-            # Cek keyboard input (selalu aktif)
-            if msvcrt.kbhit():
+            # Cek keyboard input (kecuali dibaca controller multi-jalur)
+            if self.keyboard_enabled and msvcrt.kbhit():
                 key = msvcrt.getch()
                 # Menerima tombol '1', spasi (32), atau enter (13)
                 if key in [b'1', b' ', b'\r']:
                     key_name = "1" if key == b'1' else "SPASI" if key == b' ' else "ENTER"
-                    
-                    # Cek debounce
-                    if current_time - self.last_button_press >= self.debounce_delay:
-                        print(f"\n⌨️ Tombol {key_name} terdeteksi")
-                        self.last_button_press = current_time
-                        logger.info(f"Tombol keyboard {key_name} terdeteksi")
-                        
-                        # Jika Arduino terhubung, kirim signal untuk gate
-                        if self.button_mode == "arduino" and hasattr(self, 'button') and self.button and self.button.is_open:
-                            try:
-                                self.button.write(b'trigger\n')
-                                logger.info("Trigger command sent to Arduino")
-                            except Exception as e:
-                                logger.error(f"Error mengirim trigger ke Arduino: {str(e)}")
-                                # Tidak perlu langsung reconnect jika hanya error pada pengiriman trigger
-                        return True
-                    else:
-                        remaining = self.debounce_delay - (current_time - self.last_button_press)
-                        print(f"\n⏳ Mohon tunggu {remaining:.1f} detik...")
-                        return False
+                    return self.keyboard_press(key_name, current_time)
+                # Tombol R: cetak ulang tiket terakhir (mis. tiket terpotong)
+                if key in [b'r', b'R']:
+                    self.reprint_last_ticket()
+                    return False
             
             # Cek pushbutton Arduino jika dalam mode arduino
             if self.button_mode == "arduino" and hasattr(self, 'button') and self.button:
@@ -884,7 +957,7 @@ class ParkingCamera:
                     # Baca data dari Arduino
                     if self.button.in_waiting:
                         data = self.button.read_all().decode(errors='ignore').strip()
-                        print(f"Data dari Arduino: {data}")  # Debug print
+                        logger.debug(f"Data dari Arduino: {data!r}")
                         
                         # Cek berbagai format trigger
                         if any(signal in data.upper() for signal in ['PRESS', 'BUTTON', 'TRIGGER', '1', 'ON']):
@@ -892,6 +965,7 @@ class ParkingCamera:
                             if current_time - self.last_button_press >= self.debounce_delay:
                                 print("\n🔘 Push button terdeteksi")
                                 self.last_button_press = current_time
+                                self.metrics.press('arduino')
                                 logger.info("Push button Arduino terdeteksi")
                                 
                                 # Clear buffer
@@ -900,12 +974,14 @@ class ParkingCamera:
                             else:
                                 remaining = self.debounce_delay - (current_time - self.last_button_press)
                                 print(f"\n⏳ Mohon tunggu {remaining:.1f} detik...")
+                                self.metrics.presses_rejected.inc(reason='debounce')
                                 self.button.reset_input_buffer()
                                 return False
                                 
                 except serial.SerialException as se:
                     # Error spesifik SerialException biasanya menandakan masalah koneksi
                     logger.error(f"Serial error dengan Arduino: {str(se)}")
+                    self.metrics.serial_errors.inc(device='arduino')
                     print(f"\n⚠️ Masalah koneksi Arduino: {str(se)}")
                     
                     # Coba reconnect
@@ -926,6 +1002,7 @@ class ParkingCamera:
                         
                 except Exception as e:
                     logger.error(f"Error umum membaca Arduino: {str(e)}")
+                    self.metrics.serial_errors.inc(device='arduino')
                     print(f"\n⚠️ Error pada Arduino: {str(e)}")
                     
                     # Hanya coba reconnect untuk error koneksi atau timeout
@@ -951,6 +1028,34 @@ class ParkingCamera:
             logger.error(f"Error membaca input: {str(e)}")
             return False
 
+    def keyboard_press(self, key_name, current_time=None):
+        """Tombol keyboard ditekan; True jika lolos debounce dan tiket harus diproses"""
+        if current_time is None:
+            current_time = time.time()
+        
+        # Cek debounce
+        if current_time - self.last_button_press >= self.debounce_delay:
+            print(f"\n⌨️ Tombol {key_name} terdeteksi")
+            self.last_button_press = current_time
+            self.metrics.press('keyboard')
+            logger.info(f"Tombol keyboard {key_name} terdeteksi")
+            
+            # Jika Arduino terhubung, kirim signal untuk gate
+            if self.button_mode == "arduino" and hasattr(self, 'button') and self.button and self.button.is_open:
+                try:
+                    self.button.write(b'trigger\n')
+                    logger.info("Trigger command sent to Arduino")
+                except Exception as e:
+                    logger.error(f"Error mengirim trigger ke Arduino: {str(e)}")
+                    self.metrics.serial_errors.inc(device='arduino')
+                    # Tidak perlu langsung reconnect jika hanya error pada pengiriman trigger
+            return True
+        
+        remaining = self.debounce_delay - (current_time - self.last_button_press)
+        print(f"\n⏳ Mohon tunggu {remaining:.1f} detik...")
+        self.metrics.presses_rejected.inc(reason='debounce')
+        return False
+
     def process_button_press(self):
         """Proses ketika tombol ditekan - ambil gambar, cetak tiket, dan simpan ke database"""
         try:
@@ -968,17 +1073,22 @@ class ParkingCamera:
                 if time_since_last < 0.5:  # Minimal jeda 0.5 detik antara capture
                     print("⚠️ Terlalu cepat! Mohon tunggu...\n")
                     logger.warning(f"Capture terlalu cepat, interval: {time_since_last:.1f}s")
+                    self.metrics.presses_rejected.inc(reason='too_fast')
                     return
             
             # Ambil gambar
-            success, filename = self.capture_image()
+            with self.metrics.capture_seconds.time():
+                success, filename = self.capture_image()
+            self.metrics.captures.inc(
+                result=('possible_duplicate' if self.last_capture_duplicate else 'ok') if success else 'failed'
+            )
             
             if success:
                 print("\n2. Menyimpan ke database...")
                 # Simpan ke database
                 ticket_number = filename.replace('.jpg', '')
-                image_path = os.path.join(self.config['storage']['capture_dir'], filename)
-                self.save_to_database(ticket_number, image_path)
+                image_path = os.path.relpath(self.last_capture_path, self.base_dir)
+                barcode_token = self.save_to_database(ticket_number, image_path)
                 
                 # Update timestamp capture terakhir
                 self.last_capture_time = current_time
@@ -987,7 +1097,7 @@ class ParkingCamera:
                 print(f"\n3. Status printer: {'Tersedia' if self.printer_available else 'Tidak tersedia'}")
                 if self.printer_available:
                     print("\n4. Mencoba cetak tiket...")
-                    self.print_ticket(filename)
+                    self.print_ticket(filename, barcode_token)
                 else:
                     print("\n❌ Printer tidak tersedia, tiket tidak bisa dicetak")
                 
@@ -1008,10 +1118,21 @@ class ParkingCamera:
         try:
             if hasattr(self, 'camera') and self.camera is not None:
                 self.camera.release()
+            if getattr(self, 'print_service', None) is not None:
+                # Tiket yang masih di antrian dicetak dulu
+                self.print_service.stop()
+            if hasattr(self, 'encoder'):
+                self.encoder.shutdown()
+            if hasattr(self, 'capture_store'):
+                self.capture_store.close()
             if hasattr(self, 'button') and self.button_mode == "serial":
                 self.button.close()
             if hasattr(self, 'db_conn') and self.db_conn is not None:
                 self.db_conn.close()
+            if hasattr(self, 'counter_store'):
+                self.counter_store.close()
+            if hasattr(self, 'metrics'):
+                self.metrics.stop()
             logger.info("Cleanup berhasil")
         except Exception as e:
             logger.error(f"Error during cleanup: {str(e)}")
@@ -1019,34 +1140,66 @@ class ParkingCamera:
     def load_counter(self):
         """Load atau inisialisasi counter untuk nomor urut file"""
         try:
-            if os.path.exists(self.counter_file):
-                with open(self.counter_file, 'r') as f:
-                    self.counter = int(f.read().strip())
-            else:
-                self.counter = 0
-                with open(self.counter_file, 'w') as f:
-                    f.write(str(self.counter))
-            logger.info(f"Counter loaded: {self.counter}")
+            if not hasattr(self, 'counter_store'):
+                self.counter_store = CounterStore(self.counter_file)
+                logger.info(f"Counter store dibuka: {self.counter_store.path}")
+            self.counter = self.counter_store.get()
             return self.counter
         except Exception as e:
             logger.error(f"Error loading counter: {str(e)}")
             self.counter = 0
             return self.counter
 
+    def next_counter(self):
+        """Naikkan counter secara atomik dan kembalikan nilai baru"""
+        try:
+            self.counter = self.counter_store.increment()
+        except Exception as e:
+            logger.error(f"Error incrementing counter: {str(e)}")
+            self.counter += 1
+        return self.counter
+
+    def next_ticket_number(self, timestamp):
+        """Nomor tiket dari blok yang disewa; {timestamp}_{counter} saat offline"""
+        ticket_number = self.ticket_ids.next_id()
+        if ticket_number is None:
+            ticket_number = f"{timestamp}_{self.next_counter():04d}"
+        return ticket_number
+
+    def _lease_connection(self):
+        """Koneksi terpisah untuk sewa blok nomor tiket (ditutup oleh db_lease)"""
+        if not self.db_config:
+            raise RuntimeError("Database tidak dikonfigurasi")
+        return psycopg2.connect(
+            dbname=self.db_config['dbname'],
+            user=self.db_config['user'],
+            password=self.db_config['password'],
+            host=self.db_config['host'],
+            connect_timeout=3
+        )
+
     def save_counter(self):
-        """Simpan nilai counter ke file"""
+        """Simpan nilai counter ke counter store"""
         try:
-            with open(self.counter_file, 'w') as f:
-                f.write(str(self.counter))
-            logger.info(f"Counter saved: {self.counter}")
+            self.counter_store.set(self.counter)
+            logger.debug(f"Counter saved: {self.counter}")
         except Exception as e:
             logger.error(f"Error saving counter: {str(e)}")
 
     def save_to_database(self, ticket_number, image_path):
-        """Simpan data tiket ke database dengan auto-reconnect"""
+        """Simpan data tiket ke database dengan auto-reconnect
+        
+        Returns:
+            Token barcode untuk dicetak di tiket, atau None jika tiket tidak
+            tersimpan (barcode tidak akan ditemukan gate keluar)
+        """
+        saved_token = None
+        # Tekan pertama setelah start: tunggu koneksi database selesai dibuat
+        # (maksimal sisa batas waktunya)
+        self.devices.wait('database')
         if not self.db_config:
             print("ℹ️ Mode tanpa database aktif")
-            return
+            return None
             
         try:
             # Periksa apakah koneksi masih aktif
@@ -1054,29 +1207,46 @@ class ParkingCamera:
                 print("⚠️ Koneksi database terputus, mencoba reconnect...")
                 if not self.reconnect_database():
                     print("❌ Gagal reconnect ke database, tiket tidak disimpan")
-                    return
+                    self.metrics.db_inserts.inc(result='skipped')
+                    return None
             
+            start = time.perf_counter()
             cursor = self.db_conn.cursor()
             
             # Buat query insert
             query = """
                 INSERT INTO tickets 
-                (ticket_id, entry_time, image_path, status, created_at, updated_at)
-                VALUES (%s, %s, %s, %s, NOW(), NOW())
+                (ticket_id, barcode_token, entry_time, image_path, status, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, NOW(), NOW())
             """
             
-            # Data yang akan disimpan
-            data = (
-                ticket_number,
-                datetime.now(),
-                image_path,
-                'ACTIVE'
-            )
-            
-            # Eksekusi query
-            cursor.execute(query, data)
-            self.db_conn.commit()
+            for salt in range(3):
+                barcode_token = make_token(ticket_number, salt)
+                
+                # Data yang akan disimpan
+                data = (
+                    ticket_number,
+                    barcode_token,
+                    datetime.now(),
+                    image_path,
+                    'ACTIVE'
+                )
+                
+                try:
+                    # Eksekusi query
+                    cursor.execute(query, data)
+                    self.db_conn.commit()
+                    break
+                except psycopg2.IntegrityError as ie:
+                    # Token bertabrakan dengan tiket lain: buat ulang dengan salt
+                    self.db_conn.rollback()
+                    if 'barcode_token' not in str(ie) or salt == 2:
+                        raise
+                    logger.warning(f"Tabrakan token barcode untuk {ticket_number}, membuat ulang")
             cursor.close()
+            self.metrics.db_insert_seconds.observe(time.perf_counter() - start)
+            self.metrics.db_inserts.inc(result='ok')
+            saved_token = barcode_token
             
             print("✅ Data tiket berhasil disimpan ke database")
             logger.info(f"Tiket {ticket_number} berhasil disimpan ke database")
@@ -1085,12 +1255,13 @@ class ParkingCamera:
             # Error koneksi, coba reconnect
             logger.error(f"Database operational error: {str(oe)}")
             print(f"⚠️ Database operational error: {str(oe)}")
+            self.metrics.db_inserts.inc(result='failed')
             
             if self.reconnect_database():
                 # Jika reconnect berhasil, coba simpan lagi
                 print("✅ Reconnect berhasil, mencoba simpan data lagi...")
                 try:
-                    self.save_to_database(ticket_number, image_path)
+                    return self.save_to_database(ticket_number, image_path)
                 except Exception as e2:
                     logger.error(f"Gagal simpan data setelah reconnect: {str(e2)}")
                     print(f"❌ Gagal simpan data setelah reconnect: {str(e2)}")
@@ -1105,11 +1276,14 @@ class ParkingCamera:
         except Exception as e:
             print(f"⚠️ Gagal menyimpan ke database: {str(e)}")
             logger.error(f"Database error: {str(e)}")
+            self.metrics.db_inserts.inc(result='failed')
             if self.db_conn:
                 try:
                     self.db_conn.rollback()
                 except:
                     pass
+        
+        return saved_token
 
 if __name__ == "__main__":
     try:
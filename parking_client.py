@@ -2,76 +2,96 @@ import logging
 import json
 import os
 from datetime import datetime
-import requests
+from http_client import get_client
 import serial
 import serial.tools.list_ports
 import time
-import win32print
-import win32ui
-from PIL import Image, ImageDraw, ImageFont, ImageWin
-import barcode
-from barcode.writer import ImageWriter
+from lazy_import import lazy_module
+from device_init import DeviceInitializer
+from device_registry import DeviceRegistry
 import configparser
+from ticket_id_client import TicketIdLease, http_lease
+from counter_store import CounterStore
+from log_setup import setup_logging
 
 # Setup logging
-logging.basicConfig(
-    filename='parking_client.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+setup_logging('parking_client.log', level=logging.DEBUG)
 logger = logging.getLogger('parking_client')
 
+# Modul berat diimpor saat pertama dipakai, bukan saat program start
+win32print = lazy_module('win32print')
+win32ui = lazy_module('win32ui')
+win32con = lazy_module('win32con')
+Image = lazy_module('PIL.Image')
+ImageDraw = lazy_module('PIL.ImageDraw')
+ImageFont = lazy_module('PIL.ImageFont')
+ImageWin = lazy_module('PIL.ImageWin')
+barcode = lazy_module('barcode')
+barcode_writer = lazy_module('barcode.writer')
+
+# Batas waktu inisialisasi perangkat (detik)
+INIT_TIMEOUTS = {'printer': 5, 'button': 10}
+
+# Printer thermal yang diutamakan jika belum ada printer tersimpan di registry
+PREFERRED_PRINTERS = ('EPSON', 'TM-T')
+
 class ParkingClient:
     def __init__(self):
         self.base_url = "http://192.168.2.6:5051/api"
+        self.http = get_client(self.base_url)
         self.offline_file = "offline_data.json"
         self.counter_file = "counter.txt"
+        self.counter_store = CounterStore(self.counter_file)
         self.printer = None
         self.arduino = None
         self.printer_name = None
+        self.device_registry = DeviceRegistry()
+        self.ticket_ids = self._setup_ticket_ids()
         self.initialize_devices()
 
+    def _setup_ticket_ids(self):
+        """Siapkan alokasi ID tiket dari blok yang disewa ke server Django"""
+        config = configparser.ConfigParser()
+        config.read('config.ini')
+        if 'server' in config and 'lease_url' in config['server']:
+            return TicketIdLease(http_lease(config['server']['lease_url']))
+        return None
+
     def find_arduino_port(self):
         """Mencari port Arduino yang terhubung"""
         ports = list(serial.tools.list_ports.comports())
         for port in ports:
             # Log semua port yang ditemukan
             logger.info(f"Port ditemukan: {port.device} - {port.description}")
-            # Arduino biasanya terdeteksi dengan nama "Arduino" atau "CH340"
-            if "arduino" in port.description.lower() or "ch340" in port.description.lower():
-                return port.device
-        return None
+        # Identitas USB yang tersimpan dulu, lalu port mirip Arduino
+        # (deskripsi "Arduino" atau "CH340")
+        return self.device_registry.find_port('arduino')
 
     def initialize_devices(self):
+        """Siapkan printer dan Arduino paralel, masing-masing dengan batas waktu"""
+        self.devices = DeviceInitializer()
+        self.devices.start('printer', self._setup_printer, INIT_TIMEOUTS['printer'])
+        self.devices.start('button', self._setup_arduino, INIT_TIMEOUTS['button'])
+        self.devices.wait('printer', 'button')
+
+    def _setup_printer(self):
         # Inisialisasi printer
         try:
-            # Mendapatkan daftar printer
-            printers = win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL, None, 1)
-            logger.info(f"Printer tersedia: {printers}")
-            
-            # Mencari printer EPSON
-            for printer in printers:
-                printer_name = printer[2]
-                if "EPSON" in printer_name.upper() or "TM-T" in printer_name.upper():
-                    self.printer_name = printer_name
-                    logger.info(f"Printer EPSON ditemukan: {printer_name}")
-                    print(f"✅ Printer terdeteksi: {printer_name}")
-                    break
-            
-            if not self.printer_name:
-                logger.warning("Printer EPSON tidak ditemukan")
-                print("⚠️ Printer EPSON tidak ditemukan")
-                # Mencoba menggunakan printer default
-                self.printer_name = win32print.GetDefaultPrinter()
-                if self.printer_name:
-                    logger.info(f"Menggunakan printer default: {self.printer_name}")
-                    print(f"ℹ️ Menggunakan printer default: {self.printer_name}")
+            # Printer tersimpan di registry, lalu EPSON/TM-T, lalu default
+            self.printer_name = self.device_registry.find_printer(win32print, prefer=PREFERRED_PRINTERS)
+            if self.printer_name:
+                logger.info(f"Printer terdeteksi: {self.printer_name}")
+                print(f"✅ Printer terdeteksi: {self.printer_name}")
+            else:
+                logger.warning("Tidak ada printer yang bisa dibuka")
+                print("⚠️ Tidak ada printer yang bisa dibuka")
                 
         except Exception as e:
             logger.error(f"Gagal menginisialisasi printer: {str(e)}")
             print(f"❌ Gagal menginisialisasi printer: {str(e)}")
             self.printer_name = None
 
+    def _setup_arduino(self):
         # Inisialisasi koneksi Arduino
         try:
             # Read COM port from config instead of auto-detection
@@ -93,6 +113,7 @@ class ParkingClient:
             self.arduino = serial.Serial(arduino_port, baudrate, timeout=1)
             time.sleep(1)  # Reduced delay for Arduino reset
             logger.info(f"Koneksi Arduino berhasil pada port {arduino_port}")
+            self.device_registry.remember_serial('arduino', arduino_port)
             print(f"✅ Arduino terdeteksi pada port {arduino_port}")
         except Exception as e:
             logger.error(f"Gagal koneksi ke Arduino: {str(e)}")
@@ -126,7 +147,7 @@ class ParkingClient:
 
             # Generate barcode
             barcode_class = barcode.get_barcode_class('code39')
-            barcode_instance = barcode_class(data['tiket'], writer=ImageWriter())
+            barcode_instance = barcode_class(data['tiket'], writer=barcode_writer.ImageWriter())
             barcode_image = barcode_instance.render()
             
             # Resize barcode to fit ticket width
@@ -224,17 +245,7 @@ class ParkingClient:
 
     def get_next_ticket_number(self):
         try:
-            if os.path.exists(self.counter_file):
-                with open(self.counter_file, 'r') as f:
-                    counter = int(f.read().strip())
-            else:
-                counter = 0
-            
-            counter += 1
-            with open(self.counter_file, 'w') as f:
-                f.write(str(counter))
-            
-            return counter
+            return self.counter_store.increment()
         except Exception as e:
             logger.error(f"Error getting ticket number: {str(e)}")
             return None
@@ -256,7 +267,7 @@ class ParkingClient:
 
     def test_connection(self):
         try:
-            response = requests.get(f"{self.base_url}/test")
+            response = self.http.get("/test")
             if response.ok:
                 return True, response.json()
             return False, None
@@ -267,8 +278,8 @@ class ParkingClient:
     def process_vehicle(self, plat):
         try:
             # Try online mode first
-            response = requests.post(
-                f"{self.base_url}/masuk",
+            response = self.http.post(
+                "/masuk",
                 json={"plat": plat},
                 timeout=5
             )
@@ -285,10 +296,11 @@ class ParkingClient:
         except Exception as e:
             logger.warning(f"Server error, switching to offline mode: {str(e)}")
             
-            # Fallback to offline mode
+            # Fallback to offline mode, pakai ID dari blok sewaan jika masih ada
+            ticket_id = self.ticket_ids.next_id() if self.ticket_ids else None
             offline_data = {
                 "plat": plat,
-                "tiket": f"OFF{str(self.get_next_ticket_number()).zfill(4)}",
+                "tiket": ticket_id or f"OFF{str(self.get_next_ticket_number()).zfill(4)}",
                 "waktu": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 "is_offline": True
             }
@@ -311,8 +323,8 @@ class ParkingClient:
             success = True
             for data in offline_data:
                 try:
-                    response = requests.post(
-                        f"{self.base_url}/masuk",
+                    response = self.http.post(
+                        "/masuk",
                         json={"plat": data['plat']}
                     )
                     if not response.ok:
@@ -9,13 +9,10 @@ from datetime import datetime
 import random
 import string
 import sys
+from log_setup import setup_logging
 
 # Setup logging
-logging.basicConfig(
-    filename='parking_client.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+setup_logging('parking_client.log', level=logging.DEBUG)
 logger = logging.getLogger('parking_client')
 
 # API Configuration
@@ -2,35 +2,51 @@ import logging
 import json
 import os
 import time
-import requests
-import win32print
-import win32ui
-import win32con
-from PIL import Image, ImageDraw, ImageFont, ImageWin
-import barcode
-from barcode.writer import ImageWriter
+from lazy_import import lazy_module
+from device_init import DeviceInitializer
+from device_registry import DeviceRegistry
+from http_client import get_client
+from print_service import FAILED, PrintService, Win32Backend
 from datetime import datetime
 import serial
 import serial.tools.list_ports
 import random
 import string
 import tempfile
+from log_setup import setup_logging
 
 # Setup logging
-logging.basicConfig(
-    filename='parking_client.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+setup_logging('parking_client.log', level=logging.DEBUG)
 logger = logging.getLogger('parking_client')
 
+# Modul berat diimpor saat pertama dipakai, bukan saat program start
+requests = lazy_module('requests')
+win32print = lazy_module('win32print')
+win32ui = lazy_module('win32ui')
+win32con = lazy_module('win32con')
+Image = lazy_module('PIL.Image')
+ImageDraw = lazy_module('PIL.ImageDraw')
+ImageFont = lazy_module('PIL.ImageFont')
+ImageWin = lazy_module('PIL.ImageWin')
+barcode = lazy_module('barcode')
+barcode_writer = lazy_module('barcode.writer')
+
+# Batas waktu inisialisasi perangkat (detik)
+INIT_TIMEOUTS = {'printer': 5, 'button': 10}
+
+# Printer thermal yang diutamakan jika belum ada printer tersimpan di registry
+PREFERRED_PRINTERS = ('EPSON', 'TM-T')
+
 class ParkingClientWin32Print:
     def __init__(self):
         self.base_url = "http://192.168.2.6:5051/api"
+        self.http = get_client(self.base_url)
         self.offline_file = "offline_data.json"
         self.counter_file = "counter.txt"
         self.arduino = None
         self.printer_name = None
+        self.print_service = None
+        self.device_registry = DeviceRegistry()
         self.simulate_mode = False
         self.initialize_devices()
 
@@ -40,46 +56,41 @@ class ParkingClientWin32Print:
         for port in ports:
             # Log semua port yang ditemukan
             logger.info(f"Port ditemukan: {port.device} - {port.description}")
-            # Arduino biasanya terdeteksi dengan nama "Arduino" atau "CH340"
-            if "arduino" in port.description.lower() or "ch340" in port.description.lower():
-                return port.device
-        return None
+        # Identitas USB yang tersimpan dulu, lalu port mirip Arduino
+        # (deskripsi "Arduino" atau "CH340")
+        return self.device_registry.find_port('arduino')
 
     def initialize_devices(self):
+        """Siapkan printer dan Arduino paralel, masing-masing dengan batas waktu"""
+        self.devices = DeviceInitializer()
+        self.devices.start('printer', self._setup_printer, INIT_TIMEOUTS['printer'])
+        self.devices.start('button', self._setup_arduino, INIT_TIMEOUTS['button'])
+        self.devices.wait('printer', 'button')
+
+    def _setup_printer(self):
         # Inisialisasi printer
         try:
-            # Mendapatkan daftar printer
-            printers = [printer[2] for printer in win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL, None, 1)]
-            logger.info(f"Printer tersedia: {printers}")
-            
-            # Mencari printer EPSON
-            for printer_name in printers:
-                if "EPSON" in printer_name.upper() or "TM-T" in printer_name.upper():
-                    self.printer_name = printer_name
-                    logger.info(f"Printer EPSON ditemukan: {printer_name}")
-                    print(f"✅ Printer terdeteksi: {printer_name}")
-                    break
-            
-            if not self.printer_name:
-                logger.warning("Printer EPSON tidak ditemukan")
-                print("❌ Printer EPSON tidak ditemukan")
-                # Mencoba menggunakan printer default
-                self.printer_name = win32print.GetDefaultPrinter()
-                if self.printer_name:
-                    print(f"ℹ️ Menggunakan printer default: {self.printer_name}")
+            # Printer tersimpan di registry, lalu EPSON/TM-T, lalu default
+            self.printer_name = self.device_registry.find_printer(win32print, prefer=PREFERRED_PRINTERS)
+            if self.printer_name:
+                logger.info(f"Printer terdeteksi: {self.printer_name}")
+                print(f"✅ Printer terdeteksi: {self.printer_name}")
+                # Handle printer tetap terbuka, tiket dicetak lewat antrian
+                self.print_service = PrintService(Win32Backend(self.printer_name, win32print)).start()
+            else:
+                logger.warning("Tidak ada printer yang bisa dibuka")
+                print("⚠️ Tidak ada printer yang bisa dibuka")
                 
         except Exception as e:
             logger.error(f"Gagal menginisialisasi printer: {str(e)}")
             print("❌ Gagal menginisialisasi printer")
             self.printer_name = None
 
+    def _setup_arduino(self):
         # Inisialisasi koneksi Arduino
         try:
-            arduino_port = "COM7"  # Menggunakan port tetap untuk saat ini
-            
-            # Jika port default gagal, coba cari Arduino secara otomatis
-            if not arduino_port:
-                arduino_port = self.find_arduino_port()
+            # Port dari registry/deteksi otomatis, COM7 sebagai port tetap cadangan
+            arduino_port = self.find_arduino_port() or "COM7"
                 
             if not arduino_port:
                 logger.error("Perangkat Arduino tidak ditemukan")
@@ -92,6 +103,7 @@ class ParkingClientWin32Print:
                 self.arduino = serial.Serial(arduino_port, 9600, timeout=1)
                 time.sleep(2)  # Tunggu Arduino reset
                 logger.info(f"Koneksi Arduino berhasil pada port {arduino_port}")
+                self.device_registry.remember_serial('arduino', arduino_port)
                 print(f"✅ Arduino terdeteksi pada port {arduino_port}")
                 self.simulate_mode = False
             except Exception as e:
@@ -110,30 +122,15 @@ class ParkingClientWin32Print:
     def print_ticket_escpos(self, data):
         """Print a ticket using direct ESC/POS commands for thermal printers"""
         try:
-            printer_name = self.printer_name or win32print.GetDefaultPrinter()
-            if not printer_name:
+            if self.print_service is None:
                 logger.error("No printer available")
                 return False
                 
-            # Opening the printer directly
-            handle = win32print.OpenPrinter(printer_name)
-            
-            try:
-                # Generate ESC/POS commands
-                commands = self.generate_escpos_commands(data)
-                
-                # Start a print job
-                job = win32print.StartDocPrinter(handle, 1, ("Parking Ticket", None, "RAW"))
-                try:
-                    win32print.StartPagePrinter(handle)
-                    win32print.WritePrinter(handle, commands)
-                    win32print.EndPagePrinter(handle)
-                    logger.info(f"Ticket printed successfully: {data['tiket']}")
-                    return True
-                finally:
-                    win32print.EndDocPrinter(handle)
-            finally:
-                win32print.ClosePrinter(handle)
+            # Dicetak thread print service; error dicoba ulang di sana
+            job = self.print_service.submit(self.generate_escpos_commands(data),
+                                            title=f"Parking Ticket {data['tiket']}")
+            logger.info(f"Ticket queued for printing: {data['tiket']} (job {job.id})")
+            return job.state != FAILED
                 
         except Exception as e:
             logger.error(f"Error printing ticket with ESC/POS: {str(e)}")
@@ -314,7 +311,7 @@ class ParkingClientWin32Print:
 
             # Generate barcode
             barcode_class = barcode.get_barcode_class('code39')
-            barcode_instance = barcode_class(data['tiket'], writer=ImageWriter())
+            barcode_instance = barcode_class(data['tiket'], writer=barcode_writer.ImageWriter())
             barcode_image = barcode_instance.render()
             
             # Resize barcode to fit ticket width
@@ -348,7 +345,7 @@ class ParkingClientWin32Print:
     def test_connection(self):
         """Test API server connection"""
         try:
-            response = requests.get(f"{self.base_url}/test", timeout=5)
+            response = self.http.get("/test")
             if response.ok:
                 data = response.json()
                 logger.info(f"Connected to server. Response: {json.dumps(data)}")
@@ -376,9 +373,9 @@ class ParkingClientWin32Print:
             
             try:
                 # Send to either /api/masuk or /api/v2/masuk
-                url = f"{self.base_url}/v2/masuk"
+                url = "/v2/masuk"
                 
-                response = requests.post(
+                response = self.http.post(
                     url, 
                     json=data,
                     headers={
@@ -391,8 +388,8 @@ class ParkingClientWin32Print:
                 # If v2 fails, try the original endpoint
                 if not response.ok and "/v2/" in url:
                     logger.warning(f"V2 endpoint failed, trying original endpoint")
-                    url = f"{self.base_url}/masuk"
-                    response = requests.post(
+                    url = "/masuk"
+                    response = self.http.post(
                         url, 
                         json=data,
                         headers={
@@ -567,6 +564,8 @@ Status: Menunggu Kendaraan...
         except KeyboardInterrupt:
             print("\nProgram dihentikan...")
         finally:
+            if client.print_service:
+                client.print_service.stop()
             if client.arduino:
                 client.arduino.close()
 
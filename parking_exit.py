@@ -1,23 +1,21 @@
-import requests
+from http_client import get_client
 import json
 import logging
-import time
 from datetime import datetime
 import serial
 import os
 from typing import Tuple, Optional, Dict, Any
 import platform
 import threading
+import asyncio
+from exit_lane import ExitLaneController
+from ticket_replica import TicketReplica
+from gate_metrics import GateMetrics
+import configparser
+from log_setup import setup_logging
 
 # Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/parking_exit.log'),
-        logging.StreamHandler()
-    ]
-)
+setup_logging('logs/parking_exit.log', console=True)
 logger = logging.getLogger(__name__)
 
 # Determine if running on Windows
@@ -35,6 +33,9 @@ class ParkingExit:
     def __init__(self):
         """Initialize parking exit system"""
         try:
+            # Metrik scan, validasi server dan palang (lihat gate_metrics)
+            self.metrics = GateMetrics('exit')
+            
             # GPIO Setup
             GPIO.setmode(GPIO.BCM)
             
@@ -57,13 +58,22 @@ class ParkingExit:
             self.barrier_open = False
             self.vehicle_detected = False
             
+            # Dipasang ExitLaneController untuk menerima perubahan loop detector
+            self.loop_listener = None
+            
             # API Configuration
             self.base_url = "http://192.168.2.6:5051"
+            self.http = get_client(self.base_url)
             self.headers = {
                 "Content-Type": "application/json",
                 "Accept": "application/json"
             }
             
+            # Replika tiket lunas dari server Django ([server] sync_url di config.ini)
+            self.replica = self._setup_replica()
+            if self.replica:
+                self.metrics.offline_queue.set_function(self.replica.pending_exits)
+            
             # Barcode scanner setup
             if IS_WINDOWS:
                 self.scanner = None
@@ -78,24 +88,53 @@ class ParkingExit:
                     logger.info("Barcode scanner initialized successfully")
                 except Exception as e:
                     logger.error(f"Failed to initialize barcode scanner: {e}")
+                    self.metrics.serial_errors.inc(device='scanner')
                     self.scanner = None
             
-            # Start loop detector monitoring in a separate thread
-            self.loop_detector_thread = threading.Thread(target=self._monitor_loop_detector)
-            self.loop_detector_thread.daemon = True
-            self.loop_detector_thread.start()
+            # Loop detector lewat edge callback, tanpa thread polling
+            self.loop_bouncetime = 50  # ms
+            self._loop_lock = threading.Lock()
+            self._sync_loop_state()
+            GPIO.add_event_detect(self.LOOP_DETECTOR, GPIO.BOTH,
+                                callback=self._loop_detector_callback,
+                                bouncetime=self.loop_bouncetime)
             
+            self.metrics.serve()
             logger.info("Parking exit system initialized successfully")
             
         except Exception as e:
             logger.error(f"Failed to initialize parking exit system: {e}")
             raise
     
-    def _monitor_loop_detector(self):
-        """Monitor loop detector state in a separate thread"""
-        while True:
-            try:
-                # Read loop detector state (LOW when vehicle detected)
+    def _setup_replica(self):
+        """Siapkan replika tiket lokal jika sync_url dikonfigurasi"""
+        config = configparser.ConfigParser()
+        config.read('config.ini')
+        if 'server' not in config or 'sync_url' not in config['server']:
+            return None
+        auth = (os.getenv('API_USERNAME', 'admin'), os.getenv('API_PASSWORD', 'admin'))
+        replica = TicketReplica(
+            config['server']['sync_url'],
+            gate_id=config['server'].get('gate_id', 'exit-1'),
+            auth=auth
+        )
+        replica.start()
+        logger.info("Replika tiket lokal aktif")
+        return replica
+    
+    def _loop_detector_callback(self, channel):
+        """Edge callback loop detector (LOW when vehicle detected)"""
+        self._sync_loop_state()
+        # Edge yang jatuh di dalam bouncetime diabaikan GPIO, jadi level
+        # dicek sekali lagi setelah bouncetime lewat
+        timer = threading.Timer(self.loop_bouncetime / 1000.0 + 0.01, self._sync_loop_state)
+        timer.daemon = True
+        timer.start()
+    
+    def _sync_loop_state(self):
+        """Samakan status kendaraan dengan level pin loop detector"""
+        try:
+            with self._loop_lock:
                 current_state = GPIO.input(self.LOOP_DETECTOR)
                 
                 if current_state == GPIO.LOW and not self.vehicle_detected:
@@ -103,6 +142,8 @@ class ParkingExit:
                     self.vehicle_detected = True
                     logger.info("Vehicle detected on loop")
                     print("🚗 Vehicle detected")
+                    if self.loop_listener:
+                        self.loop_listener(True)
                     
                 elif current_state == GPIO.HIGH and self.vehicle_detected:
                     # Vehicle just left the loop
@@ -110,15 +151,15 @@ class ParkingExit:
                     logger.info("Vehicle left the loop")
                     print("🚗 Vehicle passed")
                     
-                    # If barrier is open, close it
-                    if self.barrier_open:
+                    if self.loop_listener:
+                        # Controller jalur yang menutup palang
+                        self.loop_listener(False)
+                    elif self.barrier_open:
+                        # If barrier is open, close it
                         self.close_barrier()
-                
-                time.sleep(0.1)  # Small delay to prevent CPU overload
-                
-            except Exception as e:
-                logger.error(f"Error in loop detector monitoring: {e}")
-                time.sleep(1)  # Wait before retrying
+                        
+        except Exception as e:
+            logger.error(f"Error in loop detector callback: {e}")
     
     def read_barcode(self):
         """Read barcode from scanner or simulate with keyboard input"""
@@ -128,6 +169,7 @@ class ParkingExit:
                 barcode = input("Enter barcode (press Enter to simulate scan): ").strip()
                 if barcode:
                     logger.info(f"Barcode input (simulated): {barcode}")
+                    self.metrics.press('keyboard')
                     return barcode
                 return None
             else:
@@ -135,20 +177,26 @@ class ParkingExit:
                     barcode = self.scanner.readline().decode('utf-8').strip()
                     if barcode:
                         logger.info(f"Barcode read: {barcode}")
+                        self.metrics.press('scanner')
                         return barcode
                 return None
+        except EOFError:
+            raise
         except Exception as e:
             logger.error(f"Error reading barcode: {e}")
+            if isinstance(e, serial.SerialException):
+                self.metrics.serial_errors.inc(device='scanner')
             return None
     
     def process_exit(self, ticket_id):
         """Process vehicle exit with API"""
         try:
-            response = requests.post(
-                f"{self.base_url}/api/process-exit/",
-                json={"ticket_id": ticket_id},
-                headers=self.headers
-            )
+            with self.metrics.server_requests.time(endpoint='process-exit'):
+                response = self.http.post(
+                    "/api/process-exit/",
+                    json={"ticket_id": ticket_id},
+                    headers=self.headers
+                )
             
             if response.ok:
                 data = response.json()
@@ -172,6 +220,7 @@ class ParkingExit:
             GPIO.output(self.BARRIER_PIN, GPIO.HIGH)
             GPIO.output(self.LED_PIN, GPIO.HIGH)  # Turn on LED
             self.barrier_open = True
+            self.metrics.barrier_opens.inc()
             logger.info("Barrier gate opened")
             print("🔓 Barrier gate opened")
             return True
@@ -195,6 +244,7 @@ class ParkingExit:
     def button_callback(self, channel):
         """Callback function for button press"""
         logger.info("Button pressed - manual exit triggered")
+        self.metrics.press('button')
         self.open_barrier()
     
     def run(self):
@@ -213,21 +263,8 @@ class ParkingExit:
                 print("Press '5' to simulate loop detector (vehicle leaving)")
             print("Press Ctrl+C to exit")
             
-            while True:
-                # Check for barcode
-                barcode = self.read_barcode()
-                if barcode:
-                    print(f"\n📋 Processing ticket: {barcode}")
-                    success, result = self.process_exit(barcode)
-                    
-                    if success:
-                        print("✅ Exit authorized")
-                        print(f"💰 Fee: Rp {result.get('fee', 0)}")
-                        self.open_barrier()
-                    else:
-                        print(f"❌ Exit failed: {result}")
-                
-                time.sleep(0.1)  # Small delay to prevent CPU overload
+            # Scanner, validasi dan palang berjalan bersamaan di controller jalur
+            asyncio.run(ExitLaneController(self, replica=self.replica).run())
                 
         except KeyboardInterrupt:
             print("\n👋 Shutting down parking exit system...")
@@ -237,6 +274,9 @@ class ParkingExit:
         finally:
             if not IS_WINDOWS and self.scanner:
                 self.scanner.close()
+            if self.replica:
+                self.replica.stop()
+            self.metrics.stop()
             GPIO.cleanup()
             print("🔄 System cleanup completed")
 
@@ -0,0 +1,437 @@
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from .models import Vehicle, ParkingTicket, ParkingLog, assign_barcode_tokens
+from .ticket_ids import BLOCK_SIZE, TICKET_PREFIX, lease_block, leased_until, next_ticket_ids, parse_id
+from .photos import etag_for, find_entry_photo, get_thumbnail_cache, serve_photo
+from .query_profiler import get_registry
+import json
+import uuid
+
+# Batas jumlah kendaraan per request batch
+MAX_BATCH_SIZE = 500
+
+# Batas jumlah tiket per halaman delta feed replika
+MAX_CHANGES_PAGE = 1000
+
+# Mapping jenis kendaraan dari client gate ke pilihan model
+VEHICLE_TYPE_MAP = {
+    'MOTOR': 'MOTORCYCLE',
+    'MOTORCYCLE': 'MOTORCYCLE',
+    'MOBIL': 'CAR',
+    'CAR': 'CAR',
+    'TRUK': 'TRUCK',
+    'TRUCK': 'TRUCK',
+}
+
+def _normalize_vehicle_type(value):
+    """Ubah jenis kendaraan dari gate (Motor/Mobil) ke kode model"""
+    return VEHICLE_TYPE_MAP.get(str(value or '').strip().upper(), 'CAR')
+
+def _validate_entries(entries):
+    """Periksa entri batch sebelum menulis apa pun
+
+    Returns:
+        (plates, error): error berisi (pesan, status HTTP) jika ada entri
+        yang tidak valid
+    """
+    plates, supplied = [], []
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            return None, (f'Entri ke-{index + 1} harus berupa object', 400)
+        plate = str(entry.get('plat') or '').strip().upper()
+        if not plate:
+            return None, ('Setiap entri harus memiliki plat', 400)
+        plates.append(plate)
+        if entry.get('tiket'):
+            # Hanya ID dari blok yang sudah disewa gate (lihat ticket_ids)
+            number = parse_id(entry['tiket'], TICKET_PREFIX)
+            if number is None:
+                return None, (f"Format tiket tidak valid: {entry['tiket']}", 400)
+            supplied.append((entry['tiket'], number))
+
+    if supplied:
+        ticket_ids = [ticket_id for ticket_id, _ in supplied]
+        if len(set(ticket_ids)) != len(ticket_ids):
+            return None, ('Tiket duplikat di dalam batch', 400)
+        limit = leased_until('ticket')
+        not_leased = [ticket_id for ticket_id, number in supplied if number >= limit]
+        if not_leased:
+            return None, (f"Tiket belum pernah disewakan: {', '.join(not_leased[:5])}", 400)
+        existing = list(ParkingTicket.objects.filter(ticket_id__in=ticket_ids)
+                        .values_list('ticket_id', flat=True)[:5])
+        if existing:
+            return None, (f"Tiket sudah terdaftar: {', '.join(existing)}", 409)
+    return plates, None
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def vehicle_entry_batch(request):
+    """Catat banyak kendaraan masuk sekaligus dari gate controller
+
+    Body: {"entries": [{"plat": "AB1234CD", "jenis": "Motor"}, ...]}
+    Field "tiket" opsional, diisi gate yang sudah menyewa blok nomor tiket.
+    """
+    try:
+        data = json.loads(request.body)
+        entries = (data.get('entries') if isinstance(data, dict) else None) or []
+
+        if not isinstance(entries, list) or not entries:
+            return JsonResponse({
+                'success': False,
+                'message': 'entries harus berupa list dan tidak boleh kosong'
+            }, status=400)
+
+        if len(entries) > MAX_BATCH_SIZE:
+            return JsonResponse({
+                'success': False,
+                'message': f'Maksimal {MAX_BATCH_SIZE} kendaraan per batch'
+            }, status=400)
+
+        plates, error = _validate_entries(entries)
+        if error:
+            message, status = error
+            return JsonResponse({'success': False, 'message': message}, status=status)
+
+        now = timezone.now()
+        operator = request.user if request.user.is_authenticated else None
+
+        # Nomor tiket disewa sebelum transaksi: rollback batch tidak boleh
+        # membatalkan sewa blok yang sudah dipegang allocator
+        generated = iter(next_ticket_ids(sum(1 for entry in entries if not entry.get('tiket'))))
+
+        with transaction.atomic():
+            # Ambil kendaraan yang sudah terdaftar dalam satu query
+            vehicles = {v.license_plate: v for v in Vehicle.objects.filter(license_plate__in=plates)}
+
+            new_vehicles = []
+            for plate, entry in zip(plates, entries):
+                if plate not in vehicles:
+                    vehicle = Vehicle(
+                        license_plate=plate,
+                        vehicle_type=_normalize_vehicle_type(entry.get('jenis'))
+                    )
+                    vehicles[plate] = vehicle
+                    new_vehicles.append(vehicle)
+
+            if new_vehicles:
+                Vehicle.objects.bulk_create(new_vehicles)
+                # Backend tanpa RETURNING tidak mengisi pk, ambil ulang
+                if any(v.pk is None for v in new_vehicles):
+                    vehicles.update({
+                        v.license_plate: v
+                        for v in Vehicle.objects.filter(license_plate__in=[v.license_plate for v in new_vehicles])
+                    })
+
+            tickets = []
+            for plate, entry in zip(plates, entries):
+                ticket_id = entry.get('tiket') or next(generated)
+                tickets.append(ParkingTicket(
+                    ticket_id=ticket_id,
+                    vehicle=vehicles[plate],
+                    entry_time=now,
+                    barcode=str(uuid.uuid4()),
+                    operator=operator
+                ))
+            # bulk_create tidak memanggil save(); token bertabrakan dibuat ulang
+            assign_barcode_tokens(tickets)
+            ParkingTicket.objects.bulk_create(tickets)
+
+            if any(t.pk is None for t in tickets):
+                by_ticket_id = ParkingTicket.objects.in_bulk(
+                    [t.ticket_id for t in tickets], field_name='ticket_id'
+                )
+                tickets = [by_ticket_id[t.ticket_id] for t in tickets]
+
+            ParkingLog.objects.bulk_create([
+                ParkingLog(
+                    ticket=ticket,
+                    log_type='ENTRY',
+                    operator=operator,
+                    details=f"Kendaraan {plate} masuk"
+                )
+                for ticket, plate in zip(tickets, plates)
+            ])
+
+        return JsonResponse({
+            'success': True,
+            'message': f'{len(tickets)} kendaraan berhasil dicatat',
+            'data': [{
+                'plat': plate,
+                'tiket': ticket.ticket_id,
+                'barcode': ticket.barcode,
+                'barcode_token': ticket.barcode_token,
+                'waktu': timezone.localtime(ticket.entry_time).strftime('%Y-%m-%d %H:%M:%S')
+            } for ticket, plate in zip(tickets, plates)]
+        })
+
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'message': 'Body request bukan JSON yang valid'
+        }, status=400)
+    except IntegrityError as e:
+        # Tiket yang sama didaftarkan request lain di antara validasi dan insert
+        return JsonResponse({
+            'success': False,
+            'message': f'Tiket sudah terdaftar: {str(e)}'
+        }, status=409)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=500)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def lease_ticket_ids(request):
+    """Sewakan satu blok nomor tiket ke gate controller
+
+    Gate membuat ID tiket sendiri dari blok ini tanpa request per kendaraan.
+    """
+    try:
+        start, end = lease_block('ticket', BLOCK_SIZE)
+        return JsonResponse({
+            'success': True,
+            'data': {
+                'prefix': TICKET_PREFIX,
+                'start': start,
+                'end': end
+            }
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def ticket_photo(request, ticket_id):
+    """Foto masuk kendaraan untuk dibandingkan di gate keluar
+
+    Query ?size=thumb mengirim thumbnail 320px dari cache disk. Mendukung
+    ETag/If-None-Match dan header Range.
+    """
+    try:
+        path = find_entry_photo(ticket_id)
+        if path is None:
+            return JsonResponse({
+                'success': False,
+                'message': f'Foto tiket {ticket_id} tidak ditemukan'
+            }, status=404)
+
+        etag = etag_for(path)
+        if request.GET.get('size') == 'thumb':
+            path = get_thumbnail_cache().get(path, etag)
+            etag = etag[:-1] + '-thumb"'
+        return serve_photo(request, path, etag)
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def ticket_by_token(request, token):
+    """ID tiket dari token barcode yang dicetak (untuk gate keluar)"""
+    ticket = ParkingTicket.objects.filter(barcode_token=token.upper()).values(
+        'ticket_id', 'status', 'is_paid'
+    ).first()
+    if ticket is None:
+        return JsonResponse({
+            'success': False,
+            'message': f'Token {token} tidak dikenal'
+        }, status=404)
+    return JsonResponse({
+        'success': True,
+        'data': ticket
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def ticket_changes(request):
+    """Delta feed tiket untuk replika di gate keluar
+
+    Query: since (ISO datetime), since_id (opsional, untuk halaman lanjutan),
+    limit. Hasil diurutkan (updated_at, id) dan cursor halaman berikutnya
+    dikembalikan di data.cursor.
+
+    Replika hanya menyimpan tiket ACTIVE yang sudah lunas. Sinkronisasi awal
+    (tanpa since) hanya berisi tiket tersebut; pada delta, tiket yang tidak
+    lagi memenuhi syarat (mis. COMPLETED) dikirim sebagai tombstone
+    {'ticket_id', 'deleted': True} agar dihapus dari replika.
+    """
+    try:
+        limit = min(int(request.GET.get('limit', 500)), MAX_CHANGES_PAGE)
+        tickets = ParkingTicket.objects.order_by('updated_at', 'id')
+
+        since = request.GET.get('since')
+        if since:
+            since = parse_datetime(since)
+            if since is None:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Format since tidak valid'
+                }, status=400)
+            since_id = request.GET.get('since_id')
+            if since_id:
+                tickets = tickets.filter(
+                    Q(updated_at__gt=since) | Q(updated_at=since, id__gt=int(since_id))
+                )
+            else:
+                tickets = tickets.filter(updated_at__gte=since)
+        else:
+            tickets = tickets.filter(status='ACTIVE', is_paid=True)
+
+        rows = list(tickets.values(
+            'id', 'ticket_id', 'barcode', 'barcode_token', 'status', 'is_paid', 'fee', 'updated_at'
+        )[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        return JsonResponse({
+            'success': True,
+            'data': {
+                'tickets': [{
+                    'ticket_id': row['ticket_id'],
+                    'barcode': row['barcode'],
+                    'barcode_token': row['barcode_token'],
+                    'status': row['status'],
+                    'is_paid': row['is_paid'],
+                    'fee': float(row['fee']),
+                    'updated_at': row['updated_at'].isoformat()
+                } if row['status'] == 'ACTIVE' and row['is_paid'] else {
+                    'ticket_id': row['ticket_id'],
+                    'deleted': True,
+                    'updated_at': row['updated_at'].isoformat()
+                } for row in rows],
+                'cursor': {
+                    'since': rows[-1]['updated_at'].isoformat(),
+                    'since_id': rows[-1]['id']
+                } if rows else None,
+                'has_more': has_more
+            }
+        })
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=500)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def exit_batch(request):
+    """Terima data kendaraan keluar yang diantrikan replika gate keluar
+
+    Body: {"gate": "exit-1", "exits": [{"ticket_id": "...", "exit_time": "ISO"}]}
+    Upload ulang dengan exit_time yang sama dianggap diterima (idempoten);
+    tiket yang tidak ditemukan, belum lunas atau sudah keluar dengan waktu
+    berbeda dikembalikan sebagai konflik.
+    """
+    try:
+        data = json.loads(request.body)
+        exits = data.get('exits') or []
+        gate = data.get('gate', 'gate')
+
+        if not isinstance(exits, list) or len(exits) > MAX_BATCH_SIZE:
+            return JsonResponse({
+                'success': False,
+                'message': f'exits harus berupa list maksimal {MAX_BATCH_SIZE} item'
+            }, status=400)
+
+        operator = request.user if request.user.is_authenticated else None
+        accepted, conflicts = [], []
+        now = timezone.now()
+
+        with transaction.atomic():
+            tickets = ParkingTicket.objects.select_for_update().select_related('vehicle').in_bulk(
+                [item.get('ticket_id') for item in exits], field_name='ticket_id'
+            )
+
+            updated, logs = [], []
+            for item in exits:
+                ticket_id = item.get('ticket_id')
+                exit_time = parse_datetime(item.get('exit_time') or '') or now
+                ticket = tickets.get(ticket_id)
+
+                if ticket is None:
+                    conflicts.append({'ticket_id': ticket_id, 'reason': 'not_found'})
+                elif ticket.status == 'COMPLETED':
+                    if ticket.exit_time == exit_time:
+                        accepted.append(ticket_id)
+                    else:
+                        conflicts.append({'ticket_id': ticket_id, 'reason': 'already_exited'})
+                elif ticket.status != 'ACTIVE' or not ticket.is_paid:
+                    conflicts.append({'ticket_id': ticket_id, 'reason': 'unpaid'})
+                else:
+                    ticket.exit_time = exit_time
+                    ticket.status = 'COMPLETED'
+                    # bulk_update tidak mengisi auto_now
+                    ticket.updated_at = now
+                    updated.append(ticket)
+                    logs.append(ParkingLog(
+                        ticket=ticket,
+                        log_type='EXIT',
+                        operator=operator,
+                        details=f"Kendaraan {ticket.vehicle.license_plate} keluar ({gate})"
+                    ))
+                    accepted.append(ticket_id)
+
+            if updated:
+                ParkingTicket.objects.bulk_update(updated, ['exit_time', 'status', 'updated_at'])
+                ParkingLog.objects.bulk_create(logs)
+
+        return JsonResponse({
+            'success': True,
+            'data': {
+                'accepted': accepted,
+                'conflicts': conflicts
+            }
+        })
+
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'message': 'Body request bukan JSON yang valid'
+        }, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def query_metrics(request):
+    """Statistik query database per view untuk memantau N+1
+
+    Default format teks Prometheus; ?format=json untuk detail beserta bentuk
+    SQL yang paling sering diulang. ?top=N mengatur jumlah bentuk SQL per view.
+    """
+    try:
+        top = max(1, min(int(request.GET.get('top', 5)), 50))
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'message': 'top harus berupa angka'
+        }, status=400)
+
+    registry = get_registry()
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'success': True,
+            'data': registry.snapshot(top=top)
+        })
+    return HttpResponse(registry.to_prometheus(top=top), content_type='text/plain; version=0.0.4')
@@ -1,5 +1,6 @@
 from django.urls import path
 from . import views
+from . import api
 
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
@@ -23,4 +24,13 @@ urlpatterns = [
     path('reports/monthly/<int:year>/<int:month>/', views.monthly_report, name='monthly_report'),
     path('reports/transactions/', views.transaction_list, name='transaction_list'),
     path('reports/transactions/<int:transaction_id>/', views.transaction_detail, name='transaction_detail'),
+    
+    # API endpoints
+    path('api/entry/batch/', api.vehicle_entry_batch, name='api_vehicle_entry_batch'),
+    path('api/ticket-ids/lease/', api.lease_ticket_ids, name='api_lease_ticket_ids'),
+    path('api/tickets/changes/', api.ticket_changes, name='api_ticket_changes'),
+    path('api/tickets/token/<str:token>/', api.ticket_by_token, name='api_ticket_by_token'),
+    path('api/tickets/<str:ticket_id>/photo/', api.ticket_photo, name='api_ticket_photo'),
+    path('api/exits/batch/', api.exit_batch, name='api_exit_batch'),
+    path('api/metrics/queries/', api.query_metrics, name='api_query_metrics'),
 ] 
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""
+Profil jumlah query per view dengan Django test client.
+
+Dipakai untuk menangkap regresi N+1 sebelum rilis:
+
+    python manage.py profile_queries
+    python manage.py profile_queries / /reports/financial/ --repeat 3
+    python manage.py profile_queries --max-queries 30
+
+Tanpa argumen path, view utama (dashboard, laporan, detail tiket dan
+transaksi terbaru) yang diprofil. Hanya request GET yang dikirim.
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from parking_manager.models import ParkingTicket, PaymentTransaction
+from parking_manager.query_profiler import QueryStatsRegistry, profile_queries
+
+class Command(BaseCommand):
+    help = "Profil jumlah query database per view untuk mendeteksi N+1"
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help="path URL yang diprofil (GET)")
+        parser.add_argument('--user', default='admin', help="user yang dipakai login")
+        parser.add_argument('--repeat', type=int, default=1, help="jumlah request per path")
+        parser.add_argument('--top', type=int, default=3, help="bentuk SQL berulang yang ditampilkan")
+        parser.add_argument('--max-queries', type=int, help="gagal jika ada request melebihi jumlah ini")
+
+    def default_paths(self):
+        paths = [
+            reverse('dashboard'),
+            reverse('financial_report'),
+            reverse('export_report'),
+            reverse('transaction_list'),
+            reverse('voucher_list'),
+        ]
+        ticket = ParkingTicket.objects.order_by('-entry_time').first()
+        if ticket:
+            paths.append(reverse('ticket_detail', args=[ticket.ticket_id]))
+        transaction = PaymentTransaction.objects.order_by('-timestamp').first()
+        if transaction:
+            paths.append(reverse('transaction_detail', args=[transaction.id]))
+        return paths
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} tidak ditemukan")
+
+        # Izinkan host 'testserver' milik test client
+        setup_test_environment()
+        try:
+            client = Client()
+            client.force_login(user)
+            registry = QueryStatsRegistry()
+            statuses = {}
+
+            for path in options['paths'] or self.default_paths():
+                for _ in range(options['repeat']):
+                    with profile_queries() as recorder:
+                        response = client.get(path)
+                    match = getattr(response, 'resolver_match', None)
+                    view = match.view_name if match else path
+                    registry.record(view, recorder)
+                    statuses[view] = response.status_code
+        finally:
+            teardown_test_environment()
+
+        self.report(registry.snapshot(top=options['top']), statuses, options['max_queries'])
+
+    def report(self, snapshot, statuses, max_queries):
+        self.stdout.write(f"{'view':<32}{'status':>7}{'req':>5}{'avg q':>8}{'max q':>7}{'db ms':>9}")
+        over_budget = []
+        for view, stats in snapshot.items():
+            line = (f"{view:<32}{statuses.get(view, '-'):>7}{stats['requests']:>5}"
+                    f"{stats['queries_avg']:>8}{stats['queries_max']:>7}{stats['db_time_avg_ms']:>9}")
+            if max_queries is not None and stats['queries_max'] > max_queries:
+                over_budget.append(view)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+            for shape in stats['top_shapes']:
+                if shape['max_per_request'] < 2:
+                    continue
+                self.stdout.write(
+                    f"    x{shape['max_per_request']:<4} [{shape['id']}] {shape['sql'][:120]}"
+                )
+
+        if over_budget:
+            raise CommandError(f"Melebihi {max_queries} query: {', '.join(over_budget)}")
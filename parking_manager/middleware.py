@@ -0,0 +1,44 @@
+"""
+Middleware penghitung query database per request.
+
+Jika settings.QUERY_PROFILING aktif, jumlah query, waktu DB dan bentuk SQL
+yang berulang dicatat per view (lihat query_profiler dan
+api/metrics/queries/). Jika settings.QUERY_COUNT_HEADER aktif, setiap
+response juga diberi header X-DB-Queries, X-DB-Time-Ms dan X-DB-Repeated
+(ulangan terbanyak satu bentuk SQL). Header ini dibaca load_generator.py
+untuk melaporkan jumlah query per endpoint.
+"""
+import logging
+from django.conf import settings
+from .query_profiler import get_registry, profile_queries, view_name
+
+logger = logging.getLogger(__name__)
+
+class QueryCountMiddleware:
+    """Profil query database per request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.header = getattr(settings, 'QUERY_COUNT_HEADER', False)
+        self.profiling = getattr(settings, 'QUERY_PROFILING', False)
+        self.slow_ms = getattr(settings, 'QUERY_SLOW_MS', None)
+
+    def __call__(self, request):
+        if not (self.header or self.profiling):
+            return self.get_response(request)
+
+        with profile_queries(slow_ms=self.slow_ms) as recorder:
+            response = self.get_response(request)
+
+        view = view_name(request)
+        if self.profiling:
+            get_registry().record(view, recorder)
+        for elapsed_ms, sql in recorder.slow:
+            logger.warning(f"Query lambat {elapsed_ms:.0f} ms di {view}: {sql[:500]}")
+
+        if self.header:
+            repeated = recorder.most_repeated()
+            response['X-DB-Queries'] = str(recorder.count)
+            response['X-DB-Time-Ms'] = f"{recorder.time * 1000:.1f}"
+            response['X-DB-Repeated'] = str(repeated[1] if repeated else 0)
+        return response
@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import IntegrityError, models
 from django.utils import timezone
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from barcode_token import make_token
 
 class Vehicle(models.Model):
     VEHICLE_TYPES = [
@@ -74,6 +75,8 @@ class ParkingTicket(models.Model):
     is_paid = models.BooleanField(default=False, verbose_name='Sudah Dibayar')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ACTIVE', verbose_name='Status')
     barcode = models.CharField(max_length=100, unique=True, verbose_name='Barcode')
+    # Token CODE39 yang dicetak di tiket (lihat barcode_token.make_token)
+    barcode_token = models.CharField(max_length=16, unique=True, null=True, blank=True, editable=False, verbose_name='Token Barcode')
     operator = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, verbose_name='Operator')
     notes = models.TextField(blank=True, null=True, verbose_name='Catatan')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -82,6 +85,11 @@ class ParkingTicket(models.Model):
     def __str__(self):
         return f"Tiket {self.ticket_id} - {self.vehicle.license_plate}"
     
+    def save(self, *args, **kwargs):
+        if not self.barcode_token:
+            assign_barcode_tokens([self])
+        super().save(*args, **kwargs)
+    
     def calculate_duration(self):
         if self.exit_time:
             return self.exit_time - self.entry_time
@@ -116,6 +124,10 @@ class ParkingTicket(models.Model):
     class Meta:
         verbose_name = 'Tiket Parkir'
         verbose_name_plural = 'Tiket Parkir'
+        indexes = [
+            # Delta feed replika gate keluar
+            models.Index(fields=['updated_at', 'id']),
+        ]
 
 class ParkingLog(models.Model):
     LOG_TYPES = [
@@ -191,7 +203,7 @@ class Voucher(models.Model):
 
 class VoucherUsage(models.Model):
     voucher = models.ForeignKey(Voucher, on_delete=models.CASCADE, verbose_name='Voucher')
-    payment = models.ForeignKey(PaymentTransaction, on_delete=models.CASCADE, verbose_name='Pembayaran')
+    payment = models.ForeignKey('PaymentTransaction', on_delete=models.CASCADE, verbose_name='Pembayaran')
     amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Nilai Potongan')
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -278,4 +290,45 @@ class PaymentTransaction(models.Model):
     
     class Meta:
         verbose_name = 'Transaksi Pembayaran'
-        verbose_name_plural = 'Transaksi Pembayaran' 
\ No newline at end of file
+        verbose_name_plural = 'Transaksi Pembayaran'
+
+def assign_barcode_tokens(tickets, attempts=3):
+    """Isi barcode_token tiket yang belum punya token, tanpa tabrakan
+
+    Token yang sudah dipakai tiket lain (di database atau di dalam daftar
+    yang sama) dibuat ulang dengan salt, sama seperti ParkingCamera di gate.
+    bulk_create tidak memanggil save(), jadi batch memanggil fungsi ini
+    langsung.
+    """
+    pending = [ticket for ticket in tickets if not ticket.barcode_token]
+    used = {ticket.barcode_token for ticket in tickets if ticket.barcode_token}
+    for salt in range(attempts):
+        if not pending:
+            return
+        candidates = {id(ticket): make_token(ticket.ticket_id, salt) for ticket in pending}
+        taken = set(ParkingTicket.objects.filter(barcode_token__in=candidates.values())
+                    .values_list('barcode_token', flat=True))
+        retry = []
+        for ticket in pending:
+            token = candidates[id(ticket)]
+            if token in taken or token in used:
+                retry.append(ticket)
+                continue
+            ticket.barcode_token = token
+            used.add(token)
+        pending = retry
+    if pending:
+        raise IntegrityError(f"Token barcode bertabrakan untuk tiket {pending[0].ticket_id}")
+
+class TicketSequence(models.Model):
+    """Counter blok nomor tiket untuk database tanpa SEQUENCE (mis. SQLite)"""
+    name = models.CharField(max_length=50, unique=True, verbose_name='Nama Sequence')
+    next_value = models.BigIntegerField(default=1, verbose_name='Nilai Berikutnya')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.next_value})"
+    
+    class Meta:
+        verbose_name = 'Sequence Tiket'
+        verbose_name_plural = 'Sequence Tiket'
@@ -0,0 +1,172 @@
+"""
+Foto masuk kendaraan untuk operator gate keluar.
+
+Foto dicari lewat index capture (capture_store.CaptureStore) berdasarkan ID
+tiket. Thumbnail 320px dibuat sekali lalu disimpan di cache disk dengan
+batas ukuran; file yang paling lama tidak dipakai dihapus lebih dulu (LRU).
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from PIL import Image
+from capture_store import CaptureStore
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WIDTH = 320
+THUMBNAIL_QUALITY = 70
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_capture_store():
+    """CaptureStore bersama untuk folder capture dari settings"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CaptureStore(settings.CAPTURE_DIR, backup_dir=settings.CAPTURE_BACKUP_DIR)
+        return _store
+
+def find_entry_photo(ticket_id):
+    """Path foto masuk untuk tiket, None jika tidak ada"""
+    path = get_capture_store().lookup(ticket_id)
+    if path and os.path.exists(path):
+        return path
+    return None
+
+def etag_for(path):
+    stat = os.stat(path)
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+class ThumbnailCache:
+    """Cache thumbnail di disk dengan eviksi LRU berdasarkan mtime"""
+
+    def __init__(self, directory, max_bytes, width=THUMBNAIL_WIDTH):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.width = width
+        self._total = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _cache_path(self, source, etag):
+        # ETag sumber ikut di nama file: foto yang diarsipkan ulang dapat thumbnail baru
+        key = hashlib.sha1(f"{source}|{etag}|{self.width}".encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{key}.jpg")
+
+    def get(self, source, etag):
+        """Path thumbnail untuk foto sumber, dibuat jika belum ada di cache"""
+        path = self._cache_path(source, etag)
+        if os.path.exists(path):
+            # Tandai baru dipakai untuk urutan LRU
+            os.utime(path, None)
+            return path
+
+        with Image.open(source) as image:
+            # draft() membuat decoder JPEG langsung decode pada skala kecil
+            image.draft('RGB', (self.width, self.width))
+            image = image.convert('RGB')
+            height = max(1, round(image.height * self.width / image.width))
+            image = image.resize((self.width, height), Image.BILINEAR)
+
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            image.save(temp_path, 'JPEG', quality=THUMBNAIL_QUALITY)
+        os.replace(temp_path, path)
+
+        self._add(os.path.getsize(path))
+        return path
+
+    def _scan(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.jpg'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _add(self, size):
+        with self._lock:
+            if self._total is None:
+                self._total = sum(item[1] for item in self._scan())
+            else:
+                self._total += size
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Hapus thumbnail terlama sampai ukuran cache turun ke 90% batas"""
+        entries = sorted(self._scan())
+        total = sum(item[1] for item in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total = total
+
+_thumbnails = None
+
+def get_thumbnail_cache():
+    global _thumbnails
+    with _store_lock:
+        if _thumbnails is None:
+            _thumbnails = ThumbnailCache(
+                settings.THUMBNAIL_CACHE_DIR,
+                settings.THUMBNAIL_CACHE_MAX_MB * 1024 * 1024
+            )
+        return _thumbnails
+
+def serve_photo(request, path, etag):
+    """Kirim file JPEG dengan dukungan If-None-Match dan satu rentang Range"""
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    size = os.path.getsize(path)
+    range_header = request.headers.get('Range')
+    match = _RANGE_RE.match(range_header.strip()) if range_header else None
+
+    # If-Range dengan ETag lama: kirim file utuh
+    if match and request.headers.get('If-Range', etag) != etag:
+        match = None
+
+    if match:
+        start_text, end_text = match.groups()
+        if start_text:
+            start = int(start_text)
+            end = min(int(end_text), size - 1) if end_text else size - 1
+        elif end_text:
+            # bytes=-N berarti N byte terakhir
+            start = max(0, size - int(end_text))
+            end = size - 1
+        else:
+            start, end = 0, -1
+
+        if start > end or start >= size:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        with open(path, 'rb') as f:
+            f.seek(start)
+            body = f.read(end - start + 1)
+        response = HttpResponse(body, status=206, content_type='image/jpeg')
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    else:
+        response = FileResponse(open(path, 'rb'), content_type='image/jpeg')
+
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
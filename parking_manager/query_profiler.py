@@ -0,0 +1,190 @@
+"""
+Profil query database per view untuk mendeteksi pola N+1.
+
+Setiap request dibungkus profile_queries(): jumlah query, total waktu DB dan
+"bentuk" SQL (literal dan daftar IN diganti placeholder) dicatat. Bentuk yang
+berulang banyak kali dalam satu request, mis. akses ticket.vehicle di dalam
+loop, adalah tanda N+1. Hasil per view diakumulasi di registry proses dan
+bisa dibaca lewat api/metrics/queries/ (format Prometheus atau JSON) tanpa
+DEBUG=True.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Jumlah bentuk SQL yang disimpan per view
+MAX_SHAPES_PER_VIEW = 100
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+def normalize_sql(sql):
+    """Bentuk SQL tanpa nilai literal, sehingga query yang sama bisa dikelompokkan"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+def shape_id(shape):
+    return hashlib.sha1(shape.encode('utf-8')).hexdigest()[:8]
+
+class QueryRecorder:
+    """Pencatat query satu request (dipasang sebagai execute_wrapper)"""
+
+    def __init__(self, slow_ms=None):
+        self.count = 0
+        self.time = 0.0
+        self.shapes = Counter()
+        self.slow = []
+        self.slow_ms = slow_ms
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.time += elapsed
+            self.shapes[normalize_sql(sql)] += 1
+            if self.slow_ms is not None and elapsed * 1000 >= self.slow_ms:
+                self.slow.append((elapsed * 1000, sql))
+
+    def most_repeated(self):
+        """(bentuk SQL, jumlah) yang paling sering diulang, None jika tidak ada query"""
+        return self.shapes.most_common(1)[0] if self.shapes else None
+
+@contextmanager
+def profile_queries(slow_ms=None):
+    """Catat semua query di thread ini selama blok with berjalan"""
+    recorder = QueryRecorder(slow_ms=slow_ms)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+
+class QueryStatsRegistry:
+    """Akumulasi statistik query per view"""
+
+    def __init__(self, repeat_threshold=5):
+        self.repeat_threshold = repeat_threshold
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def record(self, view, recorder):
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = {
+                    'requests': 0,
+                    'queries': 0,
+                    'db_time': 0.0,
+                    'max_queries': 0,
+                    'slow_queries': 0,
+                    'shapes': {},
+                }
+            stats['requests'] += 1
+            stats['queries'] += recorder.count
+            stats['db_time'] += recorder.time
+            stats['max_queries'] = max(stats['max_queries'], recorder.count)
+            stats['slow_queries'] += len(recorder.slow)
+
+            shapes = stats['shapes']
+            for shape, count in recorder.shapes.items():
+                entry = shapes.get(shape)
+                if entry is None:
+                    if len(shapes) >= MAX_SHAPES_PER_VIEW:
+                        # Buang bentuk yang paling jarang muncul
+                        del shapes[min(shapes, key=lambda key: shapes[key]['total'])]
+                    entry = shapes[shape] = {'total': 0, 'max_per_request': 0, 'repeated_requests': 0}
+                entry['total'] += count
+                entry['max_per_request'] = max(entry['max_per_request'], count)
+                if count >= self.repeat_threshold:
+                    entry['repeated_requests'] += 1
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def snapshot(self, top=5):
+        """Statistik per view beserta bentuk SQL yang paling sering diulang"""
+        with self._lock:
+            result = {}
+            for view, stats in sorted(self._views.items()):
+                repeated = sorted(
+                    stats['shapes'].items(),
+                    key=lambda item: (item[1]['max_per_request'], item[1]['total']),
+                    reverse=True
+                )[:top]
+                result[view] = {
+                    'requests': stats['requests'],
+                    'queries_total': stats['queries'],
+                    'queries_avg': round(stats['queries'] / stats['requests'], 2),
+                    'queries_max': stats['max_queries'],
+                    'db_time_total_ms': round(stats['db_time'] * 1000, 1),
+                    'db_time_avg_ms': round(stats['db_time'] * 1000 / stats['requests'], 2),
+                    'slow_queries': stats['slow_queries'],
+                    'top_shapes': [
+                        dict(entry, id=shape_id(shape), sql=shape) for shape, entry in repeated
+                    ],
+                }
+            return result
+
+    def to_prometheus(self, top=5):
+        """Format teks Prometheus (exposition format 0.0.4)"""
+        snapshot = self.snapshot(top=top)
+        metrics = [
+            ('parking_view_requests_total', 'counter', 'Request per view yang diprofil', 'requests', 1),
+            ('parking_view_db_queries_total', 'counter', 'Jumlah query database per view', 'queries_total', 1),
+            ('parking_view_db_time_seconds_total', 'counter', 'Total waktu query database per view', 'db_time_total_ms', 0.001),
+            ('parking_view_db_queries_max', 'gauge', 'Query terbanyak dalam satu request', 'queries_max', 1),
+            ('parking_view_slow_queries_total', 'counter', 'Query yang melewati QUERY_SLOW_MS', 'slow_queries', 1),
+        ]
+        lines = []
+        for name, kind, help_text, key, scale in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for view, stats in snapshot.items():
+                value = stats[key] * scale
+                lines.append(f'{name}{{view="{_label(view)}"}} {value:g}')
+
+        lines.append("# HELP parking_view_sql_repeat_max Ulangan terbanyak satu bentuk SQL dalam satu request")
+        lines.append("# TYPE parking_view_sql_repeat_max gauge")
+        for view, stats in snapshot.items():
+            for shape in stats['top_shapes']:
+                lines.append(
+                    f'parking_view_sql_repeat_max{{view="{_label(view)}",shape="{shape["id"]}"}} '
+                    f'{shape["max_per_request"]}'
+                )
+        return "\n".join(lines) + "\n"
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    """Registry bersama untuk seluruh proses server"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            from django.conf import settings
+            _registry = QueryStatsRegistry(
+                repeat_threshold=getattr(settings, 'QUERY_REPEAT_THRESHOLD', 5)
+            )
+        return _registry
+
+def view_name(request):
+    """Nama view dari hasil resolve URL, atau 'unresolved'"""
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
@@ -0,0 +1,138 @@
+"""
+Alokasi nomor tiket dan transaksi berbasis SEQUENCE database.
+
+Nomor dialokasikan per blok (default 100). Di PostgreSQL blok diambil dari
+SEQUENCE dengan INCREMENT BY sebesar ukuran blok, sehingga satu nextval()
+mewakili 100 nomor unik. Database lain (SQLite untuk development) memakai
+tabel TicketSequence dengan row lock.
+
+Blok harus disewa di luar transaction.atomic() milik pemanggil. Di dalam
+transaksi, update TicketSequence (dan CREATE SEQUENCE pertama di PostgreSQL)
+ikut di-rollback bersama transaksi tersebut, sementara BlockAllocator tetap
+memegang bloknya, sehingga nomor yang sama dibagikan dua kali. Ambil nomor
+lebih dulu (next_ticket_ids) lalu buka transaksi.
+"""
+import re
+import threading
+from django.db import connection, transaction
+from .models import TicketSequence
+
+BLOCK_SIZE = 100
+
+TICKET_PREFIX = 'PKR'
+TRANSACTION_PREFIX = 'TRX'
+
+_ID_RE = re.compile(r'^([A-Z]+)(\d{10})$')
+
+def format_id(prefix, number):
+    """Format nomor urut menjadi ID tiket, mis. PKR0000001234"""
+    return f"{prefix}{number:010d}"
+
+def parse_id(value, prefix):
+    """Nomor urut dari ID berformat format_id(prefix, n), None jika bukan"""
+    match = _ID_RE.match(str(value or ''))
+    if not match or match.group(1) != prefix:
+        return None
+    return int(match.group(2))
+
+def _sequence_name(name):
+    return f"parking_{name}_seq"
+
+def _lease_postgres(name, size):
+    seq = _sequence_name(name)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE SEQUENCE IF NOT EXISTS {seq} START WITH 1 INCREMENT BY {size}"
+        )
+        cursor.execute("SELECT nextval(%s)", [seq])
+        return cursor.fetchone()[0]
+
+def _lease_table(name, size):
+    with transaction.atomic():
+        sequence, _ = TicketSequence.objects.select_for_update().get_or_create(name=name)
+        start = sequence.next_value
+        sequence.next_value = start + size
+        sequence.save(update_fields=['next_value', 'updated_at'])
+        return start
+
+def leased_until(name):
+    """Batas atas (eksklusif) nomor yang sudah pernah disewakan"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            # last_value NULL: sequence belum pernah dipakai
+            cursor.execute(
+                "SELECT last_value, increment_by FROM pg_sequences WHERE sequencename = %s",
+                [_sequence_name(name)]
+            )
+            row = cursor.fetchone()
+            if row is None or row[0] is None:
+                return 1
+            return row[0] + row[1]
+    sequence = TicketSequence.objects.filter(name=name).first()
+    return sequence.next_value if sequence else 1
+
+def lease_block(name, size=BLOCK_SIZE):
+    """Reservasi satu blok nomor, kembalikan (start, end) dengan end eksklusif"""
+    if connection.vendor == 'postgresql':
+        start = _lease_postgres(name, size)
+    else:
+        start = _lease_table(name, size)
+    return start, start + size
+
+class BlockAllocator:
+    """Bagikan nomor dari blok yang sudah direservasi, thread-safe
+
+    Hanya mengakses database saat blok habis, sekali per BLOCK_SIZE nomor.
+    """
+
+    def __init__(self, name, prefix, size=BLOCK_SIZE):
+        self.name = name
+        self.prefix = prefix
+        self.size = size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def _lease(self):
+        if connection.in_atomic_block:
+            raise RuntimeError(
+                f"Nomor {self.name} harus diambil di luar transaction.atomic() "
+                "(blok bisa ikut di-rollback dan nomor dibagikan ulang)"
+            )
+        self._next, self._end = lease_block(self.name, self.size)
+
+    def next_numbers(self, count):
+        """`count` nomor berurutan dari blok, sewa blok baru bila perlu"""
+        numbers = []
+        with self._lock:
+            while len(numbers) < count:
+                if self._next >= self._end:
+                    self._lease()
+                take = min(count - len(numbers), self._end - self._next)
+                numbers.extend(range(self._next, self._next + take))
+                self._next += take
+        return numbers
+
+    def next_number(self):
+        return self.next_numbers(1)[0]
+
+    def next_id(self):
+        return format_id(self.prefix, self.next_number())
+
+    def next_ids(self, count):
+        return [format_id(self.prefix, number) for number in self.next_numbers(count)]
+
+ticket_allocator = BlockAllocator('ticket', TICKET_PREFIX)
+transaction_allocator = BlockAllocator('transaction', TRANSACTION_PREFIX)
+
+def next_ticket_id():
+    """ID tiket parkir berikutnya"""
+    return ticket_allocator.next_id()
+
+def next_ticket_ids(count):
+    """`count` ID tiket sekaligus (untuk batch, sebelum membuka transaksi)"""
+    return ticket_allocator.next_ids(count)
+
+def next_transaction_id():
+    """ID transaksi pembayaran berikutnya"""
+    return transaction_allocator.next_id()
@@ -1,116 +1,239 @@
+"""
+Cetak struk pembayaran di gate keluar.
+
+Font TrueType dimuat sekali per proses (cache di level modul), gambar struk
+langsung dibuat 1-bit tanpa file PNG sementara, dan struk juga bisa dikirim
+sebagai teks ESC/POS (RECEIPT_MODE = 'escpos') tanpa render gambar sama
+sekali. Pencetakan berjalan di satu thread background (submit_receipt),
+sehingga request pembayaran langsung kembali tanpa menunggu printer.
+"""
+import logging
 import os
-import tempfile
-from datetime import datetime
+import textwrap
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image, ImageDraw, ImageFont
-import win32print
-import win32ui
 from django.conf import settings
+from django.db import close_old_connections
+from lazy_import import lazy_module
+from print_service import Win32Backend
+
+logger = logging.getLogger(__name__)
+
+win32print = lazy_module('win32print')
+win32ui = lazy_module('win32ui')
+ImageWin = lazy_module('PIL.ImageWin')
+
+# Lebar kertas 58mm pada printer thermal (dot dan karakter font A)
+RECEIPT_WIDTH = 380
+RECEIPT_CHARS = 32
+
+_fonts = {}
+_font_lock = threading.Lock()
+
+def get_font(size):
+    """Font struk ukuran `size`, dimuat sekali per proses"""
+    with _font_lock:
+        font = _fonts.get(size)
+        if font is None:
+            try:
+                font_path = os.path.join(settings.BASE_DIR, 'static', 'fonts', 'arial.ttf')
+                font = ImageFont.truetype(font_path, size)
+            except OSError:
+                font = ImageFont.load_default()
+            _fonts[size] = font
+        return font
+
+def receipt_items(data):
+    """Baris (label, nilai) struk dari PaymentTransaction.generate_receipt_data()"""
+    return [
+        ('No. Transaksi', data['transaction_id']),
+        ('Tanggal', data['datetime']),
+        ('No. Tiket', data['ticket_id']),
+        ('Plat Nomor', data['vehicle']),
+        ('Jenis Kendaraan', data['vehicle_type']),
+        ('Waktu Masuk', data['entry_time']),
+        ('Durasi', data['duration']),
+        ('Tarif', f"Rp {data['fee']:,.0f}"),
+        ('Dibayar', f"Rp {data['amount_paid']:,.0f}"),
+        ('Kembalian', f"Rp {data['change']:,.0f}"),
+        ('Metode', data['payment_method']),
+        ('Operator', data['operator'])
+    ]
 
 class ReceiptPrinter:
-    def __init__(self):
-        self.receipt_width = 380
+    def __init__(self, mode=None, printer_name=None):
+        """
+        Args:
+            mode: 'image' (gambar lewat GDI) atau 'escpos' (teks RAW);
+                default settings.RECEIPT_MODE
+            printer_name: default settings.RECEIPT_PRINTER, lalu default printer
+        """
+        self.mode = mode or getattr(settings, 'RECEIPT_MODE', 'image')
+        self.printer_name = printer_name or getattr(settings, 'RECEIPT_PRINTER', '') or None
+        self.receipt_width = RECEIPT_WIDTH
         self.margin = 20
         self.line_height = 25
-        
-        # Load font
-        try:
-            font_path = os.path.join(settings.BASE_DIR, 'static', 'fonts', 'arial.ttf')
-            self.font_header = ImageFont.truetype(font_path, 20)
-            self.font_normal = ImageFont.truetype(font_path, 16)
-        except:
-            self.font_header = ImageFont.load_default()
-            self.font_normal = ImageFont.load_default()
-    
+        self.font_header = get_font(20)
+        self.font_normal = get_font(16)
+        self._backend = None
+
     def create_receipt_image(self, data):
-        """Membuat gambar struk pembayaran"""
+        """Membuat gambar struk pembayaran (1-bit, siap dikirim ke printer thermal)"""
+        items = receipt_items(data)
+
         # Hitung tinggi struk berdasarkan konten
-        content_height = len(data.keys()) * self.line_height + 100
-        
-        # Buat gambar dengan background putih
-        image = Image.new('RGB', (self.receipt_width, content_height), 'white')
+        lines = len(items) + 3 + (2.5 if data.get('notes') else 0)
+        content_height = int(lines * self.line_height) + self.margin * 2
+
+        # Gambar 1-bit dengan background putih (1), teks hitam (0)
+        image = Image.new('1', (self.receipt_width, content_height), 1)
         draw = ImageDraw.Draw(image)
-        
+
         # Header struk
         y = self.margin
-        draw.text((self.margin, y), "STRUK PEMBAYARAN PARKIR", font=self.font_header, fill='black')
+        draw.text((self.margin, y), "STRUK PEMBAYARAN PARKIR", font=self.font_header, fill=0)
         y += self.line_height * 1.5
-        
+
         # Informasi transaksi
-        items = [
-            ('No. Transaksi', data['transaction_id']),
-            ('Tanggal', data['datetime']),
-            ('No. Tiket', data['ticket_id']),
-            ('Plat Nomor', data['vehicle']),
-            ('Jenis Kendaraan', data['vehicle_type']),
-            ('Waktu Masuk', data['entry_time']),
-            ('Durasi', data['duration']),
-            ('Tarif', f"Rp {data['fee']:,.0f}"),
-            ('Dibayar', f"Rp {data['amount_paid']:,.0f}"),
-            ('Kembalian', f"Rp {data['change']:,.0f}"),
-            ('Metode', data['payment_method']),
-            ('Operator', data['operator'])
-        ]
-        
         for label, value in items:
-            draw.text((self.margin, y), label, font=self.font_normal, fill='black')
-            draw.text((self.receipt_width//2, y), ': ' + str(value), font=self.font_normal, fill='black')
+            draw.text((self.margin, y), label, font=self.font_normal, fill=0)
+            draw.text((self.receipt_width//2, y), ': ' + str(value), font=self.font_normal, fill=0)
             y += self.line_height
-        
+
         # Catatan jika ada
         if data.get('notes'):
             y += self.line_height//2
-            draw.text((self.margin, y), "Catatan:", font=self.font_normal, fill='black')
+            draw.text((self.margin, y), "Catatan:", font=self.font_normal, fill=0)
             y += self.line_height
-            draw.text((self.margin, y), data['notes'], font=self.font_normal, fill='black')
+            draw.text((self.margin, y), data['notes'], font=self.font_normal, fill=0)
             y += self.line_height
-        
+
         # Footer
         y += self.line_height
-        draw.text((self.margin, y), "Terima kasih atas kunjungan Anda", font=self.font_normal, fill='black')
-        
+        draw.text((self.margin, y), "Terima kasih atas kunjungan Anda", font=self.font_normal, fill=0)
+
         return image
-    
+
+    def build_escpos(self, data):
+        """Struk sebagai perintah ESC/POS teks (tanpa render gambar)"""
+        label_width = 15
+        indent = ' ' * (label_width + 2)
+        lines = []
+        for label, value in receipt_items(data):
+            # Nilai panjang (mis. nama operator) dilanjutkan di baris berikutnya
+            lines.extend(textwrap.wrap(
+                f"{label:<{label_width}}: {value}", RECEIPT_CHARS, subsequent_indent=indent
+            ) or [label])
+        commands = [
+            b"\x1B\x40",          # Initialize printer
+            b"\x1B\x61\x01",      # Center align
+            b"\x1B\x21\x08",      # Emphasized
+            b"STRUK PEMBAYARAN PARKIR\n",
+            b"\x1B\x21\x00",      # Normal text
+            b"=" * RECEIPT_CHARS + b"\n",
+            b"\x1B\x61\x00",      # Left align
+            "\n".join(lines).encode('ascii', 'replace') + b"\n",
+        ]
+        if data.get('notes'):
+            commands.append(f"\nCatatan:\n{data['notes']}\n".encode('ascii', 'replace'))
+        commands.extend([
+            b"=" * RECEIPT_CHARS + b"\n",
+            b"\x1B\x61\x01",      # Center align
+            b"Terima kasih atas kunjungan Anda\n",
+            b"\x1B\x64\x04",      # Feed 4 lines
+            b"\x1D\x56\x41\x00",  # Cut paper
+        ])
+        return b"".join(commands)
+
+    def _printer(self):
+        if not self.printer_name:
+            self.printer_name = win32print.GetDefaultPrinter()
+        return self.printer_name
+
     def print_receipt(self, data):
-        """Mencetak struk pembayaran"""
+        """Mencetak struk pembayaran (blocking, lihat submit_receipt)"""
         try:
-            # Buat gambar struk
-            image = self.create_receipt_image(data)
-            
-            # Simpan ke file temporary
-            temp_file = os.path.join(tempfile.gettempdir(), f"receipt_{data['transaction_id']}.png")
-            image.save(temp_file)
-            
-            # Cetak menggunakan printer default
-            printer_name = win32print.GetDefaultPrinter()
-            
-            # Buka printer
-            hprinter = win32print.OpenPrinter(printer_name)
-            try:
-                # Mulai dokumen
-                hdc = win32ui.CreateDC()
-                hdc.CreatePrinterDC(printer_name)
-                hdc.StartDoc('Struk Parkir')
-                hdc.StartPage()
-                
-                # Cetak gambar
-                dib = ImageWin.Dib(image)
-                dib.draw(hdc.GetHandleOutput(), (0, 0, self.receipt_width, image.size[1]))
-                
-                # Selesai
-                hdc.EndPage()
-                hdc.EndDoc()
-                hdc.DeleteDC()
-                
-                return True
-            finally:
-                win32print.ClosePrinter(hprinter)
-                
-                # Hapus file temporary
-                try:
-                    os.remove(temp_file)
-                except:
-                    pass
-        
+            if self.mode == 'escpos':
+                self._print_escpos(data)
+            else:
+                self._print_image(data)
+            return True
         except Exception as e:
+            logger.error(f"Error mencetak struk {data.get('transaction_id')}: {e}")
             print(f"Error mencetak struk: {str(e)}")
-            return False 
\ No newline at end of file
+            return False
+
+    def _print_escpos(self, data):
+        # Handle printer RAW tetap terbuka antar struk, dibuka ulang setelah error
+        if self._backend is None:
+            self._backend = Win32Backend(self._printer(), win32print)
+        try:
+            self._backend.write_job(self.build_escpos(data), f"Struk {data['transaction_id']}")
+        except Exception:
+            self._backend.close()
+            raise
+
+    def _print_image(self, data):
+        image = self.create_receipt_image(data)
+
+        hdc = win32ui.CreateDC()
+        hdc.CreatePrinterDC(self._printer())
+        try:
+            hdc.StartDoc('Struk Parkir')
+            hdc.StartPage()
+
+            # Cetak gambar
+            dib = ImageWin.Dib(image)
+            dib.draw(hdc.GetHandleOutput(), (0, 0, self.receipt_width, image.size[1]))
+
+            # Selesai
+            hdc.EndPage()
+            hdc.EndDoc()
+        finally:
+            hdc.DeleteDC()
+
+    def close(self):
+        if self._backend is not None:
+            self._backend.close()
+
+# Antrian cetak bersama untuk semua request
+
+_receipt_printer = None
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_receipt_printer():
+    """ReceiptPrinter bersama (font dan handle printer dipakai ulang)"""
+    global _receipt_printer, _executor
+    with _executor_lock:
+        if _receipt_printer is None:
+            _receipt_printer = ReceiptPrinter()
+            # Satu worker: struk tercetak berurutan dan printer tidak dipakai bersamaan
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='receipt')
+        return _receipt_printer
+
+def submit_receipt(payment):
+    """Cetak struk di background; receipt_printed diisi setelah berhasil
+
+    Data struk dibaca di thread request (butuh relasi ticket/vehicle), hanya
+    pencetakannya yang berjalan di background.
+
+    Returns:
+        Future dengan hasil True/False
+    """
+    data = payment.generate_receipt_data()
+    printer = get_receipt_printer()
+    return _executor.submit(_print_and_mark, printer, payment.pk, data)
+
+def _print_and_mark(printer, payment_id, data):
+    from .models import PaymentTransaction
+    if not printer.print_receipt(data):
+        return False
+    try:
+        PaymentTransaction.objects.filter(pk=payment_id).update(receipt_printed=True)
+    finally:
+        # Thread worker tidak melewati siklus request, tutup koneksinya sendiri
+        close_old_connections()
+    logger.info(f"Struk {data['transaction_id']} tercetak")
+    return True
@@ -6,6 +6,8 @@ from django.db.models import Q, Sum, Count, Avg
 from django.db.models.functions import TruncDate, TruncMonth
 from .models import Vehicle, ParkingTicket, ParkingLog, PaymentTransaction, Voucher
 from .forms import VehicleForm, ParkingTicketForm, PaymentForm, VoucherForm
+from .ticket_ids import next_ticket_id, next_transaction_id
+from barcode_token import normalize_scan, is_token
 import uuid
 from django.core.exceptions import ValidationError
 from datetime import timedelta, datetime
@@ -33,7 +35,7 @@ def vehicle_entry(request):
             vehicle = vehicle_form.save()
             
             # Generate unique ticket ID and barcode
-            ticket_id = f"PKR{timezone.now().strftime('%Y%m%d%H%M%S')}"
+            ticket_id = next_ticket_id()
             barcode = str(uuid.uuid4())
             
             # Create parking ticket
@@ -101,7 +103,7 @@ def payment_process(request, ticket_id):
                 payment = form.save(commit=False)
                 payment.ticket = ticket
                 payment.operator = request.user
-                payment.transaction_id = f"TRX{timezone.now().strftime('%Y%m%d%H%M%S')}"
+                payment.transaction_id = next_transaction_id()
                 
                 # Process voucher if provided
                 voucher_code = form.cleaned_data.get('voucher_code')
@@ -146,16 +148,11 @@ def payment_process(request, ticket_id):
                     details=log_details
                 )
                 
-                # Print receipt
+                # Print receipt di background; receipt_printed diisi setelah tercetak
                 try:
-                    from .utils import ReceiptPrinter
-                    printer = ReceiptPrinter()
-                    if printer.print_receipt(payment.generate_receipt_data()):
-                        payment.receipt_printed = True
-                        payment.save()
-                        messages.success(request, 'Pembayaran berhasil dan struk telah dicetak')
-                    else:
-                        messages.warning(request, 'Pembayaran berhasil tetapi gagal mencetak struk')
+                    from .utils import submit_receipt
+                    submit_receipt(payment)
+                    messages.success(request, 'Pembayaran berhasil, struk sedang dicetak')
                 except Exception as e:
                     messages.warning(request, f'Pembayaran berhasil tetapi gagal mencetak struk: {str(e)}')
                 
@@ -182,12 +179,9 @@ def reprint_receipt(request, payment_id):
     payment = get_object_or_404(PaymentTransaction, id=payment_id)
     
     try:
-        from .utils import ReceiptPrinter
-        printer = ReceiptPrinter()
-        if printer.print_receipt(payment.generate_receipt_data()):
-            messages.success(request, 'Struk berhasil dicetak ulang')
-        else:
-            messages.error(request, 'Gagal mencetak ulang struk')
+        from .utils import submit_receipt
+        submit_receipt(payment)
+        messages.success(request, 'Struk sedang dicetak ulang')
     except Exception as e:
         messages.error(request, f'Gagal mencetak ulang struk: {str(e)}')
     
@@ -214,11 +208,16 @@ def search_ticket(request):
     tickets = []
     
     if query:
-        tickets = ParkingTicket.objects.filter(
-            Q(ticket_id__icontains=query) |
-            Q(barcode__icontains=query) |
-            Q(vehicle__license_plate__icontains=query)
-        ).order_by('-entry_time')
+        # Hasil scan tiket cukup satu lookup lewat unique index token
+        scanned = normalize_scan(query)
+        if is_token(scanned):
+            tickets = ParkingTicket.objects.filter(barcode_token=scanned)
+        if not tickets:
+            tickets = ParkingTicket.objects.filter(
+                Q(ticket_id__icontains=query) |
+                Q(barcode__icontains=query) |
+                Q(vehicle__license_plate__icontains=query)
+            ).order_by('-entry_time')
     
     context = {
         'query': query,
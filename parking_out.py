@@ -6,6 +6,18 @@ import configparser
 import hashlib
 import json
 import os
+import threading
+from io import BytesIO
+from PIL import Image, ImageTk
+from http_client import get_client
+from barcode_token import normalize_scan, is_token
+from db_worker import DBWorker
+
+# Interval GUI membaca hasil query dari DBWorker (ms)
+DB_POLL_MS = 50
+
+TICKET_COLUMNS = """ticket_id, entry_time, exit_time, status,
+                   vehicle_type, license_plate, fee"""
 
 class ParkingOutSystem:
     def __init__(self):
@@ -19,6 +31,9 @@ class ParkingOutSystem:
         # Setup database
         self.setup_database()
         
+        # Client untuk foto masuk dari server Django
+        self.setup_photo_client()
+        
         # Setup UI
         self.setup_login_ui()
         
@@ -26,6 +41,9 @@ class ParkingOutSystem:
         self.current_user = None
         self.current_page = 'login'
         
+        # Hasil query dari DBWorker diproses di event loop Tkinter
+        self.window.after(DB_POLL_MS, self.poll_db)
+        
     def load_config(self):
         """Load konfigurasi dari file config.ini"""
         try:
@@ -37,19 +55,53 @@ class ParkingOutSystem:
             return None
             
     def setup_database(self):
-        """Setup koneksi ke database"""
+        """Setup koneksi ke database
+
+        Semua query berjalan di thread DBWorker agar UI tidak membeku saat
+        database lambat.
+        """
         try:
             db_config = self.config['database']
-            self.conn = psycopg2.connect(
+            self.db = DBWorker(lambda: psycopg2.connect(
                 dbname=db_config['dbname'],
                 user=db_config['user'],
                 password=db_config['password'],
                 host=db_config['host']
-            )
+            ))
             print("✅ Database terkoneksi")
         except Exception as e:
             messagebox.showerror("Error", f"Gagal koneksi ke database: {str(e)}")
-            self.conn = None
+            self.db = None
+            
+    def poll_db(self):
+        """Teruskan hasil query yang sudah selesai ke callback-nya"""
+        if self.db:
+            self.db.dispatch()
+        self.window.after(DB_POLL_MS, self.poll_db)
+        
+    def run_query(self, func, callback, error_message, key=None):
+        """Jalankan func(conn) di DBWorker; error ditampilkan di messagebox"""
+        if not self.db:
+            messagebox.showerror("Error", "Database tidak terkoneksi")
+            return
+        self.db.submit(
+            func,
+            callback=callback,
+            errback=lambda e: messagebox.showerror("Error", f"{error_message}: {str(e)}"),
+            key=key
+        )
+            
+    def setup_photo_client(self):
+        """Siapkan client API foto masuk jika [server] photo_url diisi"""
+        self.photo_client = None
+        self.entry_photo = None
+        self.displayed_ticket = None
+        if self.config and 'server' in self.config and 'photo_url' in self.config['server']:
+            auth = (
+                os.getenv('API_USERNAME', 'admin'),
+                os.getenv('API_PASSWORD', 'admin')
+            )
+            self.photo_client = get_client(self.config['server']['photo_url'], auth=auth)
             
     def setup_login_ui(self):
         """Setup tampilan login"""
@@ -129,6 +181,9 @@ class ParkingOutSystem:
         )
         search_btn.grid(row=0, column=2, padx=5, pady=5)
         
+        self.search_status = ttk.Label(search_frame, text="")
+        self.search_status.grid(row=0, column=3, padx=5, pady=5)
+        
         # Ticket info frame
         self.ticket_frame = ttk.LabelFrame(self.window, text="Informasi Tiket")
         self.ticket_frame.pack(fill='both', expand=True, padx=20, pady=10)
@@ -145,22 +200,20 @@ class ParkingOutSystem:
             messagebox.showerror("Error", "Username dan password harus diisi")
             return
             
-        try:
-            cursor = self.conn.cursor()
-            
-            # Hash password
-            hashed_password = hashlib.sha256(password.encode()).hexdigest()
-            
-            # Check credentials
-            cursor.execute("""
-                SELECT id, username, role 
-                FROM users 
-                WHERE username = %s AND password = %s
-            """, (username, hashed_password))
-            
-            user = cursor.fetchone()
-            cursor.close()
-            
+        # Hash password
+        hashed_password = hashlib.sha256(password.encode()).hexdigest()
+        
+        def query(conn):
+            with conn.cursor() as cursor:
+                # Check credentials
+                cursor.execute("""
+                    SELECT id, username, role 
+                    FROM users 
+                    WHERE username = %s AND password = %s
+                """, (username, hashed_password))
+                return cursor.fetchone()
+                
+        def done(user):
             if user:
                 self.current_user = username
                 messagebox.showinfo("Success", "Login berhasil!")
@@ -168,8 +221,7 @@ class ParkingOutSystem:
             else:
                 messagebox.showerror("Error", "Username atau password salah")
                 
-        except Exception as e:
-            messagebox.showerror("Error", f"Gagal login: {str(e)}")
+        self.run_query(query, done, "Gagal login", key='login')
             
     def handle_logout(self):
         """Handle logout process"""
@@ -184,28 +236,40 @@ class ParkingOutSystem:
             messagebox.showerror("Error", "Nomor tiket harus diisi")
             return
             
-        try:
-            cursor = self.conn.cursor()
-            
-            # Get ticket info
-            cursor.execute("""
-                SELECT ticket_id, entry_time, exit_time, status, 
-                       vehicle_type, license_plate, fee
-                FROM tickets 
-                WHERE ticket_id = %s
-            """, (ticket_number,))
-            
-            ticket = cursor.fetchone()
-            cursor.close()
+        # Hasil scan barcode dicari lewat token, input manual lewat ID tiket
+        scanned = normalize_scan(ticket_number)
+        column = 'barcode_token' if is_token(scanned) else 'ticket_id'
+        if column == 'ticket_id':
+            scanned = ticket_number.strip()
             
+        def query(conn):
+            with conn.cursor() as cursor:
+                # Get ticket info
+                cursor.execute(f"""
+                    SELECT {TICKET_COLUMNS}
+                    FROM tickets 
+                    WHERE {column} = %s
+                """, (scanned,))
+                return cursor.fetchone()
+                
+        def done(ticket):
+            self.search_status.config(text="")
             if ticket:
                 self.display_ticket_info(ticket)
             else:
                 messagebox.showerror("Error", "Tiket tidak ditemukan")
                 
-        except Exception as e:
+        def failed(e):
+            self.search_status.config(text="")
             messagebox.showerror("Error", f"Gagal mencari tiket: {str(e)}")
             
+        if not self.db:
+            messagebox.showerror("Error", "Database tidak terkoneksi")
+            return
+        # Pencarian baru membatalkan pencarian sebelumnya yang belum selesai
+        self.search_status.config(text="Mencari...")
+        self.db.submit(query, callback=done, errback=failed, key='search')
+            
     def display_ticket_info(self, ticket):
         """Display ticket information"""
         # Clear previous info
@@ -214,12 +278,12 @@ class ParkingOutSystem:
             
         # Unpack ticket data
         ticket_id, entry_time, exit_time, status, vehicle_type, license_plate, fee = ticket
+        self.displayed_ticket = ticket_id
         
         # Calculate duration and fee
-        if not exit_time:
-            exit_time = datetime.now()
-            duration = exit_time - entry_time
-            hours = duration.total_seconds() / 3600
+        duration = (exit_time or datetime.now()) - entry_time
+        hours = duration.total_seconds() / 3600
+        if not exit_time or fee is None:
             fee = self.calculate_fee(hours, vehicle_type)
             
         # Display info
@@ -262,6 +326,39 @@ class ParkingOutSystem:
         )
         print_btn.pack(side='left', padx=5)
         
+        # Foto masuk dimuat di background agar UI tidak menunggu jaringan
+        self.load_entry_photo(ticket_id, row)
+        
+    def load_entry_photo(self, ticket_id, rowspan):
+        """Ambil thumbnail foto masuk dari server lalu tampilkan di samping info tiket"""
+        if not self.photo_client:
+            return
+            
+        def fetch():
+            try:
+                response = self.photo_client.get(
+                    f"/api/tickets/{ticket_id}/photo/",
+                    params={'size': 'thumb'}
+                )
+                if response.ok:
+                    image = Image.open(BytesIO(response.content))
+                    image.load()
+                    self.window.after(0, lambda: self.show_entry_photo(ticket_id, image, rowspan))
+            except Exception as e:
+                print(f"⚠️ Foto masuk tidak tersedia: {str(e)}")
+                
+        threading.Thread(target=fetch, daemon=True).start()
+        
+    def show_entry_photo(self, ticket_id, image, rowspan):
+        """Tampilkan thumbnail jika tiket yang sama masih ditampilkan"""
+        if ticket_id != self.displayed_ticket or not self.ticket_frame.winfo_exists():
+            return
+        # Simpan referensi agar gambar tidak dibersihkan garbage collector
+        self.entry_photo = ImageTk.PhotoImage(image)
+        ttk.Label(self.ticket_frame, image=self.entry_photo).grid(
+            row=0, column=2, rowspan=rowspan, padx=10, pady=5, sticky='n'
+        )
+        
     def calculate_fee(self, hours, vehicle_type):
         """Calculate parking fee"""
         # Get fee configuration
@@ -279,55 +376,58 @@ class ParkingOutSystem:
             
     def process_exit(self, ticket_id):
         """Process vehicle exit"""
-        try:
-            cursor = self.conn.cursor()
-            
-            # Update ticket
-            cursor.execute("""
-                UPDATE tickets 
-                SET exit_time = NOW(),
-                    status = 'COMPLETED',
-                    updated_at = NOW()
-                WHERE ticket_id = %s
-            """, (ticket_id,))
-            
-            self.conn.commit()
-            cursor.close()
-            
-            messagebox.showinfo("Success", "Kendaraan berhasil keluar")
-            self.search_ticket()  # Refresh display
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Gagal memproses keluar: {str(e)}")
+        def query(conn):
+            with conn.cursor() as cursor:
+                # Update ticket; baris hasil RETURNING langsung dipakai untuk tampilan
+                cursor.execute(f"""
+                    UPDATE tickets 
+                    SET exit_time = NOW(),
+                        status = 'COMPLETED',
+                        updated_at = NOW()
+                    WHERE ticket_id = %s AND status = 'ACTIVE'
+                    RETURNING {TICKET_COLUMNS}
+                """, (ticket_id,))
+                return cursor.fetchone()
+                
+        def done(ticket):
+            if ticket:
+                messagebox.showinfo("Success", "Kendaraan berhasil keluar")
+                # Refresh display
+                if ticket_id == self.displayed_ticket:
+                    self.display_ticket_info(ticket)
+            else:
+                messagebox.showerror("Error", "Tiket tidak ditemukan atau sudah keluar")
+                
+        self.run_query(query, done, "Gagal memproses keluar")
             
     def print_receipt(self, ticket_id):
         """Print parking receipt"""
-        try:
-            cursor = self.conn.cursor()
-            
-            # Get ticket info
-            cursor.execute("""
-                SELECT ticket_id, entry_time, exit_time, status,
-                       vehicle_type, license_plate, fee
-                FROM tickets 
-                WHERE ticket_id = %s
-            """, (ticket_id,))
-            
-            ticket = cursor.fetchone()
-            cursor.close()
-            
+        def query(conn):
+            with conn.cursor() as cursor:
+                # Get ticket info
+                cursor.execute(f"""
+                    SELECT {TICKET_COLUMNS}
+                    FROM tickets 
+                    WHERE ticket_id = %s
+                """, (ticket_id,))
+                return cursor.fetchone()
+                
+        def done(ticket):
             if ticket:
                 # TODO: Implement receipt printing
                 messagebox.showinfo("Info", "Fitur cetak struk dalam pengembangan")
             else:
                 messagebox.showerror("Error", "Tiket tidak ditemukan")
                 
-        except Exception as e:
-            messagebox.showerror("Error", f"Gagal mencetak struk: {str(e)}")
+        self.run_query(query, done, "Gagal mencetak struk")
             
     def run(self):
         """Run the application"""
-        self.window.mainloop()
+        try:
+            self.window.mainloop()
+        finally:
+            if self.db:
+                self.db.stop()
 
 if __name__ == "__main__":
     app = ParkingOutSystem()
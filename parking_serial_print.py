@@ -8,13 +8,10 @@ import requests
 import os
 import sys
 from datetime import datetime
+from log_setup import setup_logging
 
 # Setup logging
-logging.basicConfig(
-    filename='parking_log.txt',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+setup_logging('parking_log.txt')
 logger = logging.getLogger()
 
 # Configuration
@@ -48,6 +48,7 @@ CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'parking_manager.middleware.QueryCountMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -130,6 +131,26 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Foto capture kendaraan (index captures.db dibuat oleh ParkingCamera)
+CAPTURE_DIR = os.getenv('CAPTURE_DIR', os.path.join(BASE_DIR, 'captures'))
+CAPTURE_BACKUP_DIR = os.getenv('CAPTURE_BACKUP_DIR', os.path.join(BASE_DIR, 'backups'))
+THUMBNAIL_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'thumbnails')
+THUMBNAIL_CACHE_MAX_MB = 256
+
+# Profil query per view (api/metrics/queries/), aktif juga tanpa DEBUG
+QUERY_PROFILING = os.getenv('QUERY_PROFILING', 'true').lower() == 'true'
+# Header X-DB-Queries/X-DB-Time-Ms/X-DB-Repeated per response (untuk load test)
+QUERY_COUNT_HEADER = os.getenv('QUERY_COUNT_HEADER', 'false').lower() == 'true'
+# Query lebih lambat dari ini (ms) dicatat di log
+QUERY_SLOW_MS = int(os.getenv('QUERY_SLOW_MS', '200'))
+# Bentuk SQL yang berulang sebanyak ini dalam satu request dianggap N+1
+QUERY_REPEAT_THRESHOLD = 5
+
+# Struk pembayaran: 'image' (gambar lewat GDI) atau 'escpos' (teks RAW, tanpa render)
+RECEIPT_MODE = os.getenv('RECEIPT_MODE', 'image')
+# Nama printer struk, kosong = default printer Windows
+RECEIPT_PRINTER = os.getenv('RECEIPT_PRINTER', '')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
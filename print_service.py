@@ -0,0 +1,472 @@
+"""
+Antrian cetak tiket dengan handle printer yang tetap terbuka.
+
+Sebelumnya setiap tiket membuka printer, memulai dokumen, menulis lalu
+menutup lagi di thread tombol, dan kegagalan hanya dicatat di log (tiket
+hilang, kertas habis tidak diketahui). PrintService menjalankan satu thread
+pencetak per printer:
+
+- job masuk antrian FIFO; pemanggil langsung lanjut tanpa menunggu spooler
+- handle printer dibuka sekali dan dipakai ulang, dibuka ulang setelah error
+- status printer dibaca dengan ESC/POS real-time status (DLE EOT) sebelum
+  dan sesudah job, dan saat antrian kosong, jika backend mendukung
+- kertas habis / cover terbuka: job menunggu sampai printer siap lalu
+  dicetak ulang; error lain dicoba ulang sampai max_attempts
+- job yang sudah tercetak disimpan di riwayat untuk cetak ulang (reprint)
+
+Backend dipilih dari [printer] backend di config.ini:
+
+    win32               printer Windows lewat spooler (default)
+    win32:NAMA          printer Windows dengan nama tertentu
+    tcp://HOST:PORT     raw socket tanpa spooler (port 9100), status terbaca
+    serial:PORT[@BAUD]  printer serial/USB-serial tanpa spooler, status terbaca
+    file:PATH           tulis ke device/file (mis. /dev/usb/lp0, atau file
+                        biasa untuk uji di Linux)
+"""
+import itertools
+import logging
+import queue
+import socket
+import threading
+import time
+from collections import deque, namedtuple
+from lazy_import import lazy_module
+
+logger = logging.getLogger('print_service')
+
+serial = lazy_module('serial')
+
+# ESC/POS real-time status: DLE EOT n (1 printer, 2 offline, 4 sensor kertas)
+DLE_EOT = b'\x10\x04'
+
+QUEUED = 'queued'
+PRINTING = 'printing'
+PRINTED = 'printed'
+FAILED = 'failed'
+
+class PrinterStatus(namedtuple('PrinterStatus', 'online cover_open paper_out paper_near_end error')):
+    """Status printer hasil DLE EOT"""
+
+    @property
+    def ok(self):
+        return self.online and not (self.cover_open or self.paper_out or self.error)
+
+    def describe(self):
+        problems = [text for flag, text in (
+            (not self.online, 'offline'),
+            (self.cover_open, 'cover terbuka'),
+            (self.paper_out, 'kertas habis'),
+            (self.error, 'error printer'),
+            (self.paper_near_end, 'kertas hampir habis'),
+        ) if flag]
+        return ', '.join(problems) or 'siap'
+
+def _valid_status_byte(value):
+    # Bit 1 dan 4 selalu 1, bit 0 dan 7 selalu 0 pada balasan DLE EOT
+    return (value & 0x93) == 0x12
+
+def parse_status(printer, offline, paper):
+    """Status dari balasan DLE EOT 1, 2 dan 4 (masing-masing satu byte)
+
+    Returns:
+        PrinterStatus, atau None jika balasan tidak valid
+    """
+    if not all(reply and _valid_status_byte(reply[0]) for reply in (printer, offline, paper)):
+        return None
+    printer, offline, paper = printer[0], offline[0], paper[0]
+    return PrinterStatus(
+        online=not printer & 0x08,
+        cover_open=bool(offline & 0x04),
+        paper_out=bool(offline & 0x20) or bool(paper & 0x60),
+        paper_near_end=bool(paper & 0x0C),
+        error=bool(offline & 0x40),
+    )
+
+class PrinterNotReady(Exception):
+    """Printer melaporkan kondisi yang bisa dipulihkan (kertas, cover)"""
+
+# Backend
+
+class PrinterBackend:
+    """Transport byte ESC/POS ke printer"""
+
+    supports_status = False
+
+    def open(self):
+        pass
+
+    def write_job(self, data, title):
+        raise NotImplementedError
+
+    def query(self, request, timeout):
+        """Kirim perintah real-time dan baca satu byte balasan (None jika tidak ada)"""
+        return None
+
+    def close(self):
+        pass
+
+class Win32Backend(PrinterBackend):
+    """Printer Windows lewat spooler (RAW), handle dibuka sekali"""
+
+    def __init__(self, printer_name, win32print=None):
+        self.printer_name = printer_name
+        self.win32print = win32print or lazy_module('win32print')
+        self.handle = None
+
+    def open(self):
+        if self.handle is None:
+            self.handle = self.win32print.OpenPrinter(self.printer_name)
+
+    def write_job(self, data, title):
+        self.open()
+        self.win32print.StartDocPrinter(self.handle, 1, (title, None, "RAW"))
+        try:
+            self.win32print.StartPagePrinter(self.handle)
+            self.win32print.WritePrinter(self.handle, data)
+            self.win32print.EndPagePrinter(self.handle)
+        finally:
+            self.win32print.EndDocPrinter(self.handle)
+
+    def close(self):
+        handle, self.handle = self.handle, None
+        if handle is not None:
+            try:
+                self.win32print.ClosePrinter(handle)
+            except Exception as e:
+                logger.debug(f"Gagal menutup printer {self.printer_name}: {e}")
+
+    def __str__(self):
+        return f"win32:{self.printer_name}"
+
+class SocketBackend(PrinterBackend):
+    """Raw socket ke printer jaringan (JetDirect)"""
+
+    supports_status = True
+
+    def __init__(self, host, port=9100, timeout=5.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.sock = None
+
+    def open(self):
+        if self.sock is None:
+            self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+
+    def write_job(self, data, title):
+        self.open()
+        self.sock.sendall(data)
+
+    def query(self, request, timeout):
+        self.open()
+        self._drain()
+        self.sock.sendall(request)
+        self.sock.settimeout(timeout)
+        try:
+            return self.sock.recv(1) or None
+        except socket.timeout:
+            return None
+        finally:
+            self.sock.settimeout(self.timeout)
+
+    def _drain(self):
+        """Buang balasan lama yang terlambat datang"""
+        self.sock.setblocking(False)
+        try:
+            while self.sock.recv(64):
+                pass
+        except (BlockingIOError, socket.error):
+            pass
+        finally:
+            self.sock.settimeout(self.timeout)
+
+    def close(self):
+        sock, self.sock = self.sock, None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def __str__(self):
+        return f"tcp://{self.host}:{self.port}"
+
+class SerialBackend(PrinterBackend):
+    """Printer serial atau USB-serial"""
+
+    supports_status = True
+
+    def __init__(self, port, baudrate=9600, timeout=5.0):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.conn = None
+
+    def open(self):
+        if self.conn is None:
+            self.conn = serial.Serial(self.port, self.baudrate, timeout=self.timeout,
+                                      write_timeout=self.timeout)
+
+    def write_job(self, data, title):
+        self.open()
+        self.conn.write(data)
+        self.conn.flush()
+
+    def query(self, request, timeout):
+        self.open()
+        self.conn.reset_input_buffer()
+        self.conn.write(request)
+        self.conn.timeout = timeout
+        try:
+            return self.conn.read(1) or None
+        finally:
+            self.conn.timeout = self.timeout
+
+    def close(self):
+        conn, self.conn = self.conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def __str__(self):
+        return f"serial:{self.port}@{self.baudrate}"
+
+class FileBackend(PrinterBackend):
+    """Tulis langsung ke device printer atau file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def open(self):
+        if self.file is None:
+            self.file = open(self.path, 'ab', buffering=0)
+
+    def write_job(self, data, title):
+        self.open()
+        self.file.write(data)
+
+    def close(self):
+        file, self.file = self.file, None
+        if file is not None:
+            try:
+                file.close()
+            except OSError:
+                pass
+
+    def __str__(self):
+        return f"file:{self.path}"
+
+def open_backend(spec, win32print=None, printer_name=None):
+    """Backend dari string konfigurasi (lihat docstring modul)"""
+    spec = (spec or 'win32').strip()
+    if spec == 'win32':
+        return Win32Backend(printer_name, win32print)
+    if spec.startswith('win32:'):
+        return Win32Backend(spec[len('win32:'):], win32print)
+    if spec.startswith('tcp://'):
+        host, _, port = spec[len('tcp://'):].partition(':')
+        return SocketBackend(host, int(port or 9100))
+    if spec.startswith('serial:'):
+        port, _, baudrate = spec[len('serial:'):].partition('@')
+        return SerialBackend(port, int(baudrate or 9600))
+    if spec.startswith('file:'):
+        return FileBackend(spec[len('file:'):])
+    raise ValueError(f"Backend printer tidak dikenal: {spec}")
+
+# Antrian
+
+class PrintJob:
+    """Satu job cetak; wait() menunggu sampai tercetak atau gagal"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, data, title, reprint_of=None):
+        self.id = next(self._ids)
+        self.data = bytes(data)
+        self.title = title
+        self.reprint_of = reprint_of
+        self.state = QUEUED
+        self.attempts = 0
+        self.error = None
+        self.created_at = time.time()
+        self.printed_at = None
+        self._done = threading.Event()
+
+    def _finish(self, state, error=None):
+        self.state = state
+        self.error = error
+        if state == PRINTED:
+            self.printed_at = time.time()
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """True jika job sudah tercetak"""
+        self._done.wait(timeout)
+        return self.state == PRINTED
+
+class PrintService:
+    """Thread pencetak dengan antrian FIFO untuk satu printer"""
+
+    def __init__(self, backend, metrics=None, max_queue=100, max_attempts=3,
+                 retry_delay=2.0, status_interval=10.0, status_timeout=0.5, history=20):
+        """
+        Args:
+            backend: PrinterBackend (lihat open_backend)
+            metrics: GateMetrics opsional (prints, print_seconds, antrian, status)
+            max_attempts: percobaan untuk error selain kertas/cover
+            retry_delay: jeda antar percobaan dan antar cek status saat menunggu
+            status_interval: cek status saat antrian kosong (detik)
+        """
+        self.backend = backend
+        self.metrics = metrics
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.status_interval = status_interval
+        self.status_timeout = status_timeout
+        self.status = None
+        self.history = deque(maxlen=history)
+        self._queue = queue.Queue(max_queue)
+        self._stopping = threading.Event()
+        self._thread = None
+        if metrics is not None:
+            metrics.print_queue.set_function(self._queue.qsize)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='print-service', daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, data, title="Parking Ticket", reprint_of=None):
+        """Masukkan job ke antrian dan langsung kembali"""
+        job = PrintJob(data, title, reprint_of)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            logger.error(f"Antrian cetak penuh, job {title} dibuang")
+            job._finish(FAILED, 'antrian penuh')
+            self._count('dropped')
+        return job
+
+    def reprint(self, job_id=None):
+        """Cetak ulang job dari riwayat (default job terakhir yang tercetak)"""
+        for job in reversed(self.history):
+            if job_id is None or job.id == job_id:
+                logger.info(f"Cetak ulang job {job.id} ({job.title})")
+                return self.submit(job.data, job.title, reprint_of=job.id)
+        return None
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def stop(self, timeout=10):
+        """Cetak sisa antrian (maksimal timeout detik) lalu tutup printer"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        self._stopping.set()
+        self.backend.close()
+
+    # Thread pencetak
+
+    def _run(self):
+        while True:
+            try:
+                job = self._queue.get(timeout=self.status_interval)
+            except queue.Empty:
+                self.poll_status()
+                continue
+            if job is None:
+                break
+            self._print(job)
+
+    def _print(self, job):
+        job.state = PRINTING
+        while not self._stopping.is_set():
+            job.attempts += 1
+            start = time.perf_counter()
+            try:
+                self._wait_until_ready()
+                self.backend.write_job(job.data, job.title)
+                # Kertas habis di tengah job: tiket mungkin terpotong, cetak ulang
+                status = self.poll_status()
+                if status is not None and not status.ok:
+                    raise PrinterNotReady(status.describe())
+            except Exception as e:
+                # Kertas/cover: handle tetap dipakai, printer ditunggu siap lagi
+                recoverable = isinstance(e, PrinterNotReady)
+                if not recoverable:
+                    self.backend.close()
+                if job.attempts >= self.max_attempts:
+                    logger.error(f"Job {job.id} ({job.title}) gagal dicetak setelah {job.attempts} percobaan: {e}")
+                    print(f"❌ Gagal mencetak {job.title}: {e}")
+                    self._count('failed')
+                    job._finish(FAILED, str(e))
+                    return
+                logger.warning(f"Job {job.id} ({job.title}) dicetak ulang (percobaan {job.attempts}): {e}")
+                self._count('retried')
+                if not recoverable:
+                    self._stopping.wait(self.retry_delay)
+                continue
+
+            if self.metrics is not None:
+                self.metrics.print_seconds.observe(time.perf_counter() - start)
+            self._count('ok')
+            self.history.append(job)
+            job._finish(PRINTED)
+            logger.info(f"Job {job.id} tercetak: {job.title}")
+            return
+        job._finish(FAILED, 'print service dihentikan')
+
+    def _wait_until_ready(self):
+        """Tahan job selama printer melaporkan kertas habis/cover terbuka"""
+        if not self.backend.supports_status:
+            return
+        warned = False
+        while not self._stopping.is_set():
+            status = self.poll_status()
+            # Status tidak terbaca: coba cetak saja, error tulis akan dicoba ulang
+            if status is None or status.ok:
+                if warned:
+                    print("✅ Printer siap kembali, melanjutkan antrian cetak")
+                return
+            if not warned:
+                print(f"⚠️ Printer: {status.describe()} - tiket dicetak setelah printer siap")
+                warned = True
+            self._stopping.wait(self.retry_delay)
+
+    def poll_status(self):
+        """Baca status printer dengan DLE EOT; None jika tidak didukung/tidak terbaca"""
+        if not self.backend.supports_status:
+            return None
+        try:
+            self.backend.open()
+            replies = [self.backend.query(DLE_EOT + bytes([n]), self.status_timeout) for n in (1, 2, 4)]
+            status = parse_status(*replies)
+        except Exception as e:
+            logger.debug(f"Gagal membaca status printer {self.backend}: {e}")
+            self.backend.close()
+            status = None
+        if status != self.status:
+            logger.info(f"Status printer {self.backend}: {status.describe() if status else 'tidak diketahui'}")
+            if self.metrics is not None:
+                self._record_status(status)
+        self.status = status
+        return status
+
+    def _record_status(self, status):
+        conditions = {
+            'offline': status is not None and not status.online,
+            'cover_open': status is not None and status.cover_open,
+            'paper_out': status is not None and status.paper_out,
+            'paper_near_end': status is not None and status.paper_near_end,
+            'error': status is not None and status.error,
+        }
+        for condition, active in conditions.items():
+            self.metrics.printer_condition.set(int(active), condition=condition)
+
+    def _count(self, result):
+        if self.metrics is not None:
+            self.metrics.prints.inc(result=result)
@@ -1,4 +1,4 @@
-import requests
+from http_client import get_client
 import json
 import logging
 import os
@@ -9,28 +9,28 @@ from datetime import datetime
 from PIL import Image, ImageDraw, ImageFont
 import barcode
 from barcode.writer import ImageWriter
+from capture_store import CaptureStore
+from log_setup import setup_logging
 
 # Setup logging
-logging.basicConfig(
-    filename='button_simulator.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+setup_logging('button_simulator.log', level=logging.DEBUG)
 logger = logging.getLogger('button_simulator')
 
 class PushButtonSimulator:
     def __init__(self):
         self.base_url = "http://192.168.2.6:5051/api"
+        self.http = get_client(self.base_url)
         self.capture_dir = "capture_images"
         
         # Create capture directory if it doesn't exist
         if not os.path.exists(self.capture_dir):
             os.makedirs(self.capture_dir)
+        self.capture_store = CaptureStore(self.capture_dir, backup_dir="backups")
     
     def test_connection(self):
         """Test connection to the server"""
         try:
-            response = requests.get(f"{self.base_url}/test")
+            response = self.http.get("/test")
             if response.ok:
                 data = response.json()
                 return True, data
@@ -74,7 +74,7 @@ class PushButtonSimulator:
         draw.text((10, 40), "RSI BNA CCTV", fill=(0, 0, 255), font=font)
         
         # Generate a unique filename with timestamp
-        filename = f"{self.capture_dir}/vehicle_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
+        filename = self.capture_store.path_for(f"vehicle_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg")
         image.save(filename)
         
         return filename
@@ -103,8 +103,8 @@ class PushButtonSimulator:
                 "isParked": True
             }
             
-            response = requests.post(
-                f"{self.base_url}/masuk",
+            response = self.http.post(
+                "/masuk",
                 json=data,
                 headers={"Content-Type": "application/json"}
             )
@@ -116,6 +116,7 @@ class PushButtonSimulator:
                     print(f"🎫 Nomor Tiket : {result['data']['ticket']}")
                     print(f"🚗 Nomor Plat  : {plate}")
                     print(f"🕒 Waktu Masuk : {result['data']['waktu']}")
+                    self.capture_store.record(result['data']['ticket'], image_path)
                     
                     # Create and save ticket image
                     self.create_ticket_image({
@@ -0,0 +1,246 @@
+"""
+Capture dua stream untuk kamera IP Dahua.
+
+Sub-stream (704x576) dibuka terus dan dibaca oleh thread background; frame
+terbarunya dipakai untuk deteksi duplikat sebelum tiket dicetak dan sebagai
+cadangan snapshot. Belum ada deteksi kehadiran/gerakan kendaraan di sini.
+
+Main stream 1920x1080 untuk bukti tiket punya dua mode (main_stream_mode):
+
+    on_demand   main stream dibuka per tiket, tanpa decode sama sekali di
+                antara tiket; hanya satu pengambilan berjalan sekaligus dan
+                batas waktunya mencakup membuka RTSP ditambah menunggu
+                keyframe (default)
+    persistent  koneksi main stream tetap terbuka dan terus di-grab() oleh
+                thread background, sehingga FFmpeg men-decode H.264 1080p
+                terus-menerus; hanya konversi ke BGR dan copy frame
+                (retrieve) yang ditunda sampai tiket dicetak. Snapshot tidak
+                menunggu koneksi RTSP dan keyframe, untuk PC kiosk yang CPU-nya
+                longgar
+
+Jika main stream lambat atau gagal, frame sub-stream terakhir dipakai sebagai
+gantinya (bisa dimatikan lewat snapshot_fallback).
+"""
+import logging
+import threading
+import time
+from lazy_import import lazy_module
+
+cv2 = lazy_module('cv2')
+
+logger = logging.getLogger('stream_capture')
+
+# Jarak keyframe (GOP) kamera Dahua default sekitar 2 detik
+KEYFRAME_WAIT = 3.0
+
+def open_stream(url, open_timeout):
+    timeout_ms = int(open_timeout * 1000)
+    params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms, cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms]
+    capture = cv2.VideoCapture(url, cv2.CAP_FFMPEG, params)
+    # Buffer minimal agar frame yang dibaca selalu yang terbaru
+    capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return capture
+
+class StreamReader:
+    """Satu stream RTSP yang di-grab() terus oleh thread background
+
+    grab() hanya mengambil frame dari stream; konversi ke BGR dan copy ke
+    numpy (retrieve) baru dilakukan saat frame benar-benar dibutuhkan.
+    """
+
+    def __init__(self, url, name, open_timeout=5.0):
+        self.url = url
+        self.name = name
+        self.open_timeout = open_timeout
+        self.grabbed_at = 0
+        self._capture = None
+        self._lock = threading.Lock()
+        self._grabbed = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, keep_trying=False):
+        """Buka stream dan mulai thread pembaca
+
+        Returns:
+            False jika stream gagal dibuka; dengan keep_trying thread pembaca
+            tetap berjalan dan terus mencoba membuka ulang
+        """
+        capture = open_stream(self.url, self.open_timeout)
+        opened = capture.isOpened() and capture.grab()
+        if opened:
+            self._capture = capture
+            self.grabbed_at = time.time()
+        else:
+            capture.release()
+            if not keep_trying:
+                return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return opened
+
+    def _run(self):
+        failures = 0
+        while not self._stop.is_set():
+            with self._lock:
+                ok = self._capture is not None and self._capture.grab()
+                if ok:
+                    self.grabbed_at = time.time()
+                    self._grabbed.notify_all()
+            if ok:
+                failures = 0
+                continue
+
+            failures += 1
+            if failures >= 5:
+                logger.warning(f"{self.name} terputus, mencoba membuka ulang")
+                with self._lock:
+                    if self._capture is not None:
+                        self._capture.release()
+                    self._capture = open_stream(self.url, self.open_timeout)
+                failures = 0
+            self._stop.wait(min(5.0, 0.2 * failures + 0.2))
+
+    def is_opened(self):
+        return self._capture is not None and self._capture.isOpened()
+
+    def latest(self, max_age):
+        """Frame terbaru jika umurnya tidak lebih dari max_age detik"""
+        with self._lock:
+            if self._capture is None or time.time() - self.grabbed_at > max_age:
+                return False, None
+            return self._capture.retrieve()
+
+    def wait_fresh(self, max_age, timeout):
+        """Tunggu sampai ada frame yang umurnya <= max_age, lalu ambil
+
+        Returns:
+            (ret, frame), atau None jika tidak ada frame baru dalam timeout
+        """
+        deadline = time.time() + timeout
+        with self._grabbed:
+            while self._capture is None or time.time() - self.grabbed_at > max_age:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._grabbed.wait(remaining)
+            return self._capture.retrieve()
+
+    def release(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        with self._lock:
+            if self._capture is not None:
+                self._capture.release()
+                self._capture = None
+
+class DualStreamCapture:
+    """Sub-stream untuk deteksi duplikat, main stream untuk snapshot bukti"""
+
+    def __init__(self, sub_url, main_url, snapshot_timeout=None, snapshot_fallback='sub',
+                 open_timeout=5.0, max_frame_age=1.0, main_stream_mode='on_demand'):
+        """
+        Args:
+            sub_url: URL RTSP sub-stream
+            main_url: URL RTSP main stream
+            snapshot_timeout: batas waktu ambil frame main stream (detik);
+                default open_timeout + KEYFRAME_WAIT untuk mode on_demand,
+                max_frame_age untuk mode persistent
+            snapshot_fallback: 'sub' untuk pakai frame sub-stream jika main stream
+                lambat, 'none' untuk menganggap capture gagal
+            open_timeout: batas waktu membuka koneksi RTSP (detik)
+            max_frame_age: umur maksimum frame yang masih dianggap valid
+            main_stream_mode: 'persistent' atau 'on_demand' (lihat docstring modul)
+        """
+        self.main_url = main_url
+        self.main_stream_mode = main_stream_mode
+        self.snapshot_fallback = snapshot_fallback
+        self.open_timeout = open_timeout
+        self.max_frame_age = max_frame_age
+        if snapshot_timeout is None:
+            snapshot_timeout = max_frame_age if main_stream_mode == 'persistent' else open_timeout + KEYFRAME_WAIT
+        self.snapshot_timeout = snapshot_timeout
+
+        self.last_snapshot_source = None
+        self._sub = StreamReader(sub_url, 'sub-stream', open_timeout)
+        self._main = StreamReader(main_url, 'main-stream', open_timeout) if main_stream_mode == 'persistent' else None
+        self._pending = None
+        self._pending_lock = threading.Lock()
+
+    def start(self):
+        """Buka sub-stream (dan main stream persistent); False jika sub-stream gagal"""
+        if not self._sub.start():
+            return False
+        if self._main is not None and not self._main.start(keep_trying=True):
+            # Thread pembaca terus mencoba membuka ulang; sementara itu
+            # snapshot memakai fallback sub-stream
+            logger.warning("Main stream belum bisa dibuka, snapshot memakai sub-stream")
+        return True
+
+    def isOpened(self):
+        return self._sub.is_opened()
+
+    def read(self):
+        """Frame sub-stream terbaru, kompatibel dengan cv2.VideoCapture.read()"""
+        return self._sub.latest(self.max_frame_age)
+
+    def _grab_main(self, result):
+        capture = open_stream(self.main_url, self.open_timeout)
+        try:
+            if capture.isOpened():
+                # Frame pertama setelah koneksi baru dimulai dari keyframe
+                result['frame'] = capture.read()
+        finally:
+            capture.release()
+            result['done'].set()
+
+    def _snapshot_on_demand(self):
+        # Pengambilan sebelumnya yang melewati batas waktu masih berjalan:
+        # tunggu hasilnya, jangan membuka koneksi RTSP kedua
+        with self._pending_lock:
+            result = self._pending
+            if result is None or result['done'].is_set():
+                result = {'frame': (False, None), 'done': threading.Event()}
+                self._pending = result
+                threading.Thread(target=self._grab_main, args=(result,), name='main-snapshot', daemon=True).start()
+        if not result['done'].wait(self.snapshot_timeout):
+            return None
+        return result['frame']
+
+    def snapshot(self):
+        """Ambil frame main stream untuk bukti tiket
+
+        Returns:
+            (ret, frame) seperti cv2.VideoCapture.read(); sumber frame
+            dicatat di last_snapshot_source ('main' atau 'sub')
+        """
+        start = time.perf_counter()
+        if self._main is not None:
+            grabbed = self._main.wait_fresh(self.max_frame_age, self.snapshot_timeout)
+        else:
+            grabbed = self._snapshot_on_demand()
+
+        if grabbed is None:
+            logger.warning(f"Main stream lebih lambat dari {self.snapshot_timeout} detik")
+        elif grabbed[0]:
+            self.last_snapshot_source = 'main'
+            logger.debug(f"Snapshot main stream {(time.perf_counter() - start) * 1000:.0f} ms")
+            return True, grabbed[1]
+        else:
+            logger.warning("Gagal membaca frame main stream")
+
+        if self.snapshot_fallback == 'sub':
+            ret, frame = self.read()
+            if ret:
+                self.last_snapshot_source = 'sub'
+                return True, frame
+
+        self.last_snapshot_source = None
+        return False, None
+
+    def release(self):
+        if self._main is not None:
+            self._main.release()
+        self._sub.release()
@@ -0,0 +1,31 @@
+import pytest
+from barcode_token import TOKEN_LENGTH, is_token, make_token, normalize_scan
+
+def test_token_is_stable_and_code39_safe():
+    token = make_token('PKR0000000001')
+    assert token == make_token('PKR0000000001')
+    assert len(token) == TOKEN_LENGTH
+    assert is_token(token)
+
+def test_salt_changes_token():
+    tokens = {make_token('PKR0000000001', salt) for salt in range(5)}
+    assert len(tokens) == 5
+    # salt 0 sama dengan token tanpa salt
+    assert make_token('PKR0000000001', 0) == make_token('PKR0000000001')
+
+def test_different_tickets_differ():
+    assert make_token('PKR0000000001') != make_token('PKR0000000002')
+
+def test_normalize_scan():
+    assert normalize_scan(' *abcd2345* \r\n') == 'ABCD2345'
+    assert normalize_scan(None) == ''
+    assert normalize_scan('PKR0000000001') == 'PKR0000000001'
+
+def test_is_token_rejects_ticket_ids():
+    assert not is_token('PKR0000000001')
+    assert not is_token('ABCD234')      # terlalu pendek
+    assert not is_token('ABCD2341')     # angka 1 bukan base32
+    assert not is_token('abcd2345')     # harus sudah dinormalisasi
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,60 @@
+import os
+import time
+from datetime import datetime
+import pytest
+from capture_store import CaptureStore
+
+@pytest.fixture
+def store(tmp_path):
+    store = CaptureStore(str(tmp_path / 'captures'), str(tmp_path / 'backups'))
+    yield store
+    store.close()
+
+def write_capture(store, ticket_id, when):
+    path = store.path_for(f"{ticket_id}.jpg", datetime.fromtimestamp(when))
+    with open(path, 'wb') as f:
+        f.write(b'bukan jpeg')
+    store.record(ticket_id, path, captured_at=when)
+    return path
+
+def test_path_is_sharded_by_date(store):
+    path = store.path_for('PKR0000000001.jpg', datetime(2024, 3, 7))
+    assert path == os.path.join(store.root, '2024', '03', '07', 'PKR0000000001.jpg')
+    assert os.path.isdir(os.path.dirname(path))
+
+def test_record_and_lookup(store):
+    now = time.time()
+    path = write_capture(store, 'PKR0000000001', now)
+    write_capture(store, 'PKR0000000002', now + 10)
+    assert store.lookup('PKR0000000001') == path
+    assert store.lookup('PKR0000000099') is None
+    assert [ticket for ticket, _ in store.find_between(now - 1, now + 5)] == ['PKR0000000001']
+
+def test_retention_moves_old_captures(store):
+    now = time.time()
+    old = write_capture(store, 'PKR0000000001', now - 100 * 86400)
+    recent = write_capture(store, 'PKR0000000002', now)
+
+    assert store.apply_retention(days=90) == 1
+    assert not os.path.exists(old)
+    archived = store.lookup('PKR0000000001')
+    assert archived.startswith(store.backup_dir)
+    assert os.path.exists(archived)
+    assert store.lookup('PKR0000000002') == recent
+    # Pass berikutnya tidak memproses capture yang sama lagi
+    assert store.apply_retention(days=90) == 0
+
+def test_only_one_retention_pass_at_a_time(store):
+    with store._retention_lock:
+        assert store.apply_retention(days=90) is None
+        assert store.request_retention(days=90) is False
+
+def test_request_retention_runs_in_background(store):
+    old = write_capture(store, 'PKR0000000001', time.time() - 100 * 86400)
+    assert store.request_retention(days=90)
+    store._manual_retention.join(timeout=5)
+    assert not os.path.exists(old)
+    assert store.lookup('PKR0000000001').startswith(store.backup_dir)
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,80 @@
+import struct
+import pytest
+from counter_store import CounterStore, _SLOT_OFFSETS
+
+def open_store(tmp_path, name='counter.dat', initial=0):
+    return CounterStore(str(tmp_path / name), initial)
+
+def test_increment_persists(tmp_path):
+    store = open_store(tmp_path)
+    assert store.get() == 0
+    assert store.increment() == 1
+    assert store.increment(5) == 6
+    store.close()
+
+    store = open_store(tmp_path)
+    assert store.get() == 6
+    store.close()
+
+def test_migrates_legacy_counter_txt(tmp_path):
+    legacy = tmp_path / 'counter.txt'
+    legacy.write_text('41\n')
+    store = CounterStore(str(legacy))
+    assert store.path == str(tmp_path / 'counter.dat')
+    assert store.increment() == 42
+    store.close()
+
+def test_torn_write_keeps_current_value(tmp_path):
+    """Crash saat menulis slot lama: slot terbaru tetap dipakai"""
+    store = open_store(tmp_path)
+    store.increment()
+    store.increment()
+    _, seq, index = store._current()
+
+    # Hanya field value yang sempat tertulis ke slot lama, seq/CRC belum
+    struct.pack_into('<Q', store._map, _SLOT_OFFSETS[1 - index], 99)
+    store._map.flush()
+    store.close()
+
+    store = open_store(tmp_path)
+    assert store.get() == 2
+    assert store.increment() == 3
+    store.close()
+
+def test_corrupt_latest_slot_falls_back(tmp_path):
+    """Slot terbaru gagal cek CRC: nilai dibaca dari slot sebelumnya"""
+    store = open_store(tmp_path)
+    for _ in range(3):
+        store.increment()
+    _, seq, index = store._current()
+
+    offset = _SLOT_OFFSETS[index]
+    store._map[offset + 16] ^= 0xFF  # rusak byte CRC
+    store._map.flush()
+    store.close()
+
+    store = open_store(tmp_path)
+    assert store.get() == 2
+    # Increment berikutnya menimpa slot yang rusak
+    assert store.increment() == 3
+    assert store._current()[2] == index
+    store.close()
+
+def test_both_slots_corrupt_raises(tmp_path):
+    store = open_store(tmp_path)
+    store.increment()
+    for offset in _SLOT_OFFSETS:
+        store._map[offset + 16] ^= 0xFF
+    with pytest.raises(ValueError):
+        store.get()
+    store.close()
+
+def test_bad_magic_raises(tmp_path):
+    store = open_store(tmp_path)
+    store._map[0:4] = b'XXXX'
+    with pytest.raises(ValueError):
+        store.get()
+    store.close()
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,125 @@
+import threading
+import pytest
+
+psycopg2 = pytest.importorskip('psycopg2')
+from psycopg2.extensions import QueryCanceledError
+from db_worker import DBWorker
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.commits = 0
+        self.rollbacks = 0
+        self.canceled = threading.Event()
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def cancel(self):
+        self.canceled.set()
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def connections():
+    return []
+
+@pytest.fixture
+def worker(connections):
+    def connect():
+        connections.append(FakeConnection())
+        return connections[-1]
+    worker = DBWorker(connect)
+    yield worker
+    worker.stop()
+
+def finish(worker):
+    """Tunggu semua job selesai lalu jalankan callback seperti window.after()"""
+    done = threading.Event()
+    worker.submit(lambda conn: None, callback=lambda _: done.set())
+    while not done.is_set():
+        worker.dispatch()
+        done.wait(0.01)
+
+def test_result_goes_to_callback(worker, connections):
+    results = []
+    worker.submit(lambda conn: 42, callback=results.append)
+    finish(worker)
+    assert results == [42]
+    assert connections[0].commits >= 1
+
+def test_newer_job_cancels_running_one(worker):
+    results, errors = [], []
+    started = threading.Event()
+
+    def slow_search(conn):
+        started.set()
+        assert conn.canceled.wait(2)
+        conn.canceled.clear()
+        raise QueryCanceledError("canceling statement due to user request")
+
+    worker.submit(slow_search, callback=results.append, errback=errors.append, key='search')
+    assert started.wait(2)
+    worker.submit(lambda conn: 'baru', callback=results.append, errback=errors.append, key='search')
+    finish(worker)
+    # Hasil basi tidak diteruskan, job lama tidak diulang
+    assert results == ['baru'] and errors == []
+
+def test_late_cancel_reruns_job(worker, connections):
+    calls, results = [], []
+
+    def query(conn):
+        calls.append(conn)
+        if len(calls) == 1:
+            raise QueryCanceledError("canceling statement due to user request")
+        return 'ok'
+
+    worker.submit(query, callback=results.append, key='detail')
+    finish(worker)
+    assert results == ['ok'] and len(calls) == 2
+    assert connections[0].rollbacks >= 1
+    assert len(connections) == 1 and not connections[0].closed
+
+def test_second_cancel_goes_to_errback(worker, connections):
+    calls, errors = [], []
+
+    def query(conn):
+        calls.append(conn)
+        raise QueryCanceledError("canceling statement due to user request")
+
+    worker.submit(query, errback=errors.append, key='detail')
+    finish(worker)
+    assert len(calls) == 2
+    assert len(errors) == 1 and isinstance(errors[0], QueryCanceledError)
+    # Pembatalan bukan koneksi putus
+    assert len(connections) == 1 and not connections[0].closed
+
+def test_lost_connection_reconnects(worker, connections):
+    errors, results = [], []
+
+    def broken(conn):
+        raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+    worker.submit(broken, errback=errors.append)
+    worker.submit(lambda conn: conn, callback=results.append)
+    finish(worker)
+    assert isinstance(errors[0], psycopg2.OperationalError)
+    assert connections[0].closed
+    assert results == [connections[1]]
+
+def test_cancel_drops_queued_result(worker):
+    results = []
+    gate = threading.Event()
+    worker.submit(lambda conn: gate.wait(2))
+    worker.submit(lambda conn: 'lama', callback=results.append, key='search')
+    worker.cancel('search')
+    gate.set()
+    finish(worker)
+    assert results == []
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+import pytest
+
+pytest.importorskip('serial')
+import device_registry
+from device_registry import DeviceRegistry, looks_like_arduino, port_identity
+
+class FakePort:
+    def __init__(self, device, description='', vid=None, pid=None, serial_number=None):
+        self.device = device
+        self.description = description
+        self.vid = vid
+        self.pid = pid
+        self.serial_number = serial_number
+
+class FakeHandle:
+    def __init__(self, device):
+        self.device = device
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+ARDUINO = FakePort('COM7', 'Arduino Uno (COM7)', vid=0x2341, pid=0x0043, serial_number='A1')
+
+@pytest.fixture
+def registry(tmp_path):
+    return DeviceRegistry(str(tmp_path / 'device_registry.json'))
+
+@pytest.fixture
+def comports(monkeypatch):
+    ports = []
+    monkeypatch.setattr(device_registry.serial.tools.list_ports, 'comports', lambda: list(ports))
+    return ports
+
+def test_remember_persists_and_forget(registry):
+    registry.remember('printer', name='EPSON TM-T82')
+    reloaded = DeviceRegistry(registry.path)
+    assert reloaded.get('printer')['name'] == 'EPSON TM-T82'
+    assert 'verified_at' in reloaded.get('printer')
+
+    reloaded.forget('printer')
+    assert DeviceRegistry(registry.path).get('printer') is None
+
+def test_corrupt_file_starts_empty(tmp_path):
+    path = tmp_path / 'device_registry.json'
+    path.write_text('{bukan json')
+    registry = DeviceRegistry(str(path))
+    assert registry.get('arduino') is None
+    registry.remember('camera', index=1)
+    assert json.loads(path.read_text())['camera']['index'] == 1
+
+def test_port_helpers():
+    assert looks_like_arduino(ARDUINO)
+    assert looks_like_arduino(FakePort('COM3', 'USB-SERIAL CH340'))
+    assert not looks_like_arduino(FakePort('COM1', 'Communications Port'))
+    identity = port_identity(ARDUINO)
+    assert identity['vid'] == 0x2341 and identity['serial_number'] == 'A1'
+
+def test_match_rank(registry):
+    registry.remember('arduino', **port_identity(ARDUINO))
+    known = registry.get('arduino')
+    # Port COM bisa berubah setelah USB reset, identitas USB tetap cocok
+    assert registry._match_rank(known, FakePort('COM9', vid=0x2341, pid=0x0043, serial_number='A1')) == 0
+    assert registry._match_rank(known, FakePort('COM9', vid=0x2341, pid=0x0043, serial_number='B2')) == 1
+    assert registry._match_rank(known, FakePort('COM7')) == 2
+    assert registry._match_rank(known, FakePort('COM1')) is None
+    assert registry._match_rank(None, ARDUINO) is None
+
+def test_known_port_uses_quick_probe(registry, comports):
+    registry.remember('arduino', **port_identity(ARDUINO))
+    moved = FakePort('COM9', 'Arduino Uno (COM9)', vid=0x2341, pid=0x0043, serial_number='A1')
+    comports.extend([FakePort('COM1'), moved])
+    probed = []
+
+    def probe(device):
+        probed.append(device)
+        return FakeHandle(device)
+
+    device, handle = registry.find_serial('arduino', probe, quick_probe=FakeHandle)
+    assert device == 'COM9' and handle.device == 'COM9'
+    assert probed == []  # tanpa handshake
+    assert registry.get('arduino')['device'] == 'COM9'
+
+def test_parallel_probe_picks_responder_and_closes_others(registry, comports):
+    comports.extend([FakePort('COM3', 'USB Serial'), FakePort('COM4', 'USB Serial'), FakePort('COM5', 'USB Serial')])
+    handles = {}
+    release = threading.Event()
+
+    def probe(device):
+        if device == 'COM3':
+            return None
+        if device == 'COM5':
+            release.wait(2)  # selesai setelah pemenang dipilih
+        handles[device] = FakeHandle(device)
+        return handles[device]
+
+    device, handle = registry.find_serial('arduino', probe, match=looks_like_arduino)
+    release.set()
+    assert device == 'COM4' and handle is handles['COM4']
+    assert not handle.closed
+    for _ in range(100):
+        if 'COM5' in handles and handles['COM5'].closed:
+            break
+        time.sleep(0.01)
+    assert handles['COM5'].closed
+    assert registry.get('arduino')['device'] == 'COM4'
+
+def test_nothing_found(registry, comports):
+    comports.append(FakePort('COM3', 'USB Serial'))
+    assert registry.find_serial('arduino', lambda device: None) == (None, None)
+    assert registry.get('arduino') is None
+
+def test_camera_indices_put_last_known_first(registry):
+    assert registry.camera_indices() == [0, 1, 2, 3]
+    registry.remember('camera', index=2)
+    assert registry.camera_indices() == [2, 0, 1, 3]
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
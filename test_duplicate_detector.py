@@ -0,0 +1,50 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+
+from duplicate_detector import DuplicateDetector
+
+def make_frame(seed, size=(120, 160)):
+    rng = np.random.default_rng(seed)
+    # Blok kasar agar tetap berbeda setelah downscale ke thumbnail
+    blocks = rng.integers(0, 256, (size[0] // 20, size[1] // 20, 3), dtype=np.uint8)
+    return np.kron(blocks, np.ones((20, 20, 1), dtype=np.uint8))
+
+def test_same_frame_is_duplicate():
+    detector = DuplicateDetector(window_seconds=30)
+    frame = make_frame(1)
+    assert not detector.check_and_add(frame, now=100)
+    assert detector.check_and_add(frame.copy(), now=105)
+
+def test_different_frame_is_not_duplicate():
+    detector = DuplicateDetector(window_seconds=30)
+    assert not detector.check_and_add(make_frame(1), now=100)
+    is_duplicate, hamming, diff = detector.compare(make_frame(2), now=101)
+    assert not is_duplicate
+    assert hamming > detector.max_hamming or diff >= detector.min_diff
+
+def test_old_captures_are_ignored():
+    detector = DuplicateDetector(window_seconds=30)
+    frame = make_frame(1)
+    detector.add(frame, now=100)
+    assert detector.compare(frame, now=131) == (False, None, None)
+
+def test_duplicates_are_not_stored():
+    detector = DuplicateDetector(history=4)
+    frame = make_frame(1)
+    detector.check_and_add(frame, now=100)
+    detector.check_and_add(frame, now=101)
+    assert detector._count == 1
+
+def test_ring_buffer_keeps_last_captures():
+    detector = DuplicateDetector(history=2, window_seconds=30)
+    first = make_frame(1)
+    for seed, now in ((1, 100), (2, 101), (3, 102)):
+        detector.add(make_frame(seed), now=now)
+    # Capture pertama sudah tertimpa
+    assert not detector.compare(first, now=103)[0]
+    assert detector.compare(make_frame(3), now=103)[0]
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,82 @@
+import asyncio
+import pytest
+import exit_lane
+from exit_lane import ExitLaneController, ValidationCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(exit_lane.time, 'monotonic', lambda: now[0])
+    return now
+
+def test_pop_is_single_use(clock):
+    cache = ValidationCache()
+    cache.put('PKR0000000001', {'success': True})
+    assert cache.get('PKR0000000001') == {'success': True}
+    assert cache.pop('PKR0000000001') == {'success': True}
+    # Otorisasi yang sudah dipakai tidak bisa membuka palang lagi
+    assert cache.pop('PKR0000000001') is None
+    assert cache.get('PKR0000000001') is None
+
+def test_entries_expire(clock):
+    cache = ValidationCache(ttl=300)
+    cache.put('PKR0000000001', {'success': True})
+    clock[0] += 300
+    assert cache.get('PKR0000000001') == {'success': True}
+    clock[0] += 1
+    assert cache.pop('PKR0000000001') is None
+    assert 'PKR0000000001' not in cache._entries
+
+def test_evicts_soonest_expiring_when_full(clock):
+    cache = ValidationCache(ttl=300, max_size=2)
+    cache.put('A', 1)
+    clock[0] += 1
+    cache.put('B', 2)
+    clock[0] += 1
+    cache.put('C', 3)
+    assert cache.get('A') is None
+    assert cache.get('B') == 2
+    assert cache.get('C') == 3
+
+class FakeGate:
+    http = None
+    vehicle_detected = True
+
+    def __init__(self):
+        self.exits = []
+
+    def process_exit(self, ticket_id):
+        self.exits.append(ticket_id)
+        return True, {'ticket_id': ticket_id, 'fee': 5000}
+
+class FakeReplica:
+    def validate(self, code):
+        return 'unknown', None
+
+    def resolve_token(self, code):
+        return {'ABCD2345': 'PKR0000000042'}.get(code)
+
+def validate(controller, code):
+    async def run():
+        controller._loop = asyncio.get_running_loop()
+        return await controller._validate(code)
+    return asyncio.run(run())
+
+def test_server_validation_resolves_token():
+    gate = FakeGate()
+    controller = ExitLaneController(gate, replica=FakeReplica())
+    assert validate(controller, 'ABCD2345')[0]
+    assert gate.exits == ['PKR0000000042']
+
+    success, message = validate(controller, 'ZZZZ2345')
+    assert not success
+    assert gate.exits == ['PKR0000000042']
+
+def test_server_validation_without_token():
+    gate = FakeGate()
+    controller = ExitLaneController(gate, replica=FakeReplica())
+    assert validate(controller, 'PKR0000000007')[0]
+    assert gate.exits == ['PKR0000000007']
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,79 @@
+import json
+import pytest
+import gpio_simulator as GPIO
+
+PIN = 22
+
+@pytest.fixture(autouse=True)
+def clean_gpio():
+    GPIO.cleanup()
+    GPIO.setup(PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+    yield
+    GPIO.cleanup()
+
+def record(edge, bouncetime=None):
+    events = []
+    GPIO.add_event_detect(PIN, edge, callback=lambda ch: events.append((ch, GPIO.input(ch))),
+                          bouncetime=bouncetime)
+    return events
+
+def test_falling_edge_only():
+    events = record(GPIO.FALLING)
+    GPIO.set_input(PIN, GPIO.LOW)
+    GPIO.set_input(PIN, GPIO.HIGH)
+    assert events == [(PIN, GPIO.LOW)]
+
+def test_both_edges_and_no_event_without_change():
+    events = record(GPIO.BOTH)
+    GPIO.set_input(PIN, GPIO.HIGH)      # level sama, bukan edge
+    GPIO.set_input(PIN, GPIO.LOW)
+    GPIO.set_input(PIN, GPIO.HIGH)
+    assert events == [(PIN, GPIO.LOW), (PIN, GPIO.HIGH)]
+
+def test_bouncetime_drops_fast_edges(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(GPIO.time, 'monotonic', lambda: now[0])
+    events = record(GPIO.FALLING, bouncetime=200)
+    GPIO.set_input(PIN, GPIO.LOW)
+    GPIO.set_input(PIN, GPIO.HIGH)
+    now[0] += 0.1
+    GPIO.set_input(PIN, GPIO.LOW)       # pantulan kontak
+    GPIO.set_input(PIN, GPIO.HIGH)
+    now[0] += 0.2
+    GPIO.set_input(PIN, GPIO.LOW)
+    assert len(events) == 2
+
+def test_extra_callbacks_and_remove():
+    events = record(GPIO.FALLING)
+    extra = []
+    GPIO.add_event_callback(PIN, extra.append)
+    GPIO.set_input(PIN, GPIO.LOW)
+    assert len(events) == 1 and extra == [PIN]
+
+    GPIO.remove_event_detect(PIN)
+    GPIO.set_input(PIN, GPIO.HIGH)
+    GPIO.set_input(PIN, GPIO.LOW)
+    assert len(events) == 1
+
+def test_callback_error_does_not_stop_others():
+    def broken(channel):
+        raise RuntimeError("gagal")
+    GPIO.add_event_detect(PIN, GPIO.FALLING, callback=broken)
+    events = []
+    GPIO.add_event_callback(PIN, events.append)
+    GPIO.set_input(PIN, GPIO.LOW)
+    assert events == [PIN]
+
+def test_replay_sequence_from_file(tmp_path):
+    path = tmp_path / 'sequence.json'
+    path.write_text(json.dumps([{'t': 0.02, 'pin': PIN, 'state': 1}, [0.0, PIN, 0], [0.01, 17, 0]]))
+    sequence = GPIO.load_sequence(str(path))
+    assert sequence[0] == (0.02, PIN, 1)
+
+    events = record(GPIO.BOTH)
+    GPIO.replay(sequence, speed=10.0)
+    assert events == [(PIN, GPIO.LOW), (PIN, GPIO.HIGH)]
+    assert GPIO.input(17) == GPIO.LOW
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,68 @@
+import pytest
+
+requests = pytest.importorskip('requests')
+
+from http_client import CircuitBreaker
+from health_monitor import HealthMonitor
+
+class FakeResponse:
+    def __init__(self, ok):
+        self.ok = ok
+
+class FakeSession:
+    def __init__(self):
+        self.result = FakeResponse(True)
+        self.urls = []
+
+    def get(self, url, timeout=None):
+        self.urls.append(url)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+class FakeClient:
+    def __init__(self):
+        self.session = FakeSession()
+        self.breaker = CircuitBreaker(failure_threshold=1)
+
+    def url(self, path):
+        return 'http://server' + path
+
+def make_monitor(**kwargs):
+    return HealthMonitor(FakeClient(), interval=5.0, max_interval=60.0, **kwargs)
+
+def test_probe_online_records_latency():
+    monitor = make_monitor()
+    assert monitor.probe()
+    assert monitor.is_online
+    assert monitor.latency_ms is not None
+    assert monitor.client.session.urls == ['http://server/test']
+    assert monitor.next_delay() == 5.0
+
+def test_probe_failures_back_off_to_max():
+    monitor = make_monitor()
+    monitor.client.session.result = requests.exceptions.ConnectionError()
+    delays = []
+    for _ in range(6):
+        assert not monitor.probe()
+        delays.append(monitor.next_delay())
+    assert delays == [10.0, 20.0, 40.0, 60.0, 60.0, 60.0]
+
+    monitor.client.session.result = FakeResponse(False)
+    monitor.probe()
+    assert monitor.consecutive_failures == 7
+
+def test_recovery_resets_backoff_and_closes_breaker():
+    monitor = make_monitor()
+    monitor.client.breaker.record_failure()
+    monitor.report_failure()
+    monitor.report_failure()
+    assert monitor.client.breaker.is_open
+
+    assert monitor.probe()
+    assert monitor.consecutive_failures == 0
+    assert not monitor.client.breaker.is_open
+    assert monitor.status()['is_online']
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,108 @@
+import pytest
+
+requests = pytest.importorskip('requests')
+
+import http_client
+from http_client import CircuitBreaker, CircuitOpenError, HttpClient, get_client
+
+class FakeResponse:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+
+class FakeSession:
+    """Session yang mengembalikan/melempar hasil dari daftar secara berurutan"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(http_client.time, 'sleep', lambda seconds: None)
+
+@pytest.fixture
+def clients(monkeypatch):
+    monkeypatch.setattr(http_client, '_clients', {})
+    monkeypatch.setattr(http_client, '_breakers', {})
+
+def make_client(*results, **kwargs):
+    session = FakeSession(*results)
+    return HttpClient('http://server/api/', session=session, **kwargs), session
+
+def test_endpoint_timeout_uses_longest_prefix():
+    client, session = make_client(FakeResponse())
+    assert client.timeout_for('/api/process-exit/') == (2, 5)
+    assert client.timeout_for('/api/tickets/changes/?since=1') == (2, 10)
+    assert client.timeout_for('/lain') == http_client.DEFAULT_TIMEOUT
+    client.get('/api/test')
+    assert session.calls[0][1] == 'http://server/api/api/test'
+    assert session.calls[0][2]['timeout'] == (1, 2)
+
+def test_get_retries_read_timeout():
+    client, session = make_client(requests.exceptions.ReadTimeout(), FakeResponse())
+    assert client.get('/api/test').status_code == 200
+    assert len(session.calls) == 2
+
+def test_post_not_retried_after_read_timeout():
+    client, session = make_client(requests.exceptions.ReadTimeout(), FakeResponse())
+    with pytest.raises(requests.exceptions.Timeout):
+        client.post('/api/masuk')
+    assert len(session.calls) == 1
+
+def test_post_retried_when_connect_fails():
+    # Connect timeout: request pasti belum sampai ke server
+    client, session = make_client(requests.exceptions.ConnectTimeout(), FakeResponse())
+    assert client.post('/api/masuk').status_code == 200
+    assert len(session.calls) == 2
+
+def test_breaker_opens_and_rejects_without_request():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    client, session = make_client(FakeResponse(500), FakeResponse(500), breaker=breaker, retries=0)
+    client.get('/api/test')
+    client.get('/api/test')
+    assert client.is_offline
+    with pytest.raises(CircuitOpenError):
+        client.get('/api/test')
+    assert len(session.calls) == 2
+
+def test_breaker_half_open_closes_on_success(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(http_client.time, 'time', lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=15)
+    breaker.record_failure()
+    assert not breaker.allow_request()
+    now[0] += 15
+    assert breaker.allow_request()      # satu percobaan half-open
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow_request()
+
+def test_get_client_keeps_auth_per_client(clients):
+    plain = get_client('http://server/')
+    replica = get_client('http://server', auth=('exit', 'secret'))
+    assert plain is not replica
+    assert plain.auth is None
+    assert replica.auth == ('exit', 'secret')
+    assert get_client('http://server', auth=('exit', 'secret')) is replica
+    # Breaker tetap satu per server
+    assert plain.breaker is replica.breaker
+
+def test_get_client_rejects_conflicting_options(clients):
+    client = get_client('http://server', retries=1)
+    assert get_client('http://server') is client
+    assert get_client('http://server', retries=1) is client
+    with pytest.raises(ValueError):
+        get_client('http://server', retries=3)
+    with pytest.raises(ValueError):
+        get_client('http://server', timeouts={'/api/test': (1, 1)})
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,54 @@
+import logging
+import pytest
+import log_setup
+from log_setup import RateLimitFilter
+
+def make_record(msg, args=None, level=logging.ERROR, name='serial'):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(log_setup.time, 'monotonic', lambda: now[0])
+    return now
+
+def test_burst_then_suppress(clock):
+    limiter = RateLimitFilter(interval=10.0, burst=3)
+    passed = [limiter.filter(make_record('Port error')) for _ in range(5)]
+    assert passed == [True, True, True, False, False]
+
+def test_suppressed_count_reported_after_interval(clock):
+    limiter = RateLimitFilter(interval=10.0, burst=1)
+    limiter.filter(make_record('Port error'))
+    limiter.filter(make_record('Port error'))
+    limiter.filter(make_record('Port error'))
+
+    clock[0] += 10.0
+    record = make_record('Port error')
+    assert limiter.filter(record)
+    assert record.suppressed == 2
+
+    # Window baru tanpa pesan ditahan tidak membawa field suppressed
+    clock[0] += 10.0
+    record = make_record('Port error')
+    assert limiter.filter(record)
+    assert not hasattr(record, 'suppressed')
+
+def test_keys_by_logger_level_and_args(clock):
+    limiter = RateLimitFilter(interval=10.0, burst=1)
+    assert limiter.filter(make_record('Port %s error', ('COM3',)))
+    assert limiter.filter(make_record('Port %s error', ('COM4',)))
+    assert limiter.filter(make_record('Port %s error', ('COM3',), level=logging.WARNING))
+    assert limiter.filter(make_record('Port %s error', ('COM3',), name='printer'))
+    assert not limiter.filter(make_record('Port %s error', ('COM3',)))
+
+def test_prune_drops_expired_windows(clock):
+    limiter = RateLimitFilter(interval=10.0, burst=1)
+    for i in range(1001):
+        limiter.filter(make_record(f'pesan {i}'))
+    clock[0] += 10.0
+    limiter.filter(make_record('pesan baru'))
+    assert len(limiter._windows) == 1
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,89 @@
+import os
+import pytest
+
+django = pytest.importorskip('django')
+Image = pytest.importorskip('PIL.Image')
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=['django.contrib.auth', 'django.contrib.contenttypes', 'parking_manager'],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        USE_TZ=True,
+    )
+    django.setup()
+
+from django.test import RequestFactory
+from parking_manager.photos import ThumbnailCache, etag_for, serve_photo
+
+@pytest.fixture
+def photo(tmp_path):
+    path = str(tmp_path / 'PKR0000000001.jpg')
+    Image.new('RGB', (1920, 1080), (200, 30, 30)).save(path, 'JPEG', quality=90)
+    return path
+
+def test_thumbnail_is_resized_and_cached(tmp_path, photo):
+    cache = ThumbnailCache(str(tmp_path / 'thumbs'), max_bytes=10 * 1024 * 1024)
+    etag = etag_for(photo)
+    thumb = cache.get(photo, etag)
+    with Image.open(thumb) as image:
+        assert image.size == (320, 180)
+    assert cache.get(photo, etag) == thumb
+    # Foto sumber berubah (ETag lain): thumbnail baru
+    assert cache.get(photo, '"lain"') != thumb
+
+def test_evicts_least_recently_used(tmp_path, photo):
+    cache = ThumbnailCache(str(tmp_path / 'thumbs'), max_bytes=10 * 1024 * 1024)
+    first = cache.get(photo, '"a"')
+    size = os.path.getsize(first)
+    # Muat dua thumbnail, yang ketiga memicu eviksi
+    cache.max_bytes = size * 2 + size // 2
+    second = cache.get(photo, '"b"')
+    os.utime(first, (1, 1))
+    os.utime(second, (2, 2))
+    cache.get(photo, '"a"')  # dipakai lagi, jadi bukan yang terlama
+    third = cache.get(photo, '"c"')
+    assert os.path.exists(first)
+    assert not os.path.exists(second)
+    assert os.path.exists(third)
+
+def get(path, etag, **headers):
+    request = RequestFactory().get('/foto/', **{f"HTTP_{k.upper().replace('-', '_')}": v for k, v in headers.items()})
+    return serve_photo(request, path, etag)
+
+def test_not_modified_for_matching_etag(photo):
+    etag = etag_for(photo)
+    response = get(photo, etag, **{'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+
+def test_full_response(photo):
+    response = get(photo, etag_for(photo))
+    assert response.status_code == 200
+    assert b''.join(response.streaming_content) == open(photo, 'rb').read()
+    response.close()
+
+def test_range_requests(photo):
+    etag = etag_for(photo)
+    size = os.path.getsize(photo)
+    data = open(photo, 'rb').read()
+
+    response = get(photo, etag, Range='bytes=0-99')
+    assert response.status_code == 206
+    assert response.content == data[:100]
+    assert response['Content-Range'] == f'bytes 0-99/{size}'
+
+    response = get(photo, etag, Range='bytes=-10')
+    assert response.content == data[-10:]
+
+    response = get(photo, etag, Range=f'bytes={size}-')
+    assert response.status_code == 416
+
+    # If-Range dengan ETag lama: file utuh
+    response = get(photo, etag, Range='bytes=0-99', **{'If-Range': '"lama"'})
+    assert response.status_code == 200
+    response.close()
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
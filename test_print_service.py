@@ -0,0 +1,45 @@
+import pytest
+from print_service import parse_status
+
+# Balasan DLE EOT tanpa flag: bit 1 dan 4 selalu 1
+IDLE = bytes([0x12])
+
+def test_ready_printer():
+    status = parse_status(IDLE, IDLE, IDLE)
+    assert status.ok
+    assert status.online
+    assert status.describe() == 'siap'
+
+def test_offline_bit():
+    status = parse_status(bytes([0x12 | 0x08]), IDLE, IDLE)
+    assert not status.online
+    assert not status.ok
+
+def test_cover_open_and_error():
+    status = parse_status(IDLE, bytes([0x12 | 0x04 | 0x40]), IDLE)
+    assert status.cover_open
+    assert status.error
+    assert status.describe() == 'cover terbuka, error printer'
+
+def test_paper_out_from_offline_status():
+    assert parse_status(IDLE, bytes([0x12 | 0x20]), IDLE).paper_out
+
+def test_paper_sensor():
+    status = parse_status(IDLE, IDLE, bytes([0x12 | 0x60]))
+    assert status.paper_out
+    assert not status.ok
+
+    status = parse_status(IDLE, IDLE, bytes([0x12 | 0x0C]))
+    assert status.paper_near_end
+    assert status.ok  # kertas hampir habis masih bisa mencetak
+    assert status.describe() == 'kertas hampir habis'
+
+def test_invalid_replies():
+    assert parse_status(b'', IDLE, IDLE) is None
+    assert parse_status(None, IDLE, IDLE) is None
+    # Bit 0/7 harus 0 dan bit 1/4 harus 1
+    assert parse_status(IDLE, bytes([0x00]), IDLE) is None
+    assert parse_status(IDLE, IDLE, bytes([0x93])) is None
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
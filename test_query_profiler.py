@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip('django')
+
+from parking_manager.query_profiler import normalize_sql
+
+def test_replaces_literals():
+    sql = "SELECT * FROM tickets WHERE id = 42 AND plat = 'B 1234 XY' AND fee > 2.5"
+    assert normalize_sql(sql) == "SELECT * FROM tickets WHERE id = ? AND plat = ? AND fee > ?"
+
+def test_escaped_quotes():
+    assert normalize_sql("SELECT 1 FROM t WHERE nama = 'O''Brien'") == "SELECT ? FROM t WHERE nama = ?"
+
+def test_in_lists_collapse():
+    a = normalize_sql('SELECT * FROM "vehicles" WHERE "id" IN (%s, %s, %s)')
+    b = normalize_sql('SELECT * FROM "vehicles" WHERE "id" IN (%s)')
+    c = normalize_sql("SELECT * FROM vehicles WHERE id IN (1, 2, 3)")
+    assert a == b == 'SELECT * FROM "vehicles" WHERE "id" IN (...)'
+    assert c == 'SELECT * FROM vehicles WHERE id IN (...)'
+
+def test_keeps_identifiers_with_digits():
+    assert normalize_sql("SELECT col2 FROM t1 WHERE x = 3") == "SELECT col2 FROM t1 WHERE x = ?"
+
+def test_collapses_whitespace():
+    assert normalize_sql("SELECT *\n  FROM t\tWHERE id = %s ") == "SELECT * FROM t WHERE id = %s"
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,64 @@
+import pytest
+
+django = pytest.importorskip('django')
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        INSTALLED_APPS=['django.contrib.auth', 'django.contrib.contenttypes', 'parking_manager'],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        USE_TZ=True,
+    )
+    django.setup()
+
+from parking_manager import ticket_ids
+from parking_manager.ticket_ids import BlockAllocator, format_id, parse_id
+
+class FakeConnection:
+    in_atomic_block = False
+
+@pytest.fixture
+def leases(monkeypatch):
+    """lease_block tanpa database: blok berurutan mulai dari 1"""
+    calls = []
+
+    def lease_block(name, size):
+        start = 1 + len(calls) * size
+        calls.append((name, size))
+        return start, start + size
+
+    monkeypatch.setattr(ticket_ids, 'lease_block', lease_block)
+    monkeypatch.setattr(ticket_ids, 'connection', FakeConnection())
+    return calls
+
+def test_numbers_come_from_leased_block(leases):
+    allocator = BlockAllocator('ticket', 'PKR', size=3)
+    assert [allocator.next_number() for _ in range(3)] == [1, 2, 3]
+    assert len(leases) == 1
+    assert allocator.next_number() == 4
+    assert leases == [('ticket', 3), ('ticket', 3)]
+
+def test_next_numbers_spans_blocks(leases):
+    allocator = BlockAllocator('ticket', 'PKR', size=3)
+    allocator.next_number()
+    assert allocator.next_numbers(5) == [2, 3, 4, 5, 6]
+    assert len(leases) == 2
+    assert allocator.next_ids(2) == ['PKR0000000007', 'PKR0000000008']
+
+def test_refuses_lease_inside_atomic(leases):
+    ticket_ids.connection.in_atomic_block = True
+    allocator = BlockAllocator('ticket', 'PKR', size=3)
+    with pytest.raises(RuntimeError):
+        allocator.next_id()
+    assert leases == []
+
+def test_format_and_parse_id():
+    assert format_id('PKR', 1234) == 'PKR0000001234'
+    assert parse_id('PKR0000001234', 'PKR') == 1234
+    assert parse_id('TRX0000001234', 'PKR') is None
+    assert parse_id('PKR1234', 'PKR') is None
+    assert parse_id(None, 'PKR') is None
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
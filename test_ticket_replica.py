@@ -0,0 +1,124 @@
+import sqlite3
+import pytest
+
+pytest.importorskip('requests')
+
+from barcode_token import make_token
+from ticket_replica import TicketReplica
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+class FakeClient:
+    def __init__(self):
+        self.pages = []
+        self.gets = []
+        self.posts = []
+        self.exit_result = None
+
+    def get(self, path, params=None):
+        if path.startswith('/api/tickets/token/'):
+            token = path.rstrip('/').rsplit('/', 1)[1]
+            if token != make_token('PKR0000000042'):
+                return FakeResponse({'success': False}, status_code=404)
+            return FakeResponse({'success': True, 'data': {'ticket_id': 'PKR0000000042'}})
+        self.gets.append(params)
+        return FakeResponse({'success': True, 'data': self.pages.pop(0)})
+
+    def post(self, path, json=None, retry=None):
+        self.posts.append(json)
+        return FakeResponse({'success': True, 'data': self.exit_result})
+
+def ticket(number, updated_at='2024-05-01T08:00:00+07:00'):
+    ticket_id = f"PKR{number:010d}"
+    return {'ticket_id': ticket_id, 'barcode': ticket_id, 'barcode_token': make_token(ticket_id),
+            'status': 'ACTIVE', 'is_paid': True, 'fee': 5000.0, 'updated_at': updated_at}
+
+def tombstone(number, updated_at='2024-05-01T09:00:00+07:00'):
+    return {'ticket_id': f"PKR{number:010d}", 'deleted': True, 'updated_at': updated_at}
+
+def page(tickets, has_more=False):
+    last = tickets[-1]['updated_at'] if tickets else None
+    return {'tickets': tickets, 'cursor': {'since': last, 'since_id': len(tickets)} if last else None,
+            'has_more': has_more}
+
+@pytest.fixture
+def replica(tmp_path):
+    replica = TicketReplica('http://server', db_path=str(tmp_path / 'replica.db'))
+    replica.http = FakeClient()
+    yield replica
+    replica.stop()
+
+def count(replica):
+    return replica._db.execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+
+def test_sync_pages_and_validates_by_token(replica):
+    replica.http.pages = [page([ticket(1), ticket(2)], has_more=True), page([ticket(3)])]
+    assert replica.sync() == 3
+    assert replica.http.gets[1]['since'] == '2024-05-01T08:00:00+07:00'
+
+    status, data = replica.validate(f"*{make_token('PKR0000000002')}*")
+    assert status == 'paid'
+    assert data['ticket_id'] == 'PKR0000000002'
+    assert replica.validate('PKR0000000003')[0] == 'paid'
+    assert replica.validate('PKR0000000099')[0] == 'unknown'
+
+def test_tombstones_remove_tickets(replica):
+    replica.http.pages = [page([ticket(1), ticket(2)])]
+    replica.sync()
+    replica.http.pages = [page([tombstone(1)])]
+    assert replica.sync() == 1
+    assert count(replica) == 1
+    assert replica.validate('PKR0000000001')[0] == 'unknown'
+
+def test_exit_is_single_use_until_uploaded(replica):
+    replica.http.pages = [page([ticket(1), ticket(2)])]
+    replica.sync()
+    replica.record_exit('PKR0000000001')
+    replica.record_exit('PKR0000000002')
+    assert replica.validate('PKR0000000001')[0] == 'exited'
+
+    replica.http.exit_result = {
+        'accepted': ['PKR0000000001'],
+        'conflicts': [{'ticket_id': 'PKR0000000002', 'reason': 'sudah keluar di gate lain'}]
+    }
+    assert replica.upload_exits() == 1
+    assert replica.pending_exits() == 0
+    # Tiket yang sudah keluar tidak disimpan lagi di replika
+    assert count(replica) == 1
+    assert [row[0] for row in replica.conflicts()] == ['PKR0000000002']
+
+def test_resolve_token_locally_then_on_server(replica):
+    replica.http.pages = [page([ticket(1)])]
+    replica.sync()
+    assert replica.resolve_token(make_token('PKR0000000001').lower()) == 'PKR0000000001'
+    assert replica.resolve_token(f"*{make_token('PKR0000000042')}*") == 'PKR0000000042'
+    assert replica.resolve_token(make_token('PKR0000000077')) is None
+    # Hasil scan yang bukan token dikirim apa adanya
+    assert replica.resolve_token(' PKR0000000005 ') == 'PKR0000000005'
+
+def test_old_history_is_pruned_on_open(tmp_path):
+    path = str(tmp_path / 'replica.db')
+    TicketReplica('http://server', db_path=path).stop()
+    db = sqlite3.connect(path)
+    db.executemany(
+        "INSERT INTO tickets (ticket_id, barcode, status, is_paid, fee, updated_at) VALUES (?, ?, ?, ?, 0, '')",
+        [('A', 'A', 'COMPLETED', 1), ('B', 'B', 'ACTIVE', 0), ('C', 'C', 'ACTIVE', 1)]
+    )
+    db.commit()
+    db.close()
+
+    replica = TicketReplica('http://server', db_path=path)
+    assert [row[0] for row in replica._db.execute("SELECT ticket_id FROM tickets")] == ['C']
+    replica.stop()
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
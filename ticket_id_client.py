@@ -0,0 +1,151 @@
+import logging
+import os
+import threading
+import time
+from http_client import get_client
+
+logger = logging.getLogger('ticket_id_client')
+
+# Harus sama dengan parking_manager.ticket_ids
+BLOCK_SIZE = 100
+TICKET_PREFIX = 'PKR'
+SEQUENCE_NAME = 'parking_ticket_seq'
+
+def format_ticket_id(prefix, number):
+    """Format nomor urut menjadi ID tiket, mis. PKR0000001234"""
+    return f"{prefix}{number:010d}"
+
+def http_lease(base_url, timeout=3, auth=None):
+    """Buat fungsi lease yang meminta blok nomor tiket ke server Django
+
+    Args:
+        auth: (username, password) Basic auth; endpoint lease butuh login,
+            default API_USERNAME/API_PASSWORD seperti sync replika
+    """
+    if auth is None:
+        auth = (os.getenv('API_USERNAME', 'admin'), os.getenv('API_PASSWORD', 'admin'))
+
+    def lease():
+        # auth per request: HttpClient dipakai bersama per base URL
+        response = get_client(base_url).post("/api/ticket-ids/lease/", timeout=timeout, auth=auth)
+        response.raise_for_status()
+        result = response.json()
+        if not result.get('success'):
+            raise Exception(result.get('message', 'Lease gagal'))
+        data = result['data']
+        return data['start'], data['end']
+    return lease
+
+def db_lease(connect, size=BLOCK_SIZE):
+    """Buat fungsi lease yang mengambil blok langsung dari SEQUENCE PostgreSQL
+
+    Args:
+        connect: callable yang mengembalikan koneksi psycopg2 baru
+    """
+    def lease():
+        connection = connect()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE_NAME} START WITH 1 INCREMENT BY {size}"
+            )
+            cursor.execute("SELECT nextval(%s)", (SEQUENCE_NAME,))
+            start = cursor.fetchone()[0]
+            connection.commit()
+            cursor.close()
+            return start, start + size
+        finally:
+            connection.close()
+    return lease
+
+class TicketIdLease:
+    """Alokasi ID tiket di sisi gate dari blok yang disewa dari server
+
+    Gate menyewa blok 100 nomor sekaligus, lalu membuat ID tiket secara lokal
+    tanpa round trip per kendaraan. Blok berikutnya diambil di background
+    saat blok aktif hampir habis, sehingga gate tetap punya nomor cadangan
+    ketika server sesaat tidak bisa dihubungi. Sisa blok tidak disimpan ke
+    disk: setelah restart nomor yang belum terpakai dilewati, tidak dipakai
+    ulang.
+    """
+
+    def __init__(self, lease, prefix=TICKET_PREFIX, prefetch_at=0.8, retry_delay=30):
+        self.lease = lease
+        self.prefix = prefix
+        self.prefetch_at = prefetch_at
+        self.retry_delay = retry_delay
+        self._retry_at = 0
+        self._current = None   # [next, end]
+        self._spare = None     # (start, end)
+        self._prefetching = False
+        self._lock = threading.Lock()
+
+    def _lease_block(self):
+        # Jangan coba lagi sebelum retry_delay lewat, agar mode offline tidak
+        # menunggu timeout di setiap kendaraan
+        if time.time() < self._retry_at:
+            return None
+        try:
+            start, end = self.lease()
+            logger.info(f"Blok ID tiket disewa: {start}-{end - 1}")
+            return start, end
+        except Exception as e:
+            logger.warning(f"Gagal menyewa blok ID tiket: {str(e)}")
+            self._retry_at = time.time() + self.retry_delay
+            return None
+
+    def _prefetch(self):
+        block = self._lease_block()
+        with self._lock:
+            if block and self._spare is None:
+                self._spare = block
+            self._prefetching = False
+
+    def _maybe_prefetch(self):
+        """Dipanggil dengan lock terpegang"""
+        if self._spare is not None or self._prefetching or self._current is None:
+            return
+        next_number, end = self._current
+        used = 1 - (end - next_number) / BLOCK_SIZE
+        if used >= self.prefetch_at:
+            self._prefetching = True
+            threading.Thread(target=self._prefetch, daemon=True).start()
+
+    def warm_up(self):
+        """Sewa blok pertama di background agar tiket pertama tidak menunggu lease"""
+        with self._lock:
+            if self._current is not None or self._spare is not None or self._prefetching:
+                return
+            self._prefetching = True
+        threading.Thread(target=self._prefetch, daemon=True).start()
+
+    def next_id(self):
+        """ID tiket berikutnya, atau None jika tidak ada blok (mode offline)"""
+        with self._lock:
+            if self._current is None or self._current[0] >= self._current[1]:
+                if self._spare is not None:
+                    self._current = list(self._spare)
+                    self._spare = None
+                else:
+                    self._current = None
+
+            if self._current is None:
+                block = self._lease_block()
+                if block is None:
+                    return None
+                self._current = list(block)
+
+            number = self._current[0]
+            self._current[0] += 1
+            self._maybe_prefetch()
+            return format_ticket_id(self.prefix, number)
+
+    def remaining(self):
+        """Jumlah ID yang masih bisa dibuat tanpa server"""
+        with self._lock:
+            total = 0
+            if self._current is not None:
+                total += max(0, self._current[1] - self._current[0])
+            if self._spare is not None:
+                total += self._spare[1] - self._spare[0]
+            return total
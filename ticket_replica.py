@@ -0,0 +1,275 @@
+"""
+Replika lokal tiket aktif/lunas untuk gate keluar.
+
+Gate menyimpan salinan tiket ACTIVE yang sudah lunas di SQLite lokal yang
+disinkronkan dari server Django lewat delta feed (api/tickets/changes/, urut
+updated_at). Tiket yang keluar atau dibatalkan datang sebagai tombstone dan
+dihapus, sehingga ukuran replika mengikuti jumlah kendaraan di dalam, bukan
+seluruh riwayat tiket. Validasi tiket lunas cukup satu query lokal, sehingga
+palang tetap bisa dibuka saat server lambat atau offline. Setiap kendaraan keluar dicatat di outbox
+dan dikirim ke server per batch (api/exits/batch/); konflik dari server
+(mis. tiket sudah keluar di gate lain) disimpan di tabel conflicts untuk
+direkonsiliasi operator.
+"""
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from http_client import get_client
+from barcode_token import normalize_scan, is_token
+
+logger = logging.getLogger('ticket_replica')
+
+# Feed dibaca ulang sedikit ke belakang agar transaksi yang commit terlambat
+# dengan updated_at lebih awal tidak terlewat; upsert bersifat idempoten
+SYNC_OVERLAP = timedelta(seconds=5)
+
+class TicketReplica:
+    """Salinan tiket di gate keluar dengan outbox data keluar"""
+
+    def __init__(self, base_url, db_path='ticket_replica.db', gate_id='exit-1',
+                 sync_interval=5.0, page_size=500, auth=None):
+        self.http = get_client(base_url, auth=auth)
+        self.gate_id = gate_id
+        self.sync_interval = sync_interval
+        self.page_size = page_size
+        self.last_sync = None
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS tickets (
+                ticket_id TEXT PRIMARY KEY,
+                barcode TEXT,
+                status TEXT NOT NULL,
+                is_paid INTEGER NOT NULL,
+                fee REAL,
+                updated_at TEXT NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_replica_barcode_token ON tickets (barcode);
+            CREATE TABLE IF NOT EXISTS outbox (
+                ticket_id TEXT PRIMARY KEY,
+                exit_time TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS conflicts (
+                ticket_id TEXT NOT NULL,
+                exit_time TEXT NOT NULL,
+                reason TEXT NOT NULL,
+                recorded_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        # Replika lama menyimpan seluruh riwayat tiket
+        self._db.execute("DELETE FROM tickets WHERE status != 'ACTIVE' OR is_paid = 0")
+        self._db.commit()
+
+    # Validasi lokal
+
+    def validate(self, code):
+        """Cek tiket di replika
+
+        Returns:
+            (status, data): status 'paid' jika boleh keluar, 'unpaid',
+            'exited', atau 'unknown' jika tiket belum ada di replika
+        """
+        # Kolom barcode berisi token yang dicetak; satu probe ke index yang sesuai
+        scanned = normalize_scan(code)
+        column = 'barcode' if is_token(scanned) else 'ticket_id'
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT ticket_id, status, is_paid, fee FROM tickets WHERE {column} = ?",
+                (scanned if column == 'barcode' else code.strip(),)
+            ).fetchone()
+            if row is None:
+                return 'unknown', None
+            ticket_id, status, is_paid, fee = row
+            queued = self._db.execute(
+                "SELECT 1 FROM outbox WHERE ticket_id = ?", (ticket_id,)
+            ).fetchone()
+
+        data = {'ticket_id': ticket_id, 'fee': fee, 'source': 'replica'}
+        if status == 'COMPLETED' or queued:
+            return 'exited', data
+        if status != 'ACTIVE' or not is_paid:
+            return 'unpaid', data
+        return 'paid', data
+
+    def resolve_token(self, code):
+        """ID tiket untuk hasil scan; token barcode dicari di replika lalu server
+
+        Returns:
+            ID tiket, atau None jika token tidak dikenal server
+        """
+        scanned = normalize_scan(code)
+        if not is_token(scanned):
+            return code.strip()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT ticket_id FROM tickets WHERE barcode = ?", (scanned,)
+            ).fetchone()
+        if row is not None:
+            return row[0]
+
+        response = self.http.get(f"/api/tickets/token/{scanned}/")
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()['data']['ticket_id']
+
+    def record_exit(self, ticket_id, exit_time=None):
+        """Catat kendaraan keluar ke outbox untuk dikirim ke server"""
+        exit_time = (exit_time or datetime.now().astimezone()).isoformat()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO outbox (ticket_id, exit_time) VALUES (?, ?)",
+                (ticket_id, exit_time)
+            )
+            self._db.commit()
+        self._wakeup.set()
+
+    def pending_exits(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    # Sinkronisasi
+
+    def _get_meta(self, key):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def sync(self):
+        """Tarik perubahan tiket sejak sinkronisasi terakhir; kembalikan jumlah baris"""
+        with self._lock:
+            cursor = self._get_meta('cursor')
+        params = {'limit': self.page_size}
+        if cursor:
+            since = datetime.fromisoformat(cursor) - SYNC_OVERLAP
+            params['since'] = since.isoformat()
+
+        total = 0
+        while True:
+            response = self.http.get("/api/tickets/changes/", params=params)
+            response.raise_for_status()
+            result = response.json()
+            if not result.get('success'):
+                raise Exception(result.get('message', 'Sync gagal'))
+            data = result['data']
+
+            rows = [
+                (t['ticket_id'], t.get('barcode_token') or t['barcode'], t['status'],
+                 int(t['is_paid']), t['fee'], t['updated_at'])
+                for t in data['tickets'] if not t.get('deleted')
+            ]
+            deleted = [(t['ticket_id'],) for t in data['tickets'] if t.get('deleted')]
+            with self._lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO tickets "
+                    "(ticket_id, barcode, status, is_paid, fee, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._db.executemany("DELETE FROM tickets WHERE ticket_id = ?", deleted)
+                if data.get('cursor'):
+                    self._set_meta('cursor', data['cursor']['since'])
+                self._db.commit()
+            total += len(rows) + len(deleted)
+
+            if not data.get('has_more'):
+                break
+            params = {'limit': self.page_size, **data['cursor']}
+
+        self.last_sync = datetime.now()
+        if total:
+            logger.debug(f"Replika tiket: {total} perubahan disinkronkan")
+        return total
+
+    def upload_exits(self):
+        """Kirim outbox ke server; kembalikan jumlah yang diterima"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT ticket_id, exit_time FROM outbox ORDER BY exit_time LIMIT ?",
+                (self.page_size,)
+            ).fetchall()
+        if not rows:
+            return 0
+
+        response = self.http.post("/api/exits/batch/", json={
+            'gate': self.gate_id,
+            'exits': [{'ticket_id': ticket_id, 'exit_time': exit_time} for ticket_id, exit_time in rows]
+        }, retry=True)
+        response.raise_for_status()
+        result = response.json()
+        if not result.get('success'):
+            with self._lock:
+                self._db.executemany(
+                    "UPDATE outbox SET attempts = attempts + 1 WHERE ticket_id = ?",
+                    [(ticket_id,) for ticket_id, _ in rows]
+                )
+                self._db.commit()
+            raise Exception(result.get('message', 'Upload gagal'))
+
+        data = result['data']
+        exit_times = dict(rows)
+        now = datetime.now().isoformat()
+        with self._lock:
+            done = data['accepted'] + [c['ticket_id'] for c in data['conflicts']]
+            self._db.executemany("DELETE FROM outbox WHERE ticket_id = ?", [(t,) for t in done])
+            # Server sudah mencatat keluar; scan ulang ditolak server
+            self._db.executemany(
+                "DELETE FROM tickets WHERE ticket_id = ?",
+                [(t,) for t in data['accepted']]
+            )
+            self._db.executemany(
+                "INSERT INTO conflicts (ticket_id, exit_time, reason, recorded_at) VALUES (?, ?, ?, ?)",
+                [(c['ticket_id'], exit_times.get(c['ticket_id'], ''), c['reason'], now) for c in data['conflicts']]
+            )
+            self._db.commit()
+
+        for conflict in data['conflicts']:
+            logger.warning(f"Konflik data keluar {conflict['ticket_id']}: {conflict['reason']}")
+        return len(data['accepted'])
+
+    def conflicts(self):
+        """Daftar konflik yang perlu direkonsiliasi operator"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT ticket_id, exit_time, reason, recorded_at FROM conflicts ORDER BY recorded_at"
+            ).fetchall()
+
+    # Thread background
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='ticket-replica', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.upload_exits()
+                self.sync()
+            except Exception as e:
+                logger.warning(f"Sinkronisasi replika gagal: {str(e)}")
+            self._wakeup.wait(self.sync_interval)
+            self._wakeup.clear()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        with self._lock:
+            self._db.close()